@@ -0,0 +1,71 @@
+# ai/bench/common.py
+# ================================================================
+# 역할: 벤치마크/부하테스트 공용 유틸
+# - 지연시간 백분위(p50/p95/p99) 계산
+# - 최대 메모리(RSS) 측정
+# - 결과 JSON 저장(커밋 해시/환경 정보 포함) → 커밋 간 비교용
+# ================================================================
+from __future__ import annotations
+
+import json, math, os, platform, resource, subprocess, sys, time
+from typing import Dict, List, Optional
+
+AI_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+REPO_ROOT = os.path.abspath(os.path.join(AI_DIR, ".."))
+
+def ensure_ai_path() -> None:
+    """ai/ 를 sys.path에 올려 rag/*, llm_runtime/* 를 import 가능하게 함"""
+    if AI_DIR not in sys.path:
+        sys.path.insert(0, AI_DIR)
+
+def percentiles(samples_ms: List[float], ps=(50, 95, 99)) -> Dict[str, float]:
+    """nearest-rank 방식 백분위 (ms)"""
+    if not samples_ms:
+        return {f"p{p}": 0.0 for p in ps}
+    s = sorted(samples_ms)
+    out = {}
+    for p in ps:
+        idx = max(0, min(len(s) - 1, math.ceil(p / 100.0 * len(s)) - 1))
+        out[f"p{p}"] = round(s[idx], 3)
+    out["mean"] = round(sum(s) / len(s), 3)
+    out["max"] = round(s[-1], 3)
+    return out
+
+def peak_rss_mb() -> float:
+    """프로세스 최대 RSS(MB). Linux는 KB, macOS는 byte 단위로 보고됨"""
+    ru = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return round(ru / (1024 * 1024), 1)
+    return round(ru / 1024, 1)
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT, capture_output=True, text=True, timeout=5,
+        )
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+def run_meta(extra: Optional[Dict] = None) -> Dict:
+    meta = {
+        "commit": git_commit(),
+        "timestamp": int(time.time()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+    if extra:
+        meta.update(extra)
+    return meta
+
+def write_result(result: Dict, out_path: Optional[str], default_name: str) -> str:
+    """결과 JSON 저장. out_path 미지정 시 bench_results/<name>-<commit>.json"""
+    if not out_path:
+        commit = (result.get("meta") or {}).get("commit") or "nocommit"
+        out_path = os.path.join(AI_DIR, "bench", "bench_results", f"{default_name}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    return out_path
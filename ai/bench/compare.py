@@ -0,0 +1,58 @@
+# ai/bench/compare.py
+# ================================================================
+# 역할: 벤치마크 결과 JSON 두 개(기준/후보)를 비교해 수치 변화량 출력
+#
+# 실행 (ai/ 디렉토리에서):
+#   python -m bench.compare bench/bench_results/rag-abc123.json bench/bench_results/rag-def456.json
+# ================================================================
+from __future__ import annotations
+
+import json, sys
+from typing import Dict
+
+def _flatten(obj, prefix: str = "") -> Dict[str, float]:
+    """중첩 dict/list → {"query.0.p95": 12.3, ...} (숫자 값만)"""
+    out: Dict[str, float] = {}
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            if k == "meta":
+                continue
+            out.update(_flatten(v, f"{prefix}{k}."))
+    elif isinstance(obj, list):
+        for i, v in enumerate(obj):
+            key = v.get("concurrency", i) if isinstance(v, dict) else i
+            out.update(_flatten(v, f"{prefix}{key}."))
+    elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        out[prefix.rstrip(".")] = float(obj)
+    return out
+
+def compare(base: Dict, cand: Dict) -> Dict[str, Dict[str, float]]:
+    a, b = _flatten(base), _flatten(cand)
+    rows = {}
+    for key in sorted(set(a) | set(b)):
+        va, vb = a.get(key), b.get(key)
+        row = {"base": va, "cand": vb}
+        if va is not None and vb is not None and va != 0:
+            row["delta_pct"] = round((vb - va) / abs(va) * 100.0, 1)
+        rows[key] = row
+    return rows
+
+def main(argv=None) -> None:
+    argv = argv if argv is not None else sys.argv[1:]
+    if len(argv) != 2:
+        print("usage: python -m bench.compare BASE.json CANDIDATE.json")
+        sys.exit(2)
+    with open(argv[0], encoding="utf-8") as f:
+        base = json.load(f)
+    with open(argv[1], encoding="utf-8") as f:
+        cand = json.load(f)
+
+    print(f"base={base.get('meta', {}).get('commit')}  cand={cand.get('meta', {}).get('commit')}")
+    for key, row in compare(base, cand).items():
+        va = "-" if row["base"] is None else f"{row['base']:.3f}"
+        vb = "-" if row["cand"] is None else f"{row['cand']:.3f}"
+        delta = f"{row['delta_pct']:+.1f}%" if "delta_pct" in row else ""
+        print(f"{key:<40} {va:>12} {vb:>12} {delta:>9}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# ai/bench/corpus.py
+# ================================================================
+# 역할: 벤치마크용 한국어 코퍼스 + 정답 라벨 질문셋
+# - 합성 Mongo 레코드(학과 소개/공지/장학/교과과정 표) 생성 (seed 고정 → 재현 가능)
+# - 각 레코드에서 "그 레코드에서만 답할 수 있는" 질문을 만들어 source_id로 라벨링
+# - 번들 PDF(school_rules.pdf)는 pdf_questions.json의 페이지 라벨 사용
+# ================================================================
+from __future__ import annotations
+
+import datetime, json, os, random
+from typing import Dict, List, Tuple
+
+from bson import ObjectId
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PDF_PATH = os.path.abspath(os.path.join(BENCH_DIR, "..", "data", "docs", "school_rules.pdf"))
+PDF_QUESTIONS = os.path.join(BENCH_DIR, "pdf_questions.json")
+
+DEPTS = [
+    "컴퓨터소프트웨어공학과", "기계공학과", "전기공학과", "경영학과", "시각디자인과",
+    "로봇소프트웨어과", "정보통신공학과", "화공생명공학과", "건축과", "세무회계학과",
+    "산업경영공학과", "바이오융합공학과", "반도체전자공학과", "자동화공학과", "인공지능소프트웨어학과",
+    "경영정보학과", "유통마케팅학과", "호텔관광학과", "실내건축디자인과", "소방안전관리과",
+]
+BUILDINGS = ["1호관", "2호관", "3호관", "4호관", "5호관", "6호관", "7호관", "미래관"]
+PROFESSORS = ["김민수", "이지은", "박정호", "최수연", "정다은", "강태훈", "조현우", "윤서진", "장민재", "임하늘"]
+EVENTS = ["휴학 신청", "복학 신청", "수강신청 정정", "졸업작품 전시회", "현장실습 설명회", "성적 이의신청", "병결 서류 제출"]
+SCHOLARSHIPS = ["성적우수장학금", "근로장학금", "가계곤란장학금", "봉사장학금", "산학협력장학금", "글로벌장학금"]
+SUBJECTS = ["프로그래밍기초", "자료구조", "데이터베이스", "회로이론", "유체역학", "마케팅원론", "회계원리",
+            "디자인기초", "캡스톤디자인", "운영체제", "네트워크", "머신러닝", "CAD실습", "품질경영"]
+
+def _date(rng: random.Random, year: int = 2025) -> Tuple[str, datetime.datetime]:
+    d = datetime.datetime(year, rng.randint(1, 12), rng.randint(1, 28), rng.choice([10, 13, 16]))
+    return f"{d.year}. {d.month}. {d.day}.", d
+
+def _filler(rng: random.Random, n: int) -> str:
+    """검색 난이도를 위한 공통 문구(모든 레코드에 비슷하게 섞임)"""
+    pool = [
+        "자세한 사항은 학과 사무실 또는 학사지원팀으로 문의하시기 바랍니다.",
+        "제출 서류는 기한 내에 온라인으로 접수해야 하며, 기한 이후에는 접수하지 않습니다.",
+        "학생 여러분의 적극적인 참여를 바랍니다.",
+        "본 안내는 학사 일정에 따라 변경될 수 있습니다.",
+        "관련 규정은 학칙 및 학사운영규정을 따릅니다.",
+    ]
+    return " ".join(rng.choice(pool) for _ in range(n))
+
+def synthetic_corpus(n_docs: int = 400, seed: int = 42) -> Tuple[Dict[str, List[Dict]], List[Dict]]:
+    """
+    합성 Mongo 코퍼스 생성.
+    반환: ({컬렉션명: [레코드...]}, [{"query":..., "label": {"source_ids": [...]}}...])
+    """
+    rng = random.Random(seed)
+    colls: Dict[str, List[Dict]] = {"department": [], "notice": [], "scholarship": [], "curriculum": []}
+    questions: Dict[str, List[str]] = {}  # 질문 → 정답 source_id 목록
+
+    for i in range(n_docs):
+        kind = ("department", "notice", "notice", "scholarship", "curriculum")[i % 5]
+        dept = DEPTS[(i // 5) % len(DEPTS)] if kind != "notice" else rng.choice(DEPTS)
+        oid = ObjectId()
+        _, updated = _date(rng)
+
+        if kind == "department":
+            phone = f"02-2610-{rng.randint(1000, 9999)}"
+            prof = rng.choice(PROFESSORS)
+            room = f"{rng.choice(BUILDINGS)} {rng.randint(1, 9)}{rng.randint(0, 2)}{rng.randint(1, 9)}호"
+            title = f"{dept} 소개 ({i})"
+            content = (
+                f"{dept}는 {room}에 학과 사무실이 있습니다. 학과장은 {prof} 교수이며 "
+                f"학과 사무실 전화번호는 {phone}입니다.\n\n{_filler(rng, 3)}"
+            )
+            q = f"{dept} 학과 사무실 전화번호 알려줘" if i // 5 < len(DEPTS) else None
+        elif kind == "notice":
+            ev = rng.choice(EVENTS)
+            when, _ = _date(rng)
+            title = f"[{dept}] 2025학년도 {ev} 안내"
+            content = (
+                f"{dept} 학생을 대상으로 {ev} 일정을 안내합니다. 기간은 {when}부터 일주일간입니다.\n\n"
+                f"{_filler(rng, rng.randint(2, 6))}"
+            )
+            q = f"{dept} {ev} 기간이 언제야?"
+        elif kind == "scholarship":
+            sch = rng.choice(SCHOLARSHIPS)
+            amount = rng.choice([50, 100, 150, 200, 300])
+            gpa = rng.choice(["3.0", "3.5", "4.0"])
+            title = f"{dept} {sch} 선발 기준"
+            content = (
+                f"{dept} {sch}은 직전 학기 평점 {gpa} 이상인 재학생을 대상으로 하며 "
+                f"1인당 {amount}만원을 지급합니다.\n\n{_filler(rng, 2)}"
+            )
+            q = f"{dept} {sch} 금액이 얼마야?"
+        else:
+            # 길이가 긴 표 형태 레코드(임베딩 배치 길이 편차 재현용)
+            rows = []
+            for y in (1, 2, 3):
+                for s in (1, 2):
+                    for subj in rng.sample(SUBJECTS, 4):
+                        rows.append(f"학년: {y} | 학기: {s} | 교과목명: {subj} | 학점: {rng.choice([2, 3])} | 이수구분: {rng.choice(['전공필수', '전공선택', '교양'])}")
+            title = f"{dept} 교육과정 편성표"
+            content = "\n".join(rows)
+            q = None
+
+        colls[kind].append({"_id": oid, "title": title, "content": content, "updated_at": updated})
+        if q:
+            # 같은 (학과, 이벤트) 조합이 여러 번 나오면 정답도 여러 개
+            questions.setdefault(q, []).append(str(oid))
+
+    return colls, [{"query": q, "label": {"source_ids": ids}} for q, ids in questions.items()]
+
+def pdf_questions() -> List[Dict]:
+    with open(PDF_QUESTIONS, "r", encoding="utf-8") as f:
+        return json.load(f)
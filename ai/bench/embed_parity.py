@@ -0,0 +1,110 @@
+# ai/bench/embed_parity.py
+# ================================================================
+# 역할: 임베딩 백엔드 동등성(parity) + 처리량 비교 (torch vs onnx)
+# - 같은 텍스트(합성 코퍼스 passage + 질문 query)를 두 백엔드로 인코딩
+# - 텍스트별 코사인 유사도(min / p1 / mean)
+# - 질문별 top-k 검색 결과 일치율(두 백엔드 순위가 얼마나 같은지)
+# - normalize_embeddings=False 경로: 두 백엔드 모두 정규화 전 벡터를 돌려주는지(노름 비율)
+# - 백엔드별 처리량(texts/s)
+# - 기준 미달(--min-cos, --min-topk)이면 종료코드 1 → 모델/양자화 변경 시 회귀 확인용
+# - onnxruntime이 없어 torch로 폴백되면 "SKIP"을 출력하고 종료코드 2 (비교 없이 통과로 보이지 않게)
+#
+# 실행 (ai/ 디렉토리에서):
+#   python -m bench.embed_parity
+#   python -m bench.embed_parity --docs 400 --batch 64 --min-cos 0.98
+# ================================================================
+from __future__ import annotations
+
+import argparse, sys, time
+from typing import Dict, List
+
+import numpy as np
+
+from .common import ensure_ai_path, run_meta, write_result
+from .corpus import synthetic_corpus
+
+def _texts(n_docs: int, seed: int):
+    colls, questions = synthetic_corpus(n_docs, seed)
+    passages = [f"passage: {r['title']}\n{r['content']}" for recs in colls.values() for r in recs]
+    queries = [f"query: {q['query']}" for q in questions]
+    return passages, queries
+
+def _encode(model, texts: List[str], batch: int):
+    model.encode(texts[:batch], batch_size=batch)  # 웜업
+    t0 = time.perf_counter()
+    emb = model.encode(texts, batch_size=batch, convert_to_numpy=True, normalize_embeddings=True)
+    return np.asarray(emb, dtype=np.float32), time.perf_counter() - t0
+
+def _raw_norm_ratio(ref_model, new_model, texts: List[str], batch: int) -> Dict:
+    """normalize_embeddings=False → 두 백엔드의 노름이 같아야 함 (Normalize 모듈이 있는 모델이면 둘 다 1)"""
+    ref = np.linalg.norm(ref_model.encode(texts, batch_size=batch, normalize_embeddings=False), axis=1)
+    new = np.linalg.norm(new_model.encode(texts, batch_size=batch, normalize_embeddings=False), axis=1)
+    ratio = new / np.clip(ref, 1e-12, None)
+    return {"torch_mean_norm": round(float(ref.mean()), 4), "onnx_mean_norm": round(float(new.mean()), 4),
+            "max_ratio_err": round(float(np.abs(ratio - 1.0).max()), 5)}
+
+def _topk_agreement(q_ref, p_ref, q_new, p_new, k: int) -> float:
+    top_ref = np.argsort(-(q_ref @ p_ref.T), axis=1)[:, :k]
+    top_new = np.argsort(-(q_new @ p_new.T), axis=1)[:, :k]
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(top_ref, top_new)]))
+
+def main(argv=None) -> Dict:
+    ap = argparse.ArgumentParser(description="embedding backend parity (torch vs onnx)")
+    ap.add_argument("--model", help="기본: EMBEDDER_MODEL")
+    ap.add_argument("--docs", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--batch", type=int, default=32)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--min-cos", type=float, default=0.98, help="텍스트별 코사인 최소 허용값")
+    ap.add_argument("--min-topk", type=float, default=0.9, help="top-k 일치율 최소 허용값")
+    ap.add_argument("--max-norm-err", type=float, default=0.02, help="정규화 전 노름 비율 오차 최대 허용값")
+    ap.add_argument("--out")
+    args = ap.parse_args(argv)
+
+    ensure_ai_path()
+    from rag.embeddings import EMBEDDER_MODEL, get_embedder
+    model_name = args.model or EMBEDDER_MODEL
+
+    passages, queries = _texts(args.docs, args.seed)
+    texts = passages + queries
+    ref_model = get_embedder(model_name, "torch")
+    new_model = get_embedder(model_name, "onnx")
+    if type(new_model) is type(ref_model):
+        print("[parity] SKIP: onnx backend unavailable (fell back to torch) → nothing compared")
+        sys.exit(2)
+
+    ref, ref_s = _encode(ref_model, texts, args.batch)
+    new, new_s = _encode(new_model, texts, args.batch)
+
+    cos = np.sum(ref * new, axis=1)
+    np_, nq = len(passages), len(queries)
+    agree = _topk_agreement(ref[np_:], ref[:np_], new[np_:], new[:np_], args.k)
+    raw = _raw_norm_ratio(ref_model, new_model, texts[:args.batch], args.batch)
+    result = {
+        "meta": run_meta({"bench": "embed_parity", "model": model_name, "texts": len(texts),
+                          "batch": args.batch}),
+        "cosine": {"min": round(float(cos.min()), 5), "p1": round(float(np.percentile(cos, 1)), 5),
+                   "mean": round(float(cos.mean()), 5)},
+        f"top{args.k}_agreement": round(agree, 4),
+        "unnormalized": raw,
+        "throughput": {
+            "torch_texts_per_s": round(len(texts) / ref_s, 1),
+            "onnx_texts_per_s": round(len(texts) / new_s, 1),
+            "speedup": round(ref_s / new_s, 2),
+        },
+    }
+    print(f"[parity] passages={np_} queries={nq} cosine={result['cosine']} "
+          f"top{args.k}={result[f'top{args.k}_agreement']} unnormalized={raw} throughput={result['throughput']}")
+    path = write_result(result, args.out, "embed")
+    print(f"[parity] saved → {path}")
+
+    # 정규화 안 한 경로가 실제로 정규화되지 않았는지(노름 ≠ 1)도 확인
+    raw_ok = raw["max_ratio_err"] <= args.max_norm_err
+    ok = result["cosine"]["min"] >= args.min_cos and agree >= args.min_topk and raw_ok
+    if not ok:
+        print(f"[parity] FAIL (min_cos={args.min_cos}, min_topk={args.min_topk}, max_norm_err={args.max_norm_err})")
+        sys.exit(1)
+    return result
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,78 @@
+# ai/bench/fake_openai.py
+# ================================================================
+# 역할: 부하테스트용 가짜 OpenAI 호환 서버
+# - POST /v1/chat/completions (stream / non-stream)
+# - 토큰당 지연(--token-ms)과 첫 토큰 지연(--ttft-ms)으로 실제 LLM 응답 시간 흉내
+# - 네트워크/비용 없이 /chat, /rag/chat, /voice-chat 경로 부하 측정 가능
+#
+# 실행 (ai/ 디렉토리에서):
+#   python -m bench.fake_openai --port 9100 --ttft-ms 300 --token-ms 15 --tokens 80
+# ================================================================
+from __future__ import annotations
+
+import argparse, asyncio, json, time, uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+FAKE = {"ttft_ms": 300.0, "token_ms": 15.0, "tokens": 80}
+_WORDS = ["안녕하세요", "문의하신", "내용은", "학사", "규정에", "따라", "처리됩니다", "자세한", "사항은", "학과", "사무실로", "문의해", "주세요."]
+
+app = FastAPI(title="fake-openai")
+
+def _tokens(n: int):
+    return [_WORDS[i % len(_WORDS)] + " " for i in range(n)]
+
+def _n_tokens(body: dict) -> int:
+    max_tokens = body.get("max_tokens") or FAKE["tokens"]
+    return max(1, min(int(max_tokens), int(FAKE["tokens"])))
+
+@app.get("/v1/models")
+def models():
+    return {"object": "list", "data": [{"id": "fake-gpt", "object": "model"}]}
+
+@app.post("/v1/chat/completions")
+async def chat_completions(req: Request):
+    body = await req.json()
+    n = _n_tokens(body)
+    model = body.get("model") or "fake-gpt"
+    cid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+
+    if body.get("stream"):
+        async def gen():
+            await asyncio.sleep(FAKE["ttft_ms"] / 1000.0)
+            for tok in _tokens(n):
+                chunk = {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [{"index": 0, "delta": {"content": tok}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                await asyncio.sleep(FAKE["token_ms"] / 1000.0)
+            done = {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            yield f"data: {json.dumps(done)}\n\n"
+            yield "data: [DONE]\n\n"
+        return StreamingResponse(gen(), media_type="text/event-stream")
+
+    await asyncio.sleep((FAKE["ttft_ms"] + FAKE["token_ms"] * n) / 1000.0)
+    return {
+        "id": cid, "object": "chat.completion", "created": created, "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(_tokens(n)).strip()},
+                     "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": n, "total_tokens": n},
+    }
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="fake OpenAI-compatible server")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=9100)
+    ap.add_argument("--ttft-ms", type=float, default=FAKE["ttft_ms"])
+    ap.add_argument("--token-ms", type=float, default=FAKE["token_ms"])
+    ap.add_argument("--tokens", type=int, default=FAKE["tokens"])
+    args = ap.parse_args(argv)
+    FAKE.update(ttft_ms=args.ttft_ms, token_ms=args.token_ms, tokens=args.tokens)
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
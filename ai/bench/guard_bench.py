@@ -0,0 +1,127 @@
+# ai/bench/guard_bench.py
+# ================================================================
+# 역할: 정책 가드(stt-tts-sample/guard.py) 메시지당 검사 비용 측정
+# - legacy: 단어마다 `w in text` + PII 패턴마다 re.search (이전 구현)
+# - compiled: guard.WordGuard(Aho–Corasick 1개) + 합친 PII 정규식 1개
+# - 금지어 수(N)를 늘려가며 µs/메시지 비교 → 단어 목록이 커져도 비용이 일정한지 확인
+# - 금지어는 합성 한글 단어(seed 고정), 메시지는 일반 채팅 문장(대부분 통과)
+# - 정확도 회귀: CASES(오탐/미탐 사례)를 기본 금지어 목록으로 검사 → 하나라도 틀리면 종료코드 1
+#
+# 실행 (ai/ 디렉토리에서):
+#   python -m bench.guard_bench
+#   python -m bench.guard_bench --words 5,1000,20000 --rounds 20
+# ================================================================
+from __future__ import annotations
+
+import argparse, os, random, re, sys, time
+from typing import Dict, List
+
+from .common import AI_DIR, run_meta, write_result
+
+MESSAGES = [
+    "안녕하세요 컴퓨터공학과 졸업 요건 알려주세요",
+    "월요일 3교시 수업 어디서 해요?",
+    "장학금 신청 기간이 언제까지인가요",
+    "도서관 몇 시까지 열어요",
+    "이번 학기 수강신청 정정 기간 알려줘",
+    "김교수님 연구실 위치가 궁금합니다",
+    "기숙사 입사 서류는 뭐가 필요한가요?",
+    "What time does the library close today?",
+    "제 번호는 010-1234-5678 입니다",
+    "씨 발 진짜 왜 안돼",
+]
+
+# (문장, 기대 결과) — 어절을 넘는 매칭 오탐, 어절 안 우회 표기·1글자씩 띄어 쓰기 미탐
+CASES = [
+    ("아저씨 발표 언제야?", False),
+    ("공개 새 소식 알려줘", False),
+    ("개 새로 왔어", False),
+    ("조조 영화 몇 시야", False),
+    ("시발점이 어디야", False),
+    ("this is hit", False),
+    ("씨.발", True),
+    ("씨 발", True),
+    ("개 새 끼", True),
+    ("씨1발 왜 안돼", True),
+    ("씨ㅂ알", True),
+    ("ｆｕｃｋ", True),
+    ("제 번호는 010-1234-5678", True),
+]
+
+def _words(n: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    base = ["씨발", "좆", "개새", "fuck", "shit"]
+    out = set(base)
+    while len(out) < n:
+        out.add("".join(chr(0xAC00 + rng.randrange(11172)) for _ in range(rng.randint(2, 4))))
+    return list(out)[:max(n, len(base))]
+
+def _legacy(words: List[str]):
+    patterns = [r"\b\d{3}-\d{2}-\d{5}\b", r"\b010-\d{4}-\d{4}\b",
+                r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+"]
+
+    def check(text: str) -> bool:
+        t = text.lower()
+        if any(w in t for w in words):
+            return True
+        return any(re.search(p, text) for p in patterns)
+    return check
+
+def _per_msg_us(check, rounds: int) -> float:
+    for m in MESSAGES:  # 웜업
+        check(m)
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for m in MESSAGES:
+            check(m)
+    return (time.perf_counter() - t0) / (rounds * len(MESSAGES)) * 1e6
+
+def main(argv=None) -> Dict:
+    ap = argparse.ArgumentParser(description="policy guard cost per message (legacy vs compiled)")
+    ap.add_argument("--words", default="5,1000,5000,20000", help="금지어 수(콤마 구분)")
+    ap.add_argument("--rounds", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out")
+    args = ap.parse_args(argv)
+
+    sys.path.insert(0, os.path.join(AI_DIR, "stt-tts-sample"))
+    import guard
+
+    wrong = [(text, want) for text, want in CASES if guard.violates_policy(text) != want]
+    for text, want in wrong:
+        print(f"[guard] MISMATCH {text!r}: expected {want}")
+
+    rows = []
+    for n in [int(x) for x in args.words.split(",") if x.strip()]:
+        words = _words(n, args.seed)
+        t0 = time.perf_counter()
+        wg = guard.WordGuard(words)
+        build_ms = (time.perf_counter() - t0) * 1000
+
+        def compiled(text: str, wg=wg) -> bool:
+            return bool(wg.scan(text, first=True)) or guard.PII_RE.search(text) is not None
+
+        row = {
+            "words": len(words),
+            "build_ms": round(build_ms, 1),
+            "legacy_us": round(_per_msg_us(_legacy(words), args.rounds), 1),
+            "compiled_us": round(_per_msg_us(compiled, args.rounds), 1),
+        }
+        rows.append(row)
+        print(f"[guard] words={row['words']:>6} build={row['build_ms']}ms "
+              f"legacy={row['legacy_us']}µs compiled={row['compiled_us']}µs")
+
+    result = {
+        "meta": run_meta({"bench": "guard", "messages": len(MESSAGES), "rounds": args.rounds}),
+        "cases": {"total": len(CASES), "wrong": [t for t, _ in wrong]},
+        "results": rows,
+    }
+    path = write_result(result, args.out, "guard")
+    print(f"[guard] saved → {path}")
+    if wrong:
+        print(f"[guard] FAIL ({len(wrong)}/{len(CASES)} cases)")
+        sys.exit(1)
+    return result
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
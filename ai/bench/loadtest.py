@@ -0,0 +1,194 @@
+# ai/bench/loadtest.py
+# ================================================================
+# 🔥 역할: 통합 서버 HTTP 표면(/chat, /rag/chat, /stt, /tts, /voice-chat) 부하 생성기
+# - 엔드포인트별 · 동시성 단계별 closed-loop 부하 (httpx async)
+# - 처리량(req/s), 지연 p50/p95/p99, 오류 수, 서버 이벤트 루프 lag(/__bench/lag)
+# - 동시성을 올려도 처리량이 늘지 않는 지점을 saturation으로 보고
+# - --spawn: fake_openai + serve_stubbed 를 하위 프로세스로 띄워 완전 로컬 재현
+#
+# 실행 (ai/ 디렉토리에서):
+#   python -m bench.loadtest --spawn --fake-stt --endpoints chat,rag_chat,tts --concurrency 1,4,16
+#   python -m bench.loadtest --base http://127.0.0.1:9000 --duration 20
+# ================================================================
+from __future__ import annotations
+
+import argparse, asyncio, subprocess, sys, time
+from typing import Dict, List, Optional
+
+import httpx
+
+from .common import AI_DIR, percentiles, peak_rss_mb, run_meta, write_result
+from .serve_stubbed import SAMPLE_MP3
+
+QUERIES = [
+    "휴학 신청 기간이 언제야?",
+    "등록확인예치금은 얼마인가요?",
+    "컴퓨터소프트웨어공학과 학과 사무실 전화번호 알려줘",
+    "성적우수장학금 금액이 얼마야?",
+]
+TTS_TEXT = "휴학 신청은 학기 시작 전까지 학사지원팀에 제출하시면 됩니다."
+
+def _request_kwargs(name: str, i: int, audio: bytes) -> Dict:
+    q = QUERIES[i % len(QUERIES)]
+    if name == "chat":
+        return {"method": "POST", "url": "/chat", "json": {"text": q}}
+    if name == "rag_chat":
+        return {"method": "POST", "url": "/rag/chat", "json": {"query": q}}
+    if name == "tts":
+        return {"method": "POST", "url": "/tts", "json": {"text": TTS_TEXT}}
+    if name == "stt":
+        return {"method": "POST", "url": "/stt", "files": {"file": ("q.mp3", audio, "audio/mpeg")}}
+    if name == "voice_chat":
+        return {"method": "POST", "url": "/voice-chat", "files": {"file": ("q.mp3", audio, "audio/mpeg")}}
+    raise ValueError(f"unknown endpoint: {name}")
+
+ENDPOINTS = ("chat", "rag_chat", "stt", "tts", "voice_chat")
+
+async def _lag(client: httpx.AsyncClient, reset: bool) -> Optional[Dict]:
+    try:
+        r = await client.get("/__bench/lag", params={"reset": str(reset).lower()}, timeout=5)
+        return r.json() if r.status_code == 200 else None
+    except Exception:
+        return None
+
+async def run_phase(client: httpx.AsyncClient, name: str, concurrency: int,
+                    duration_s: float, audio: bytes) -> Dict:
+    await _lag(client, reset=True)
+    lat: List[float] = []
+    errors: Dict[str, int] = {}
+    counter = 0
+    deadline = time.perf_counter() + duration_s
+
+    async def worker():
+        nonlocal counter
+        while time.perf_counter() < deadline:
+            counter += 1
+            kw = _request_kwargs(name, counter, audio)
+            t0 = time.perf_counter()
+            try:
+                r = await client.request(**kw)
+                ok = r.status_code < 400
+                key = str(r.status_code)
+            except Exception as e:
+                ok, key = False, type(e).__name__
+            if ok:
+                lat.append((time.perf_counter() - t0) * 1000.0)
+            else:
+                errors[key] = errors.get(key, 0) + 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+    return {
+        "concurrency": concurrency,
+        "ok": len(lat),
+        "errors": errors,
+        "rps": round(len(lat) / wall, 2) if wall else 0.0,
+        "latency_ms": percentiles(lat),
+        "loop_lag_ms": await _lag(client, reset=True),
+    }
+
+def _saturation(rows: List[Dict], min_gain: float = 1.1) -> Optional[int]:
+    """처리량이 직전 단계 대비 min_gain배 미만으로 늘면 직전 동시성에서 포화로 판단"""
+    for prev, cur in zip(rows, rows[1:]):
+        if prev["rps"] and cur["rps"] < prev["rps"] * min_gain:
+            return prev["concurrency"]
+    return None
+
+# ---------------- 로컬 stub 서버 기동 ----------------
+def _wait_http(url: str, timeout_s: float = 180.0) -> None:
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=2).status_code < 500:
+                return
+        except Exception:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"server not ready: {url}")
+
+def _spawn(args) -> List[subprocess.Popen]:
+    py = sys.executable
+    llm_port = args.llm_port
+    procs = [subprocess.Popen(
+        [py, "-m", "bench.fake_openai", "--port", str(llm_port),
+         "--ttft-ms", str(args.llm_ttft_ms), "--token-ms", str(args.llm_token_ms)],
+        cwd=AI_DIR,
+    )]
+    _wait_http(f"http://127.0.0.1:{llm_port}/v1/models")
+
+    port = int(args.base.rsplit(":", 1)[-1].split("/")[0])
+    cmd = [py, "-m", "bench.serve_stubbed", "--port", str(port),
+           "--llm-url", f"http://127.0.0.1:{llm_port}/v1"]
+    if args.fake_stt:
+        cmd.append("--fake-stt")
+    if args.chroma_dir:
+        cmd += ["--chroma-dir", args.chroma_dir]
+    procs.append(subprocess.Popen(cmd, cwd=AI_DIR))
+    _wait_http(f"{args.base}/health")
+    return procs
+
+# ---------------- main ----------------
+async def _run(args) -> Dict:
+    with open(SAMPLE_MP3, "rb") as f:
+        audio = f.read()
+    names = [n.strip() for n in args.endpoints.split(",") if n.strip()]
+    levels = [int(x) for x in args.concurrency.split(",") if x.strip()]
+
+    limits = httpx.Limits(max_connections=max(levels) * 2, max_keepalive_connections=max(levels) * 2)
+    results: Dict[str, Dict] = {}
+    async with httpx.AsyncClient(base_url=args.base, timeout=args.timeout, limits=limits) as client:
+        for name in names:
+            rows = []
+            for c in levels:
+                row = await run_phase(client, name, c, args.duration, audio)
+                print(f"[load] {name:<10} c={c:<3} rps={row['rps']:<8} "
+                      f"p50={row['latency_ms']['p50']:<9} p99={row['latency_ms']['p99']:<9} "
+                      f"err={sum(row['errors'].values())} lag_p99={(row['loop_lag_ms'] or {}).get('p99')}")
+                rows.append(row)
+            results[name] = {"levels": rows, "saturation_concurrency": _saturation(rows)}
+    return results
+
+def main(argv=None) -> Dict:
+    ap = argparse.ArgumentParser(description="HTTP load test for the combined voice/chat app")
+    ap.add_argument("--base", default="http://127.0.0.1:9000")
+    ap.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    ap.add_argument("--concurrency", default="1,4,16")
+    ap.add_argument("--duration", type=float, default=10.0, help="단계별 측정 시간(초)")
+    ap.add_argument("--timeout", type=float, default=120.0)
+    ap.add_argument("--spawn", action="store_true", help="fake_openai + serve_stubbed 자동 기동")
+    ap.add_argument("--fake-stt", action="store_true")
+    ap.add_argument("--chroma-dir")
+    ap.add_argument("--llm-port", type=int, default=9100)
+    ap.add_argument("--llm-ttft-ms", type=float, default=300.0)
+    ap.add_argument("--llm-token-ms", type=float, default=15.0)
+    ap.add_argument("--out")
+    args = ap.parse_args(argv)
+
+    procs = _spawn(args) if args.spawn else []
+    try:
+        endpoints = asyncio.run(_run(args))
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+    result = {
+        "meta": run_meta({
+            "bench": "load", "base": args.base, "duration_s": args.duration,
+            "spawned": args.spawn, "fake_stt": args.fake_stt,
+            "llm_ttft_ms": args.llm_ttft_ms, "llm_token_ms": args.llm_token_ms,
+        }),
+        "endpoints": endpoints,
+        "client_peak_rss_mb": peak_rss_mb(),
+    }
+    path = write_result(result, args.out, "load")
+    print(f"[load] saved → {path}")
+    return result
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,225 @@
+# ai/bench/rag_bench.py
+# ================================================================
+# 🧪 역할: RAG 스택 오프라인 벤치마크 / 회귀 측정
+# - 임시 Chroma 디렉토리 + 합성 한국어 코퍼스(mongomock) + 번들 PDF로 인덱스 구성
+# - 측정 항목
+#   · ingest: PDF/Mongo 각각 처리 시간, chunks/sec, 최종 벡터 수
+#   · query : retriever.retrieve 지연 p50/p95/p99, 동시성별 QPS
+#   · recall: 라벨 질문셋 recall@k, MRR
+#   · ask   : (옵션) ask_question 지연 + 컨텍스트 길이 (stub LLM 사용)
+#   · memory: 단계별 최대 RSS
+# - 결과는 JSON으로 저장 → bench/compare.py로 커밋 간 비교
+#
+# 실행 (ai/ 디렉토리에서):
+#   python -m bench.rag_bench --docs 400 --concurrency 1,4,8 --ask
+#   python -m bench.rag_bench --env CHUNK_SIZE=500 --out /tmp/chunk500.json
+# ================================================================
+from __future__ import annotations
+
+import argparse, os, shutil, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from .common import ensure_ai_path, percentiles, peak_rss_mb, run_meta, write_result
+from .corpus import PDF_PATH, pdf_questions, synthetic_corpus
+
+BENCH_COLLECTION = "bench_corpus"
+
+def _parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="RAG offline benchmark")
+    ap.add_argument("--workdir", help="Chroma 디렉토리(기본: 임시 디렉토리, 종료 시 삭제)")
+    ap.add_argument("--docs", type=int, default=400, help="합성 Mongo 레코드 수")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--no-pdf", action="store_true", help="번들 PDF 인덱싱 생략")
+    ap.add_argument("--k", type=int, default=6, help="retrieve top-k")
+    ap.add_argument("--recall-k", default="1,3,5", help="recall@k 목록")
+    ap.add_argument("--concurrency", default="1,4", help="동시성 단계 목록")
+    ap.add_argument("--rounds", type=int, default=2, help="질문셋 반복 횟수(지연 측정)")
+    ap.add_argument("--ask", action="store_true", help="ask_question(stub LLM) 지연 측정")
+    ap.add_argument("--ask-n", type=int, default=20, help="ask_question 측정 질문 수")
+    ap.add_argument("--env", action="append", default=[], help="KEY=VALUE (rag import 전에 적용)")
+    ap.add_argument("--out", help="결과 JSON 경로")
+    return ap.parse_args(argv)
+
+def _prepare_env(workdir: str, overrides: List[str]) -> Dict[str, str]:
+    """rag.config가 import 시점에 환경변수를 읽으므로 import 전에 세팅"""
+    env = {
+        "CHROMA_DIR": workdir,
+        "COLLECTION_NAME": BENCH_COLLECTION,
+        "ACTIVE_NAME_FILE": os.path.join(workdir, "ACTIVE_COLLECTION.txt"),
+        "MONGO_COLL": "*",
+        "MONGO_INCREMENTAL": "false",
+        "ANONYMIZED_TELEMETRY": "False",
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY") or "sk-bench-stub",
+    }
+    for kv in overrides:
+        k, _, v = kv.partition("=")
+        if k.strip():
+            env[k.strip()] = v
+    os.environ.update(env)
+    return env
+
+def _ms_since(t0: float) -> float:
+    return (time.perf_counter() - t0) * 1000.0
+
+# ---------------- 단계별 측정 ----------------
+def bench_ingest(ingest, colls, use_pdf: bool) -> Dict:
+    from rag import projection
+    from rag.store import get_client, get_collection
+    from .stubs import mongomock_db
+
+    out: Dict = {}
+    t0 = time.perf_counter()
+    model = ingest.embedder()
+    out["model_load_s"] = round(time.perf_counter() - t0, 3)
+    # 결과가 어떤 임베더로 나온 숫자인지 기록 (multilingual-e5-small = 384차원)
+    out["embedder"] = {"model": ingest.EMBEDDER_MODEL, "dim": int(model.get_sentence_embedding_dimension())}
+
+    if use_pdf and os.path.exists(PDF_PATH):
+        t0 = time.perf_counter()
+        res = ingest.ingest_pdfs([PDF_PATH])
+        dt = time.perf_counter() - t0
+        n = sum(r.get("chunks", 0) for r in res.get("pdf_results", []))
+        out["pdf"] = {"seconds": round(dt, 3), "chunks": n, "chunks_per_s": round(n / dt, 2) if dt else 0.0}
+
+    db = mongomock_db(colls)
+    ingest._connect_db = lambda: db  # 로컬 mongomock으로 대체
+    t0 = time.perf_counter()
+    res = ingest.ingest_mongo_all()
+    dt = time.perf_counter() - t0
+    n = res.get("mongo_total", 0)
+    out["mongo"] = {
+        "seconds": round(dt, 3), "chunks": n, "chunks_per_s": round(n / dt, 2) if dt else 0.0,
+        "records": sum(len(v) for v in colls.values()),
+    }
+
+    col = get_collection(get_client(ingest.CHROMA_DIR), name=ingest.COLLECTION_NAME)
+    out["vectors"] = col.count()
+    # EMBED_DIM이 실제로 적용됐는지 (빈 컬렉션에 학습 개수 이상이 처음 들어가야 PCA 학습)
+    proj = projection.load(col.name)
+    out["projection"] = {"dim": proj.dim, "explained": round(proj.explained, 4)} if proj else None
+    out["peak_rss_mb"] = peak_rss_mb()
+    return out
+
+def _is_hit(chunk: Dict, label: Dict) -> bool:
+    meta = chunk.get("meta") or {}
+    if "source_ids" in label:
+        return str(meta.get("source_id")) in label["source_ids"]
+    if "page" in label:
+        if label.get("title") and meta.get("title") != label["title"]:
+            return False
+        try:
+            return int(meta.get("page") or 0) == int(label["page"])
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def bench_recall(retrieve, questions: List[Dict], ks: List[int]) -> Dict:
+    kmax = max(ks)
+    hits = {k: 0 for k in ks}
+    rr = 0.0
+    for qa in questions:
+        chunks = retrieve(qa["query"], k=kmax)
+        rank = next((i for i, c in enumerate(chunks) if _is_hit(c, qa["label"])), None)
+        if rank is None:
+            continue
+        rr += 1.0 / (rank + 1)
+        for k in ks:
+            if rank < k:
+                hits[k] += 1
+    n = len(questions) or 1
+    out = {f"recall@{k}": round(hits[k] / n, 4) for k in ks}
+    out["mrr"] = round(rr / n, 4)
+    out["questions"] = len(questions)
+    return out
+
+def bench_query(retrieve, queries: List[str], k: int, levels: List[int]) -> List[Dict]:
+    def timed(q: str) -> float:
+        t0 = time.perf_counter()
+        retrieve(q, k=k)
+        return _ms_since(t0)
+
+    retrieve(queries[0], k=k)  # 웜업(모델/컬렉션 로드)
+    out = []
+    for c in levels:
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=c) as ex:
+            lat = list(ex.map(timed, queries))
+        wall = time.perf_counter() - t0
+        out.append({"concurrency": c, "n": len(lat), "qps": round(len(lat) / wall, 2), **percentiles(lat)})
+    return out
+
+def bench_ask(questions: List[Dict], n: int, k: int) -> Dict:
+    from rag import refactored_rag
+    from rag.tokens import count_tokens
+    from .stubs import stub_chat_model
+
+    refactored_rag.llm = stub_chat_model()
+    lat, ctx_chars, ctx_tokens, n_sources = [], [], [], []
+    for qa in questions[:n]:
+        t0 = time.perf_counter()
+        res = refactored_rag.ask_question(qa["query"], k=k)
+        lat.append(_ms_since(t0))
+        srcs = res.get("sources") or []
+        n_sources.append(len(srcs))
+        ctx_chars.append(sum(len(s.get("text") or "") for s in srcs))
+        ctx_tokens.append(sum(count_tokens(s.get("text") or "") for s in srcs))
+    m = len(lat) or 1
+    return {
+        "n": len(lat), **percentiles(lat),
+        "context_chars_mean": round(sum(ctx_chars) / m, 1),
+        "context_tokens_mean": round(sum(ctx_tokens) / m, 1),
+        "sources_mean": round(sum(n_sources) / m, 2),
+    }
+
+# ---------------- main ----------------
+def main(argv=None) -> Dict:
+    args = _parse_args(argv)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="rag_bench_")
+    env = _prepare_env(workdir, args.env)
+    ensure_ai_path()
+
+    from rag import ingest, retriever
+
+    ks = [int(x) for x in args.recall_k.split(",") if x.strip()]
+    levels = [int(x) for x in args.concurrency.split(",") if x.strip()]
+    colls, questions = synthetic_corpus(args.docs, args.seed)
+    if not args.no_pdf:
+        questions = questions + pdf_questions()
+
+    result: Dict = {"meta": run_meta({
+        "bench": "rag",
+        "docs": args.docs, "seed": args.seed, "k": args.k,
+        "env": {k: v for k, v in env.items() if k != "OPENAI_API_KEY"},
+    })}
+    try:
+        print(f"[bench] workdir={workdir} docs={args.docs} questions={len(questions)}")
+        result["ingest"] = bench_ingest(ingest, colls, not args.no_pdf)
+        print(f"[bench] ingest {result['ingest']}")
+
+        result["recall"] = bench_recall(retriever.retrieve, questions, ks)
+        print(f"[bench] recall {result['recall']}")
+
+        queries = [qa["query"] for qa in questions] * max(1, args.rounds)
+        result["query"] = bench_query(retriever.retrieve, queries, args.k, levels)
+        for row in result["query"]:
+            print(f"[bench] query {row}")
+
+        if args.ask:
+            try:
+                result["ask"] = bench_ask(questions, args.ask_n, min(args.k, 3))
+                print(f"[bench] ask {result['ask']}")
+            except ImportError as e:
+                result["ask"] = {"skipped": f"{type(e).__name__}: {e}"}
+
+        result["memory"] = {"peak_rss_mb": peak_rss_mb()}
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    path = write_result(result, args.out, "rag")
+    print(f"[bench] saved → {path}")
+    return result
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
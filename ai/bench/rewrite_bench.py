@@ -0,0 +1,129 @@
+# ai/bench/rewrite_bench.py
+# ================================================================
+# 역할: 후속 질문 재작성(rag/rewrite.py) 회귀 사례 + 검색 recall 비교
+# - CASES: (이전 질문, 후속 질문, 기대 검색 질의 | None=그대로) — LLM 없이 규칙만으로 검사
+#   단독 질문("혹시 도서관 운영시간 알아?")은 재작성 대상이 아니어야 함(LLM 호출도 없음)
+#   → 하나라도 틀리면 종료코드 1
+# - --recall: 합성 코퍼스(bench.corpus)를 임시 Chroma에 인덱싱하고 후속 질문 쌍으로 recall@k 비교
+#     "<학과> A 기간이 언제야?" → "그럼 B은?" (정답 = "<학과> B 기간이 언제야?"의 라벨)
+#     original(단독 질문) / raw(후속 질문 그대로) / concat(이전 질문 + 후속) / rewrite(현재 규칙)
+#
+# 실행 (ai/ 디렉토리에서):
+#   python -m bench.rewrite_bench
+#   python -m bench.rewrite_bench --recall --docs 400
+# ================================================================
+from __future__ import annotations
+
+import argparse, re, shutil, sys, tempfile
+from typing import Dict, List
+
+from .common import ensure_ai_path, run_meta, write_result
+
+PREV = "기계공학과 휴학 신청 기간이 언제야?"
+CASES = [
+    (PREV, "혹시 도서관 운영시간 알아?", None),
+    (PREV, "또 장학금 종류 알려줘", None),
+    (PREV, "도서관 운영시간은?", None),
+    (PREV, "컴퓨터공학과 졸업요건은?", None),
+    ("휴학 신청 기간이 언제야?", "그럼 병결은?", "병결 신청 기간"),
+    (PREV, "그럼 복학 신청은?", "기계공학과 복학 신청 기간"),
+    (PREV, "그럼 병결 서류 제출은?", "기계공학과 병결 서류 제출 기간"),
+    (PREV, "그럼 컴퓨터공학과는?", "컴퓨터공학과 휴학 신청 기간"),
+    ("수강 결과 확인 방법은?", "그럼 성적은?", "성적 확인 방법"),
+]
+_NOTICE_Q = re.compile(r"^(\S+) (.+) 기간이 언제야\?$")
+
+def _history(prev: str) -> List[Dict]:
+    return [{"role": "user", "content": prev}, {"role": "assistant", "content": "..."}]
+
+def _topic_particle(word: str) -> str:
+    last = word[-1]
+    has_final = "가" <= last <= "힣" and (ord(last) - 0xAC00) % 28 != 0
+    return "은" if has_final else "는"
+
+def followup_pairs(questions: List[Dict]) -> List[Dict]:
+    """같은 학과의 다른 일정 질문을 이전 질문으로 삼은 후속 질문 쌍"""
+    by_dept: Dict[str, List[tuple]] = {}
+    for qa in questions:
+        m = _NOTICE_Q.match(qa["query"])
+        if m:
+            by_dept.setdefault(m.group(1), []).append((m.group(2), qa))
+    pairs = []
+    for items in by_dept.values():
+        for i, (event, qa) in enumerate(items):
+            prev = next((o["query"] for e, o in items[i + 1:] + items[:i] if e != event), None)
+            if prev:
+                pairs.append({"prev": prev, "followup": f"그럼 {event}{_topic_particle(event)}?",
+                              "original": qa["query"], "label": qa["label"]})
+    return pairs
+
+def check_cases(rewrite) -> List[str]:
+    wrong = []
+    for prev, query, want in CASES:
+        got = rewrite.standalone(query, _history(prev), llm=None)
+        expect = want if want is not None else rewrite._norm(query)
+        if got["query"] != expect or (want is None and rewrite.needs_rewrite(query)):
+            wrong.append(query)
+            print(f"[rewrite] MISMATCH {prev!r} → {query!r}: expected {expect!r}, got {got['query']!r}")
+    return wrong
+
+def bench_followup_recall(args) -> Dict:
+    from .corpus import synthetic_corpus
+    from .rag_bench import _is_hit, _prepare_env, bench_ingest
+
+    workdir = tempfile.mkdtemp(prefix="rewrite_bench_")
+    _prepare_env(workdir, args.env)
+    try:
+        from rag import ingest, retriever, rewrite
+
+        colls, questions = synthetic_corpus(args.docs, args.seed)
+        pairs = followup_pairs(questions)
+        indexed = bench_ingest(ingest, colls, use_pdf=False)
+        variants = {
+            "original": lambda p: p["original"],
+            "raw": lambda p: p["followup"],
+            "concat": lambda p: f"{p['prev']} {p['followup']}",
+            "rewrite": lambda p: rewrite.standalone(p["followup"], _history(p["prev"]), llm=None)["query"],
+        }
+        out: Dict = {"pairs": len(pairs), "embedder": indexed["embedder"]}
+        for name, make in variants.items():
+            hits = {1: 0, 5: 0}
+            for p in pairs:
+                chunks = retriever.retrieve(make(p), k=5)
+                rank = next((i for i, c in enumerate(chunks) if _is_hit(c, p["label"])), None)
+                for k in hits:
+                    hits[k] += rank is not None and rank < k
+            out[name] = {f"recall@{k}": round(v / max(len(pairs), 1), 3) for k, v in hits.items()}
+            print(f"[rewrite] {name:<8} {out[name]}")
+        out["by_rule"] = sum(rewrite.standalone(p["followup"], _history(p["prev"]), llm=None)["method"] == "rule"
+                             for p in pairs)
+        return out
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def main(argv=None) -> Dict:
+    ap = argparse.ArgumentParser(description="follow-up rewrite cases + follow-up retrieval recall")
+    ap.add_argument("--recall", action="store_true", help="합성 코퍼스로 recall 비교(임베딩 모델 필요)")
+    ap.add_argument("--docs", type=int, default=400)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--env", action="append", default=[], help="KEY=VALUE (rag import 전에 적용)")
+    ap.add_argument("--out")
+    args = ap.parse_args(argv)
+
+    result: Dict = {"meta": run_meta({"bench": "rewrite", "docs": args.docs, "seed": args.seed})}
+    if args.recall:
+        result["recall"] = bench_followup_recall(args)
+    ensure_ai_path()
+    from rag import rewrite
+
+    wrong = check_cases(rewrite)
+    result["cases"] = {"total": len(CASES), "wrong": wrong}
+    path = write_result(result, args.out, "rewrite")
+    print(f"[rewrite] saved → {path}")
+    if wrong:
+        print(f"[rewrite] FAIL ({len(wrong)}/{len(CASES)} cases)")
+        sys.exit(1)
+    return result
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
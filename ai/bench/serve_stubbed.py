@@ -0,0 +1,166 @@
+# ai/bench/serve_stubbed.py
+# ================================================================
+# 역할: 통합 서버(ai/stt-tts-sample/app.py)를 로컬 대체물과 함께 기동 (부하테스트용)
+# - LLM   : OPENAI_BASE_URL → bench/fake_openai.py
+# - TTS   : edge_tts.Communicate → 가짜(고정 MP3 바이트, 글자당 지연)
+# - Mongo : pymongo.MongoClient → mongomock(공유 스토어) + 합성 코퍼스 적재
+# - STT   : (옵션 --fake-stt) faster_whisper.WhisperModel → 가짜(세그먼트당 CPU 점유)
+# - 이벤트 루프 지연(lag) 샘플러 + GET /__bench/lag 엔드포인트 추가
+#
+# 실행 (ai/ 디렉토리에서):
+#   python -m bench.fake_openai --port 9100 &
+#   python -m bench.serve_stubbed --port 9000 --fake-stt
+# ================================================================
+from __future__ import annotations
+
+import argparse, asyncio, functools, importlib.util, os, sys, time
+from typing import List
+
+from .common import AI_DIR, ensure_ai_path, percentiles
+
+STT_DIR = os.path.join(AI_DIR, "stt-tts-sample")
+SAMPLE_MP3 = os.path.join(STT_DIR, "direct_test.mp3")
+
+# ---------------- 가짜 edge-tts ----------------
+class FakeCommunicate:
+    """edge_tts.Communicate 대체: 글자 수에 비례한 지연 후 고정 MP3 청크 반환"""
+    ms_per_char = 2.0
+    chunk_size = 4096
+    _audio = b""
+
+    def __init__(self, text: str, voice: str = "", **kwargs):
+        self.text = text or ""
+
+    async def stream(self):
+        if not FakeCommunicate._audio:
+            with open(SAMPLE_MP3, "rb") as f:
+                FakeCommunicate._audio = f.read()
+        await asyncio.sleep(len(self.text) * self.ms_per_char / 1000.0)
+        data = FakeCommunicate._audio
+        for i in range(0, len(data), self.chunk_size):
+            yield {"type": "audio", "data": data[i:i + self.chunk_size]}
+
+# ---------------- 가짜 faster-whisper ----------------
+class _Seg:
+    __slots__ = ("text", "start", "end")
+    def __init__(self, text: str, start: float, end: float):
+        self.text, self.start, self.end = text, start, end
+
+class _Info:
+    language = "ko"
+
+class FakeWhisperModel:
+    """WhisperModel 대체: 세그먼트마다 time.sleep으로 CPU 디코딩 시간 흉내(동기 블로킹)"""
+    ms_per_segment = 150.0
+    segments = ["휴학 신청 기간이", "언제인지 알려주세요"]
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def transcribe(self, audio, **kwargs):
+        def gen():
+            for i, text in enumerate(self.segments):
+                time.sleep(self.ms_per_segment / 1000.0)
+                yield _Seg(text, float(i), float(i + 1))
+        return gen(), _Info()
+
+# ---------------- 이벤트 루프 lag 샘플러 ----------------
+class LoopLagMonitor:
+    """interval마다 sleep 후 초과 지연(ms)을 기록 → 블로킹 작업이 루프를 막는 정도"""
+    def __init__(self, interval_s: float = 0.05):
+        self.interval_s = interval_s
+        self.samples: List[float] = []
+
+    async def run(self):
+        while True:
+            t0 = time.perf_counter()
+            await asyncio.sleep(self.interval_s)
+            self.samples.append(max(0.0, (time.perf_counter() - t0 - self.interval_s) * 1000.0))
+
+    def snapshot(self, reset: bool = False) -> dict:
+        s, n = list(self.samples), len(self.samples)
+        if reset:
+            self.samples.clear()
+        return {"samples": n, **percentiles(s)}
+
+# ---------------- 패치/기동 ----------------
+def _install_fakes(args) -> None:
+    import edge_tts
+    FakeCommunicate.ms_per_char = args.tts_ms_per_char
+    edge_tts.Communicate = FakeCommunicate
+
+    if args.fake_stt:
+        import faster_whisper
+        FakeWhisperModel.ms_per_segment = args.stt_ms
+        faster_whisper.WhisperModel = FakeWhisperModel
+
+    if args.mongo == "mongomock":
+        import mongomock, pymongo
+        from mongomock.store import ServerStore
+        from .corpus import synthetic_corpus
+        shared = functools.partial(mongomock.MongoClient, _store=ServerStore())
+        pymongo.MongoClient = shared
+        db = shared()[os.environ["MONGO_DB"]]
+        colls, _ = synthetic_corpus(args.docs)
+        for cname, records in colls.items():
+            db[cname].insert_many(records)
+
+def _load_app():
+    """하이픈 디렉토리(stt-tts-sample)라 패키지 import 불가 → 파일 경로로 로드"""
+    if STT_DIR not in sys.path:
+        sys.path.insert(0, STT_DIR)
+    spec = importlib.util.spec_from_file_location("stt_tts_app", os.path.join(STT_DIR, "app.py"))
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod.app
+
+def _attach_lag_monitor(app) -> LoopLagMonitor:
+    mon = LoopLagMonitor()
+
+    async def _start():
+        asyncio.get_running_loop().create_task(mon.run())
+
+    def lag(reset: bool = False):
+        return mon.snapshot(reset)
+
+    app.router.on_startup.append(_start)
+    app.add_api_route("/__bench/lag", lag, methods=["GET"])
+    # "/" 에 Flask가 마운트되어 있으므로 맨 앞으로 옮겨야 라우팅됨
+    app.router.routes.insert(0, app.router.routes.pop())
+    return mon
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description="combined app with local stubs")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=9000)
+    ap.add_argument("--llm-url", default="http://127.0.0.1:9100/v1", help="fake_openai 주소")
+    ap.add_argument("--tts-ms-per-char", type=float, default=2.0)
+    ap.add_argument("--fake-stt", action="store_true", help="faster-whisper 대신 가짜 STT 사용")
+    ap.add_argument("--stt-ms", type=float, default=150.0, help="가짜 STT 세그먼트당 지연(ms)")
+    ap.add_argument("--mongo", choices=["mongomock", "real"], default="mongomock")
+    ap.add_argument("--docs", type=int, default=200, help="mongomock 합성 레코드 수")
+    ap.add_argument("--chroma-dir", help="사용할 Chroma 디렉토리(rag_bench --workdir 결과 등)")
+    args = ap.parse_args(argv)
+
+    os.environ.update({
+        "OPENAI_BASE_URL": args.llm_url,
+        "OPENAI_API_BASE": args.llm_url,
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY") or "sk-bench-stub",
+        "WARMUP_ON_STARTUP": "false",
+        "ANONYMIZED_TELEMETRY": "False",
+    })
+    if args.mongo == "mongomock":
+        os.environ.setdefault("MONGO_DB", "bench_db")
+    if args.chroma_dir:
+        os.environ["CHROMA_DIR"] = args.chroma_dir
+
+    ensure_ai_path()
+    _install_fakes(args)
+    app = _load_app()
+    _attach_lag_monitor(app)
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
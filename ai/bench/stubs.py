@@ -0,0 +1,25 @@
+# ai/bench/stubs.py
+# ================================================================
+# 역할: 벤치마크용 로컬 대체물(stub)
+# - LLM: 고정 답변을 돌려주는 LangChain 채팅 모델 (네트워크/비용 0)
+# - Mongo: mongomock 인메모리 DB에 합성 코퍼스 적재
+# ================================================================
+from __future__ import annotations
+
+from typing import Dict, List
+
+STUB_ANSWER = "(stub) 제공된 근거를 바탕으로 한 답변입니다."
+
+def stub_chat_model(answer: str = STUB_ANSWER):
+    """LangChain Runnable 호환 가짜 채팅 모델"""
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    return FakeListChatModel(responses=[answer])
+
+def mongomock_db(colls: Dict[str, List[Dict]], db_name: str = "bench_db"):
+    """{컬렉션명: 레코드 목록} → mongomock Database"""
+    import mongomock
+    db = mongomock.MongoClient()[db_name]
+    for cname, records in colls.items():
+        if records:
+            db[cname].insert_many([dict(r) for r in records])
+    return db
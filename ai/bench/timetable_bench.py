@@ -0,0 +1,78 @@
+# ai/bench/timetable_bench.py
+# ================================================================
+# 역할: 시간표 구조화 질의(rag/timetable.py) 판단 정확도 + 질의당 비용
+# - CASES: (질문, 구조화 질의로 잡아야 하는지) — 학과/교수 이름 + 일반 의문사("언제/어디서/학점")
+#   질문은 문서 검색으로 넘겨야 함 → 하나라도 틀리면 종료코드 1
+# - 잡힌 질문은 parse_query + find 지연(µs/질의) 측정
+# - 데이터: TIMETABLE_SOURCE(기본 auto → MySQL 실패 시 school_db.sql 덤프)
+#
+# 실행 (ai/ 디렉토리에서):
+#   python -m bench.timetable_bench
+#   TIMETABLE_SOURCE=dump python -m bench.timetable_bench --rounds 200
+# ================================================================
+from __future__ import annotations
+
+import argparse, sys, time
+from typing import Dict
+
+from .common import ensure_ai_path, run_meta, write_result
+
+CASES = [
+    ("이종명 교수 목요일 수업", True),
+    ("6-304 강의실 화요일 야간", True),
+    ("인공지능소프트웨어학과 전필 과목", True),
+    ("이종명 교수님 3교시", True),
+    ("이종명 교수님 담당 과목 알려줘", True),
+    ("컴퓨터정보공학과 졸업 학점은 몇 학점이야?", False),
+    ("컴퓨터정보공학과 전공 소개해줘", False),
+    ("인공지능소프트웨어학과 언제 설립됐어?", False),
+    ("이종명 교수님 연구실 어디서 찾아?", False),
+    ("이종명 교수님 누구야?", False),
+]
+
+def main(argv=None) -> Dict:
+    ap = argparse.ArgumentParser(description="timetable intent cases + parse/find cost per query")
+    ap.add_argument("--rounds", type=int, default=100)
+    ap.add_argument("--out")
+    args = ap.parse_args(argv)
+
+    ensure_ai_path()
+    from rag import timetable
+
+    tt = timetable.load()
+    if tt is None:
+        print("[timetable] no timetable source (MySQL/dump) → skip")
+        sys.exit(1)
+
+    wrong = []
+    for text, want in CASES:
+        got = timetable.parse_query(text, tt)
+        if (got is not None) != want:
+            wrong.append(text)
+            print(f"[timetable] MISMATCH {text!r}: expected {want}, got {got}")
+
+    hits = [text for text, want in CASES if want]
+    t0 = time.perf_counter()
+    for _ in range(args.rounds):
+        for text in hits:
+            f = timetable.parse_query(text, tt)
+            if f:
+                tt.find(**f)
+    us = (time.perf_counter() - t0) / (args.rounds * len(hits)) * 1e6
+    print(f"[timetable] classes={len(tt.classes)} parse+find={us:.1f}µs/query")
+
+    result = {
+        "meta": run_meta({"bench": "timetable", "rounds": args.rounds}),
+        "cases": {"total": len(CASES), "wrong": wrong},
+        "classes": len(tt.classes),
+        "parse_find_us": round(us, 1),
+    }
+    path = write_result(result, args.out, "timetable")
+    print(f"[timetable] saved → {path}")
+    if wrong:
+        print(f"[timetable] FAIL ({len(wrong)}/{len(CASES)} cases)")
+        sys.exit(1)
+    return result
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -2,7 +2,6 @@ from fastapi import FastAPI, HTTPException
 from datetime import datetime, timedelta
 from pymongo import MongoClient
 from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 from langchain_openai import ChatOpenAI
@@ -15,7 +14,10 @@ import traceback
 
 from . import config  # 설정 파일 임포트
 from . import qa      # qa 모듈 임포트
+from . import jobs    # 인덱싱 작업 큐
+from . import timetable  # 수업/시간표 구조화 질의
 from .store import get_client, get_collection
+from .embeddings import langchain_embeddings
 
 # .env 파일 로드
 load_dotenv()
@@ -32,7 +34,7 @@ try:
     collection = db[config.MONGO_COLL]
 
     # LangChain 구성요소
-    embedding = HuggingFaceEmbeddings(model_name=config.EMBEDDING_MODEL_NAME)
+    embedding = langchain_embeddings(config.EMBEDDING_MODEL_NAME)
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=config.CHUNK_SIZE,
         chunk_overlap=config.CHUNK_OVERLAP
@@ -55,6 +57,12 @@ class RagChatReq(BaseModel):
     top_k: int = 6
     filters: Optional[Dict[str, List[str]]] = None
 
+class RetrieveManyReq(BaseModel):
+    queries: List[str]
+    top_k: int = 6
+    filters: Optional[Dict[str, List[str]]] = None
+    expand: Optional[str] = None   # "none" | "neighbors" | "parent" (미지정 시 RAG_EXPAND)
+
 # ------------------------------
 # 3️⃣ JSON 평탄화 함수
 # ------------------------------
@@ -75,13 +83,14 @@ def flatten_json(data, prefix=""):
 # 4️⃣ FastAPI Endpoints
 # ------------------------------
 
-@app.post("/ingest")
-def update_vector_db(days: int = 1, force_reingest: bool = False):
+def update_vector_db(days: int = 1, force_reingest: bool = False,
+                     progress: Optional[jobs.Progress] = None) -> Dict:
     """
-    MongoDB 문서를 벡터DB에 업데이트합니다.
+    MongoDB 문서를 벡터DB에 업데이트합니다. (작업 큐 워커에서 실행)
     - force_reingest=True: 모든 문서를 강제로 다시 인덱싱합니다.
     - force_reingest=False: 최근 N일 이내 변경된 문서만 증분 인덱싱합니다.
     """
+    progress = progress or jobs.Progress()
     since = datetime.utcnow() - timedelta(days=days)
     query = {} if force_reingest else {config.MONGO_UPDATED_FIELD: {"$gte": since}}
 
@@ -93,6 +102,8 @@ def update_vector_db(days: int = 1, force_reingest: bool = False):
         collection = db[coll_name]
         docs = list(collection.find(query))
         all_docs.extend(docs)
+        progress.add("docs", len(docs))
+        progress.check()
 
     if not all_docs:
         return {"message": "No documents to update based on the given criteria."}
@@ -108,16 +119,51 @@ def update_vector_db(days: int = 1, force_reingest: bool = False):
             new_docs.append(
                 Document(page_content=chunk, metadata={"_id": doc_id})
             )
+    progress.add("chunks", len(new_docs))
+    progress.total("upserted", len(new_docs))
+    progress.check()
 
     if ids_to_delete:
         vectorstore.delete(ids=ids_to_delete)
 
+    # add_documents = 임베딩 + upsert → 배치마다 진행률/취소 확인
+    for i in range(0, len(new_docs), config.INGEST_JOB_BATCH):
+        progress.check()
+        batch = new_docs[i:i + config.INGEST_JOB_BATCH]
+        vectorstore.add_documents(documents=batch)
+        progress.add("embedded", len(batch))
+        progress.add("upserted", len(batch))
     if new_docs:
-        vectorstore.add_documents(documents=new_docs)
         vectorstore.persist()
 
     return {"message": f"{len(new_docs)} chunks updated from {len(all_docs)} documents"}
 
+@app.post("/ingest", status_code=202)
+def ingest_job(days: int = 1, force_reingest: bool = False):
+    """
+    Mongo 증분 인덱싱 작업 등록 → job id 즉시 반환
+    (진행률: GET /ingest/jobs/{job_id}, 취소: POST /ingest/jobs/{job_id}/cancel)
+    """
+    return jobs.submit("update_vector_db", {"days": days, "force_reingest": force_reingest})
+
+@app.get("/ingest/jobs")
+def ingest_jobs(limit: int = 20, status: Optional[str] = None):
+    return {"jobs": jobs.list_jobs(limit=max(1, min(200, limit)), status=status)}
+
+@app.get("/ingest/jobs/{job_id}")
+def ingest_job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/ingest/jobs/{job_id}/cancel")
+def ingest_job_cancel(job_id: str):
+    job = jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @app.post("/chat")
 def rag_chat(req: RagChatReq):
     """
@@ -129,6 +175,12 @@ def rag_chat(req: RagChatReq):
 
     t0 = time.perf_counter()
     try:
+        # 수업/시간표 질의는 테이블 조회로 바로 답변 (벡터 검색/LLM 생략)
+        structured = timetable.answer(q)
+        if structured is not None:
+            structured["latency_ms"] = int((time.perf_counter() - t0) * 1000)
+            return structured
+
         k = max(1, min(8, req.top_k or 6))
         retriever = vectorstore.as_retriever(
             search_kwargs={"k": k, "filter": req.filters}
@@ -172,6 +224,58 @@ def rag_preview(req: RagChatReq):
     except Exception as e:
         raise HTTPException(500, f"Preview failed: {e}")
 
+@app.post("/retrieve_many")
+def rag_retrieve_many(req: RetrieveManyReq):
+    """
+    여러 질의 검색만 일괄 수행 (임베딩 배치 1번 + 다중 행 질의) — 평가/미리보기용
+    """
+    queries = [q.strip() for q in req.queries]
+    if not queries or any(not q for q in queries):
+        raise HTTPException(status_code=400, detail="Empty query")
+    if len(queries) > 256:
+        raise HTTPException(status_code=400, detail="Too many queries (max 256)")
+
+    t0 = time.perf_counter()
+    try:
+        from .retriever import retrieve_many
+        k = max(1, min(20, req.top_k or 6))
+        results = retrieve_many(queries, k=k, filters=req.filters, expand=req.expand)
+    except Exception as e:
+        raise HTTPException(500, f"Retrieve failed: {e}")
+
+    return {
+        "results": [
+            {"query": q, "chunks": [
+                {"id": c.get("id"),
+                 "page": c["meta"].get("page"),
+                 "source_type": c["meta"].get("source_type"),
+                 "title": c["meta"].get("title"),
+                 "dataset": c["meta"].get("dataset"),
+                 "score": c.get("score"),
+                 "text": (c.get("text") or "")[:500]}
+                for c in chunks]}
+            for q, chunks in zip(queries, results)
+        ],
+        "latency_ms": int((time.perf_counter() - t0) * 1000),
+    }
+
+@app.get("/timetable")
+def rag_timetable(professor: Optional[str] = None, classroom: Optional[str] = None,
+                  day: Optional[str] = None, major: Optional[str] = None, subject: Optional[str] = None,
+                  session: Optional[str] = None, period: Optional[int] = None,
+                  course_type: Optional[str] = None, student_id: Optional[str] = None):
+    """
+    수업 조회 (school_db class) — 조건은 AND, day=월..일, session=주|야, period=교시
+    """
+    tt = timetable.load()
+    if tt is None:
+        raise HTTPException(503, "Timetable unavailable")
+    t0 = time.perf_counter()
+    rows = tt.find(professor=professor, classroom=classroom, day=day, major=major, subject=subject,
+                   session=session, period=period, course_type=course_type, student_id=student_id)
+    return {"classes": rows, "total": len(rows), "source": tt.source,
+            "latency_ms": round((time.perf_counter() - t0) * 1000, 3)}
+
 # ------------------------------
 # 5️⃣ Health & Debug Endpoints
 # ------------------------------
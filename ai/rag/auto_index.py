@@ -9,18 +9,20 @@
 # - AUTO_INDEX_ON_QUERY=false  → 질의 시 자동 인덱싱 비활성화(권장)
 # - MONGO_*_TIMEOUT_MS         → Mongo 접속 타임아웃
 # - MONGO_SAMPLE_COLLECTIONS   → 변경 감지 시 확인할 컬렉션 수(0=무제한)
+# - FRESHNESS_TTL_S            → Mongo 최신 시각 조회 캐시(freshness.py)
 # ================================================================
 from __future__ import annotations
 
-import os, json, threading, glob, datetime
+import os, json, threading, glob
 from typing import Optional, List, Dict
 
 from .config import (
     DATA_DIR, PDF_GLOBS, CHROMA_DIR,
-    MONGO_URI, MONGO_DB, MONGO_COLL, MONGO_UPDATED_FIELD,
+    MONGO_URI, MONGO_DB, MONGO_COLL,
 )
 from .ingest import ingest_all
 from .store import get_client, get_collection
+from . import freshness
 
 from pymongo import MongoClient
 
@@ -63,48 +65,19 @@ def _collection_names(db) -> List[str]:
         return [c for c in db.list_collection_names() if not c.startswith("system.")]
     return [c.strip() for c in coll_env.split(",") if c.strip()]
 
-def _coerce_ts(v) -> Optional[int]:
-    if isinstance(v, datetime.datetime): return int(v.timestamp())
-    if isinstance(v, (int, float)):      return int(v)
-    return None
-
-def _updated_field_for(_: str) -> str:
-    """컬렉션별로 바꾸고 싶으면 여기서 분기"""
-    return (MONGO_UPDATED_FIELD or "updated_at")
-
-def _latest_ts_for_collection(coll, uf: str) -> int:
-    """해당 컬렉션의 최신 타임스탬프(uf 우선, 없으면 _id 생성시각)"""
-    try:
-        doc = coll.find().sort([(uf, -1)]).limit(1).next()
-        ts = _coerce_ts(doc.get(uf))
-        if ts:
-            return ts
-    except Exception:
-        pass
-    try:
-        doc = coll.find().sort([("_id", -1)]).limit(1).next()
-        return int(doc["_id"].generation_time.timestamp())
-    except Exception:
-        return 0
-
 def _mongo_latest_map(sample_limit: int = 0) -> Dict[str, int]:
     """
-    {컬렉션명: 최신타임스탬프} 매핑 생성.
+    {컬렉션명: 최신타임스탬프} 매핑 생성. (freshness.latest_map: DB당 aggregate 1번, TTL 캐시)
     실패 시 {} 반환(인덱싱 자체를 막지 않음).
     """
-    out: Dict[str, int] = {}
     try:
         db = _mongo_client()[MONGO_DB]
         names = _collection_names(db)
         if sample_limit > 0:
             names = names[:sample_limit]
-        for cname in names:
-            coll = db[cname]
-            uf = _updated_field_for(cname)
-            out[cname] = _latest_ts_for_collection(coll, uf)
+        return freshness.latest_map(db, names)
     except Exception:
         return {}
-    return out
 
 # ---------------- manifest I/O ----------------
 def _read_manifest() -> Optional[dict]:
@@ -149,6 +122,7 @@ def ensure_index_ready(force: bool = False) -> dict:
 
         if force or not fresh:
             res = ingest_all()
+            freshness.invalidate()
             _write_manifest(current)
             return {
                 "indexed": True,
@@ -0,0 +1,63 @@
+# ai/rag/chunker.py
+# ================================================================
+# ✂️ 역할: 문장 단위 청크 분할 (토큰 상한 기준)
+# - 한국어 문장 경계(. ! ? + 공백, 줄바꿈)로 나눈 뒤 CHUNK_TOKENS까지 문장을 누적
+# - 텍스트 중복(overlap)을 저장하지 않음 → 대신 이웃 청크 id를 메타에 기록
+#   (chunk_index / prev_id / next_id, 검색 시 필요하면 이웃을 확장)
+# - 한 문장이 상한보다 길면 토큰 기준으로 잘라 여러 청크로 분할
+#
+# 환경변수
+# - CHUNKER=sentence|legacy   (legacy: 기존 문자수 + overlap 방식)
+# - CHUNK_TOKENS=300          (청크 1개 토큰 상한)
+# ================================================================
+from __future__ import annotations
+
+from typing import Dict, List
+
+from .config import CHUNK_TOKENS
+from .context import split_sentences
+from .tokens import count_tokens, truncate_tokens
+
+def _split_long(sent: str, max_tokens: int) -> List[str]:
+    """상한보다 긴 문장을 토큰 기준으로 앞에서부터 잘라냄"""
+    pieces, rest = [], sent
+    while rest:
+        piece = truncate_tokens(rest, max_tokens)
+        if not piece:
+            piece = rest[: max(1, max_tokens)]  # 디코딩 결과가 비면 문자 단위로 진행
+        pieces.append(piece.strip())
+        rest = rest[len(piece):].lstrip()
+    return [p for p in pieces if p]
+
+def chunk_text(text: str, max_tokens: int = CHUNK_TOKENS) -> List[str]:
+    chunks: List[str] = []
+    buf: List[str] = []   # 문자열 += 대신 리스트에 모아 flush 시 한 번만 join
+    used = 0
+
+    def flush():
+        nonlocal buf, used
+        s = "".join(buf).strip()
+        if s:
+            chunks.append(s)
+        buf, used = [], 0
+
+    for sent, sep in split_sentences(text):
+        t = count_tokens(sent)
+        if t > max_tokens:
+            flush()
+            chunks.extend(_split_long(sent, max_tokens))
+            continue
+        if used + t > max_tokens:
+            flush()
+        buf.append(sent + sep)
+        used += t
+    flush()
+    return chunks
+
+def neighbor_meta(ids: List[str]) -> List[Dict]:
+    """같은 문서 안에서 연속된 청크 id 목록 → 청크별 이웃 메타 (Chroma 메타는 None 불가라 빈 문자열)"""
+    return [{
+        "chunk_index": i,
+        "prev_id": ids[i - 1] if i > 0 else "",
+        "next_id": ids[i + 1] if i + 1 < len(ids) else "",
+    } for i in range(len(ids))]
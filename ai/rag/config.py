@@ -35,11 +35,80 @@ def _getint(k, d):
     try: return int(os.getenv(k, d))
     except: return d
 
+def _getfloat(k, d):
+    try: return float(os.getenv(k, d))
+    except: return d
+
 CHUNK_SIZE = _getint("CHUNK_SIZE", 250)
 CHUNK_OVERLAP = _getint("CHUNK_OVERLAP", 200)
+CHUNKER = os.getenv("CHUNKER", "sentence").lower()       # sentence | legacy
+CHUNK_TOKENS = _getint("CHUNK_TOKENS", 300)               # sentence 청크 토큰 상한
 TOP_K = _getint("TOP_K", 6)
 FINAL_K = _getint("FINAL_K", 3)
 
+# --- LLM 컨텍스트 예산 (토큰 기준, context.pack_context) ---
+RAG_MAX_CONTEXT_TOKENS = _getint("RAG_MAX_CONTEXT_TOKENS", 1800)    # 전체 컨텍스트 상한
+RAG_MAX_TOKENS_PER_CHUNK = _getint("RAG_MAX_TOKENS_PER_CHUNK", 500) # 청크 1개 상한
+RAG_MAX_CHUNKS = _getint("RAG_MAX_CHUNKS", 4)                       # 최대 청크 수
+RAG_DEDUP_THRESHOLD = _getfloat("RAG_DEDUP_THRESHOLD", 0.8)         # 문장 중복 판정(5-gram 포함률)
+
+# --- 검색 대상 컬렉션 ---
+# auto  : COLLECTION_NAME에 데이터가 있으면 단일 컬렉션 + db_name where 필터, 없으면 컬렉션별 fan-out
+# single/fanout : 강제
+RAG_COLLECTION_MODE = os.getenv("RAG_COLLECTION_MODE", "auto").lower()
+
+# --- 저장 벡터 차원 축소 (projection.py, 0 = 끔) ---
+EMBED_DIM = _getint("EMBED_DIM", 0)
+# 인덱싱 중 자동 PCA 학습에 필요한 최소 벡터 수 (빈 컬렉션의 첫 배치가 이보다 작으면 전체 차원으로 저장)
+EMBED_PCA_MIN_FIT = _getint("EMBED_PCA_MIN_FIT", 2000)
+
+# --- 검색 시 이웃/부모 청크 확장 (docstore.py) ---
+DOCSTORE_PATH = os.getenv("DOCSTORE_PATH", os.path.join(CHROMA_DIR, "docstore.sqlite3"))
+RAG_EXPAND = os.getenv("RAG_EXPAND", "none").lower()   # none | neighbors | parent
+RAG_EXPAND_WINDOW = _getint("RAG_EXPAND_WINDOW", 1)    # neighbors: 히트 ±N 청크
+
+# --- /rag/preview → /rag/chat 검색 결과 재사용 (retrieval_cache.py) ---
+RAG_RETRIEVAL_TTL_S = _getfloat("RAG_RETRIEVAL_TTL_S", 300.0)     # 검색 토큰 유효 시간(초)
+RAG_RETRIEVAL_CACHE_MAX = _getint("RAG_RETRIEVAL_CACHE_MAX", 512) # 보관 토큰 수 상한
+
+# --- 인덱싱 작업 큐 (jobs.py) ---
+INGEST_JOBS_PATH = os.getenv("INGEST_JOBS_PATH", os.path.join(CHROMA_DIR, "jobs.sqlite3"))
+INGEST_JOB_STALE_S = _getfloat("INGEST_JOB_STALE_S", 600.0)   # heartbeat 없으면 재실행
+INGEST_JOB_BATCH = _getint("INGEST_JOB_BATCH", 256)           # 임베딩/upsert 배치(진행률·취소 단위)
+
+# --- 시간표/수업 구조화 질의 (timetable.py, school_db MySQL) ---
+TIMETABLE_ENABLED = os.getenv("TIMETABLE_ENABLED", "true").lower() == "true"
+TIMETABLE_SOURCE = os.getenv("TIMETABLE_SOURCE", "auto").lower()   # auto | mysql | dump
+TIMETABLE_DUMP = os.getenv("TIMETABLE_DUMP", str(BASE_DIR.parent / "school_db.sql"))
+TIMETABLE_REFRESH_S = _getfloat("TIMETABLE_REFRESH_S", 60.0)   # 체크섬 확인 주기(초, 0=갱신 스레드 끔)
+TIMETABLE_MAX_AGE_S = _getfloat("TIMETABLE_MAX_AGE_S", 3600.0) # 체크섬이 같아도 이 시간이 지나면 다시 읽음
+TIMETABLE_RETRY_S = _getfloat("TIMETABLE_RETRY_S", 60.0)       # 스냅샷이 없을 때(적재 실패) 질문 경로에서 다시 시도하는 최소 간격
+TIMETABLE_MAX_ROWS = _getint("TIMETABLE_MAX_ROWS", 30)    # 답변에 나열할 최대 수업 수
+SCHOOL_DB_HOST = os.getenv("SCHOOL_DB_HOST", os.getenv("DB_HOST", "127.0.0.1"))
+SCHOOL_DB_PORT = _getint("SCHOOL_DB_PORT", _getint("DB_PORT", 3306))
+SCHOOL_DB_USER = os.getenv("SCHOOL_DB_USER", os.getenv("DB_USER", "root"))
+SCHOOL_DB_PASS = os.getenv("SCHOOL_DB_PASS", os.getenv("DB_PASS", ""))
+SCHOOL_DB_NAME = os.getenv("SCHOOL_DB_NAME", "school_db")
+
+# --- 세션별 대화 기록 (memory.py) ---
+MEMORY_ENABLED = os.getenv("MEMORY_ENABLED", "true").lower() == "true"
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "memory").lower()   # memory | local | redis
+MEMORY_REDIS_URL = os.getenv("MEMORY_REDIS_URL", "redis://127.0.0.1:6379/0")
+MEMORY_STORE_PATH = os.getenv("MEMORY_STORE_PATH", os.path.join(CHROMA_DIR, "memory.sqlite3"))
+MEMORY_TTL_S = _getfloat("MEMORY_TTL_S", 3600.0)            # 유휴 세션 만료(초)
+MEMORY_MAX_SESSIONS = _getint("MEMORY_MAX_SESSIONS", 2000)  # 프로세스 메모리 보관 세션 수
+MEMORY_MAX_TURNS = _getint("MEMORY_MAX_TURNS", 6)           # 원문으로 남길 최근 턴 수
+MEMORY_HISTORY_TOKENS = _getint("MEMORY_HISTORY_TOKENS", 600)  # 최근 턴 토큰 상한(넘으면 요약으로 롤업)
+MEMORY_SUMMARY_TOKENS = _getint("MEMORY_SUMMARY_TOKENS", 300)  # 요약 토큰 상한
+MEMORY_ANSWER_TOKENS = _getint("MEMORY_ANSWER_TOKENS", 200)    # 기록에 저장할 답변 길이 상한
+
+# --- 후속 질문 → 검색 질의 재작성 (rewrite.py) ---
+REWRITE_ENABLED = os.getenv("REWRITE_ENABLED", "true").lower() == "true"
+REWRITE_LLM = os.getenv("REWRITE_LLM", "true").lower() == "true"   # 규칙으로 안 될 때 LLM 사용
+REWRITE_CACHE_MAX = _getint("REWRITE_CACHE_MAX", 1024)             # LRU 항목 수
+REWRITE_HISTORY_TURNS = _getint("REWRITE_HISTORY_TURNS", 2)        # 참고할 최근 질문 수
+REWRITE_MAX_TOKENS = _getint("REWRITE_MAX_TOKENS", 64)             # LLM 재작성 출력 상한
+
 # 활성 컬렉션 이름이 들어있는 “포인터 파일”
 ACTIVE_NAME_FILE = os.getenv("ACTIVE_NAME_FILE", str(BASE_DIR / "rag" / "ACTIVE_COLLECTION.txt"))
 # 기본 prefix (A/B 뒤에 붙일 공통 접두)
@@ -0,0 +1,138 @@
+# ai/rag/consolidate.py
+# ================================================================
+# 🧩 역할: 컬렉션별 Chroma 인덱스 → 단일 컬렉션 마이그레이션
+# - chromaDB/em.py, sav.py 는 Mongo `db_collection` 마다 컬렉션을 만들어
+#   ask_question이 수십 개 컬렉션을 순서대로 검색해야 했음
+# - 모든 컬렉션의 벡터/문서/메타를 COLLECTION_NAME 하나로 복사하고
+#   db_name / dataset 메타를 채워 라우팅을 where 필터로 대체 (refactored_rag.search_chunks)
+# - id는 충돌 방지를 위해 "<원본 컬렉션>::<원본 id>"
+# - 원본 벡터 모델이 현재 임베더와 다르면(em.py는 e5-small-v2) --reembed로 다시 임베딩
+# - EMBED_DIM>0 이고 대상이 비어 있으면 PCA 학습 개수(EMBED_PCA_MIN_FIT)가 모일 때까지 페이지를 모아
+#   한 번에 넘김 → PAGE(1000)보다 학습 개수가 커도 투영 컬렉션으로 합쳐짐 (원본 컬렉션을 넘나들며 모음)
+# - --drop-src는 모든 벡터를 쓴 뒤에 원본 삭제 (모아 둔 페이지가 쓰이기 전에 원본이 사라지지 않게)
+#
+# 실행 (ai/ 디렉토리에서):
+#   python -m rag.consolidate --dry-run
+#   python -m rag.consolidate --reembed
+#   python -m rag.consolidate --drop-src      (복사 후 원본 컬렉션 삭제)
+# ================================================================
+from __future__ import annotations
+
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+from .config import CHROMA_DIR, COLLECTION_NAME
+from . import docstore, exact, projection
+
+# chromaDB/sav.py, em.py 가 처리하는 DB (컬렉션 이름 = "<db>_<collection>")
+KNOWN_DBS = [
+    "Academic_Information_db", "Admissions_Office", "University_Introduction",
+    "depatement_all_db", "depatement_db", "university_life",
+]
+PAGE = 1000
+
+def split_name(name: str) -> Tuple[str, str]:
+    """컬렉션 이름 → (db_name, mongo collection)"""
+    for db in sorted(KNOWN_DBS, key=len, reverse=True):
+        if name.startswith(db + "_"):
+            return db, name[len(db) + 1:]
+    return name, ""
+
+def _fix_meta(meta: Optional[Dict], src: str, src_id: str) -> Dict:
+    m = dict(meta or {})
+    db, coll = split_name(src)
+    # em.py 메타: {"db", "collection", "_id"} / ingest.py(예전 규칙) 메타: {"db_name", "dataset"=컬렉션명}
+    db = m.pop("db", None) or m.get("db_name") or db
+    coll = m.pop("collection", None) or coll
+    if "_id" in m:
+        m.setdefault("source_id", str(m.pop("_id")))
+    m.setdefault("source_id", src_id)
+    m.setdefault("source_type", "mongo")
+    if m["source_type"] == "mongo":
+        # ingest.py와 같은 규칙: db_name=<db>, dataset="<db>.<컬렉션>"
+        old = str(m.get("dataset") or "")
+        m["db_name"] = db
+        m["dataset"] = f"{db}.{coll}" if coll else (old if "." in old else f"{db}.{old}" if old else db)
+    m["src_collection"] = src
+    return m
+
+def _write(target, pages: List[tuple]) -> None:
+    """모은 페이지를 투영(첫 호출이면 여기서 PCA 학습) → PAGE 단위 upsert"""
+    ids = [x for p in pages for x in p[0]]
+    docs = [x for p in pages for x in p[1]]
+    metas = [x for p in pages for x in p[2]]
+    vecs = projection.for_ingest(target, [x for p in pages for x in p[3]])
+    for i in range(0, len(ids), PAGE):
+        sl = slice(i, i + PAGE)
+        target.upsert(ids=ids[sl], documents=docs[sl], metadatas=metas[sl], embeddings=vecs[sl])
+        docstore.index_chunks(ids[sl], docs[sl], metas[sl])
+
+def consolidate(dst: str = COLLECTION_NAME, reembed: bool = False, drop_src: bool = False,
+                dry_run: bool = False) -> Dict:
+    from .store import get_client
+
+    client = get_client(CHROMA_DIR)
+    target = None if dry_run else client.get_or_create_collection(name=dst)
+    emb = None
+    if reembed:
+        from .embeddings import langchain_embeddings
+        emb = langchain_embeddings()
+
+    results: List[Dict] = []
+    need = projection.fit_size(target) if target is not None else 0
+    held: List[tuple] = []   # PCA 학습 전까지 모아 둔 페이지 (ids, docs, metas, vecs)
+    to_drop: List[str] = []
+    try:
+        for col in client.list_collections():
+            if col.name == dst:
+                continue
+            n = col.count()
+            if dry_run:
+                results.append({"collection": col.name, "db_name": split_name(col.name)[0], "vectors": n})
+                continue
+            if projection.load(col.name) is not None and not reembed:
+                print(f"[consolidate] skip {col.name}: projected vectors (use --reembed)")
+                results.append({"collection": col.name, "skipped": "projected"})
+                continue
+
+            copied = 0
+            for off in range(0, n, PAGE):
+                got = col.get(include=["embeddings", "documents", "metadatas"], limit=PAGE, offset=off)
+                src_ids = got["ids"]
+                docs = [d or "" for d in got["documents"]]
+                metas = [_fix_meta(m, col.name, i) for m, i in zip(got["metadatas"], src_ids)]
+                ids = [f"{col.name}::{i}" for i in src_ids]
+                if emb is not None:
+                    vecs = emb.embed_documents(docs, verbose=True)
+                else:
+                    vecs = [list(map(float, v)) for v in got["embeddings"]]
+                copied += len(ids)
+                held.append((ids, docs, metas, vecs))
+                if sum(len(h[0]) for h in held) >= need:
+                    _write(target, held)
+                    held, need = [], 0
+
+            if drop_src:
+                to_drop.append(col.name)
+            print(f"[consolidate] {col.name} → {dst}: {copied} vectors")
+            results.append({"collection": col.name, "db_name": split_name(col.name)[0], "vectors": copied})
+        if held:   # 전체가 학습 개수보다 적으면 전체 차원으로 저장 (for_ingest가 안내 출력)
+            _write(target, held)
+        for name in to_drop:
+            client.delete_collection(name=name)
+    finally:
+        if target is not None:
+            exact.invalidate(target.name)   # 원본 컬렉션마다가 아니라 끝(실패 포함)에 1번
+
+    return {"dst": dst, "sources": results,
+            "total": sum(r.get("vectors", 0) for r in results),
+            "dst_count": target.count() if target is not None else None}
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="merge per-collection Chroma indexes into one collection")
+    ap.add_argument("--dst", default=COLLECTION_NAME)
+    ap.add_argument("--reembed", action="store_true", help="현재 EMBEDDER로 다시 임베딩")
+    ap.add_argument("--drop-src", action="store_true", help="복사 후 원본 컬렉션 삭제")
+    ap.add_argument("--dry-run", action="store_true", help="대상 컬렉션 목록/개수만 출력")
+    args = ap.parse_args()
+    print(consolidate(args.dst, args.reembed, args.drop_src, args.dry_run))
@@ -0,0 +1,102 @@
+# ai/rag/context.py
+# ================================================================
+# 📦 역할: 검색 청크 → LLM 컨텍스트 패킹 (토큰 예산 기준)
+# - 점수 높은 순으로 RAG_MAX_CONTEXT_TOKENS 예산을 채움
+# - 청크는 문장 경계에서 자름(한 문장이 예산보다 길 때만 토큰 하드 컷)
+# - CHUNK_OVERLAP 때문에 이웃 청크가 거의 같은 문장을 반복 → 문장 단위 중복 제거
+#   (공백 제거 후 문자 5-gram 집합이 이미 담은 문장들에 threshold 이상 포함되면 제외)
+#
+# 입력/출력 청크 형식: retriever.retrieve와 동일 {"id", "text", "meta", "score"}
+#   출력에는 잘린 "text"와 "tokens"(해당 청크 토큰 수)가 추가됨
+# ================================================================
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from .config import (
+    RAG_MAX_CONTEXT_TOKENS, RAG_MAX_TOKENS_PER_CHUNK, RAG_MAX_CHUNKS, RAG_DEDUP_THRESHOLD,
+)
+from .tokens import count_tokens, truncate_tokens
+
+# 문장 끝(. ! ? 。 + 공백) 또는 줄바꿈에서 분리.
+# "2025. 3. 2." 같은 날짜/번호 목록이 쪼개지지 않도록 마침표 앞이 숫자면 분리하지 않음
+_SENT_BOUNDARY = re.compile(r"((?<=[^\d\s][.!?。])[ \t]+|\s*\n\s*)")
+_WS = re.compile(r"\s+")
+SHINGLE_N = 5
+
+def split_sentences(text: str) -> List[Tuple[str, str]]:
+    """(문장, 뒤따르는 구분자) 목록. 구분자를 보존해 다시 이어 붙일 때 줄바꿈이 유지됨"""
+    parts = _SENT_BOUNDARY.split(text or "")
+    out: List[Tuple[str, str]] = []
+    for i in range(0, len(parts), 2):
+        sent = parts[i].strip()
+        sep = parts[i + 1] if i + 1 < len(parts) else ""
+        if sent:
+            out.append((sent, "\n" if "\n" in sep else " "))
+    return out
+
+def _shingles(sent: str, n: int = SHINGLE_N) -> Set[str]:
+    s = _WS.sub("", sent)
+    if len(s) <= n:
+        return {s} if s else set()
+    return {s[i:i + n] for i in range(len(s) - n + 1)}
+
+def _score_key(c: Dict) -> float:
+    s = c.get("score")
+    return float(s) if s is not None else float("-inf")
+
+def pack_context(
+    chunks: List[Dict],
+    budget_tokens: Optional[int] = None,
+    max_chunks: Optional[int] = None,
+    max_tokens_per_chunk: Optional[int] = None,
+    dedup_threshold: Optional[float] = None,
+) -> List[Dict]:
+    budget = RAG_MAX_CONTEXT_TOKENS if budget_tokens is None else budget_tokens
+    max_chunks = RAG_MAX_CHUNKS if max_chunks is None else max_chunks
+    per_chunk = RAG_MAX_TOKENS_PER_CHUNK if max_tokens_per_chunk is None else max_tokens_per_chunk
+    threshold = RAG_DEDUP_THRESHOLD if dedup_threshold is None else dedup_threshold
+
+    # sorted는 안정 정렬 → 점수가 같거나 없으면 검색 순서 유지
+    ranked = sorted(chunks, key=_score_key, reverse=True)
+
+    seen: Set[str] = set()
+    packed: List[Dict] = []
+    used = 0
+    for c in ranked:
+        if len(packed) >= max_chunks or used >= budget:
+            break
+        limit = min(per_chunk, budget - used)
+
+        kept: List[str] = []
+        kept_shingles: List[Set[str]] = []
+        n_tokens = 0
+        for sent, sep in split_sentences(c.get("text") or ""):
+            sh = _shingles(sent)
+            if sh and len(sh & seen) / len(sh) >= threshold:
+                continue  # 이미 담은 문장과 거의 같음
+            t = count_tokens(sent)
+            if n_tokens + t > limit:
+                if not kept:
+                    # 첫 문장부터 예산 초과 → 토큰 하드 컷
+                    sent = truncate_tokens(sent, limit)
+                    kept.append(sent)
+                    kept_shingles.append(sh)
+                    n_tokens = count_tokens(sent)
+                break
+            kept.append(sent + sep)
+            kept_shingles.append(sh)
+            n_tokens += t
+
+        text = "".join(kept).strip()
+        if not text:
+            continue
+        for sh in kept_shingles:
+            seen |= sh
+        used += n_tokens
+        packed.append({**c, "text": text, "tokens": n_tokens})
+    return packed
+
+def context_tokens(packed: List[Dict]) -> int:
+    return sum(c.get("tokens", 0) for c in packed)
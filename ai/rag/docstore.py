@@ -0,0 +1,160 @@
+# ai/rag/docstore.py
+# ================================================================
+# 🗄️ 역할: 청크 원문 로컬 KV 저장소 (SQLite) + 검색 시 이웃/부모 확장
+# - 인덱싱 때 청크 텍스트를 (parent_key, chunk_index)로 함께 저장
+#   parent_key = source_id(없으면 source) :: dataset :: page  → 같은 문서/페이지
+# - 검색은 작은 청크로 하고, 답변 컨텍스트는 주변 청크까지 붙여서 문단 단위로 전달
+#   · neighbors: 히트 청크 ±RAG_EXPAND_WINDOW
+#   · parent   : 같은 parent_key 전체
+#   두 방식 모두 히트 청크를 중심으로 좌우를 번갈아 붙이며 RAG_MAX_TOKENS_PER_CHUNK를 넘지 않음
+# - 이미 앞선(점수 높은) 히트의 확장 범위에 포함된 히트는 제외 → 같은 문단 중복 방지
+#   겹치는 창은 히트를 포함하는 미포함 연속 구간만 남김(떨어진 청크를 이어 붙이지 않음)
+#
+# 환경변수
+# - DOCSTORE_PATH=<CHROMA_DIR>/docstore.sqlite3
+# - RAG_EXPAND=none|neighbors|parent    (기본 none)
+# - RAG_EXPAND_WINDOW=1
+# ================================================================
+from __future__ import annotations
+
+import os, sqlite3, threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from .config import DOCSTORE_PATH, RAG_EXPAND, RAG_EXPAND_WINDOW, RAG_MAX_TOKENS_PER_CHUNK
+from .tokens import count_tokens
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id          TEXT PRIMARY KEY,
+    parent_key  TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    text        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_parent ON chunks(parent_key, chunk_index);
+"""
+
+# 스레드별 커넥션 (sqlite3 커넥션은 스레드 간 공유 불가)
+_LOCAL = threading.local()
+
+def _conn() -> sqlite3.Connection:
+    con = getattr(_LOCAL, "con", None)
+    if con is None:
+        os.makedirs(os.path.dirname(DOCSTORE_PATH) or ".", exist_ok=True)
+        con = sqlite3.connect(DOCSTORE_PATH, timeout=30)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.executescript(_SCHEMA)
+        _LOCAL.con = con
+    return con
+
+def parent_key(meta: Dict) -> str:
+    src = meta.get("source_id") or meta.get("source") or ""
+    return f"{src}::{meta.get('dataset') or ''}::{meta.get('page') or 0}"
+
+# ---------------- 쓰기 (인덱싱) ----------------
+def put_chunks(ids: List[str], docs: List[str], metas: List[Dict]) -> int:
+    rows, counters = [], defaultdict(int)
+    for cid, text, meta in zip(ids, docs, metas):
+        pk = parent_key(meta)
+        idx = meta.get("chunk_index")
+        if idx is None:  # legacy 청크: 같은 부모 안에서 등장 순서
+            idx = counters[pk]
+        counters[pk] = int(idx) + 1
+        rows.append((cid, pk, int(idx), text))
+    con = _conn()
+    with con:
+        con.executemany("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?)", rows)
+    return len(rows)
+
+def delete_parents(metas: List[Dict]) -> None:
+    """재인덱싱 전 같은 문서/페이지의 기존 청크 삭제 (청크 수가 줄어든 경우 대비)"""
+    keys = sorted({parent_key(m) for m in metas})
+    con = _conn()
+    with con:
+        con.executemany("DELETE FROM chunks WHERE parent_key = ?", [(k,) for k in keys])
+
+def index_chunks(ids: List[str], docs: List[str], metas: List[Dict]) -> None:
+    """인덱싱 경로에서 호출: 기존 부모 청크 교체. 실패해도 벡터 인덱싱은 계속(확장만 비활성)"""
+    try:
+        delete_parents(metas)
+        put_chunks(ids, docs, metas)
+    except sqlite3.Error as e:
+        print(f"[docstore] write failed: {e}")
+
+# ---------------- 읽기 (검색 시 확장) ----------------
+def _rows(pk: str, lo: Optional[int] = None, hi: Optional[int] = None) -> List[tuple]:
+    if lo is None:
+        sql, args = "SELECT chunk_index, text FROM chunks WHERE parent_key = ? ORDER BY chunk_index", (pk,)
+    else:
+        sql = ("SELECT chunk_index, text FROM chunks WHERE parent_key = ? "
+               "AND chunk_index BETWEEN ? AND ? ORDER BY chunk_index")
+        args = (pk, lo, hi)
+    return _conn().execute(sql, args).fetchall()
+
+def _grow(rows: List[tuple], hit: int, max_tokens: int) -> List[tuple]:
+    """히트 청크에서 시작해 다음/이전 청크를 번갈아 붙임 (토큰 상한까지)"""
+    pos = next((i for i, r in enumerate(rows) if r[0] == hit), None)
+    if pos is None:
+        return []
+    lo = hi = pos
+    used = count_tokens(rows[pos][1])
+    grew = True
+    while grew:
+        grew = False
+        for j in (hi + 1, lo - 1):
+            if not 0 <= j < len(rows):
+                continue
+            t = count_tokens(rows[j][1])
+            if used + t > max_tokens:
+                continue
+            used += t
+            lo, hi = min(lo, j), max(hi, j)
+            grew = True
+    return rows[lo:hi + 1]
+
+def _uncovered_run(rows: List[tuple], hit: int, pk: str, covered: set) -> List[tuple]:
+    """창에서 히트를 포함하는 '미포함' 연속 구간만 남김 (중간 행을 빼서 떨어진 청크를 이어 붙이지 않도록)"""
+    pos = next((i for i, r in enumerate(rows) if r[0] == hit), None)
+    if pos is None:
+        return []
+    lo = hi = pos
+    while lo > 0 and (pk, rows[lo - 1][0]) not in covered:
+        lo -= 1
+    while hi + 1 < len(rows) and (pk, rows[hi + 1][0]) not in covered:
+        hi += 1
+    return rows[lo:hi + 1]
+
+def expand(chunks: List[Dict], mode: Optional[str] = None, window: Optional[int] = None,
+           max_tokens: Optional[int] = None) -> List[Dict]:
+    """검색 청크({"text","meta","score",...}) → 이웃/부모 청크를 붙인 청크 목록 (입력 순서 유지)"""
+    mode = (mode or RAG_EXPAND or "none").lower()
+    if mode not in ("neighbors", "parent") or not chunks:
+        return chunks
+    window = RAG_EXPAND_WINDOW if window is None else window
+    max_tokens = RAG_MAX_TOKENS_PER_CHUNK if max_tokens is None else max_tokens
+
+    out, covered = [], set()
+    for c in chunks:
+        meta = c.get("meta") or {}
+        idx = meta.get("chunk_index")
+        pk = parent_key(meta)
+        if idx is None:
+            out.append(c)
+            continue
+        idx = int(idx)
+        if (pk, idx) in covered:
+            continue  # 앞선 히트의 확장 범위에 이미 포함
+        try:
+            rows = _rows(pk) if mode == "parent" else _rows(pk, idx - window, idx + window)
+        except sqlite3.Error as e:
+            print(f"[docstore] expand failed: {e}")
+            rows = []
+        picked = _uncovered_run(_grow(rows, idx, max_tokens), idx, pk, covered)
+        if not picked:
+            out.append(c)  # docstore에 없음(구 인덱스) → 원본 유지
+            continue
+        covered.update((pk, r[0]) for r in picked)
+        out.append({**c, "text": "\n".join(r[1] for r in picked),
+                    "expanded": [r[0] for r in picked]})
+    return out
@@ -0,0 +1,274 @@
+# ai/rag/embeddings.py
+# ================================================================
+# 🧮 역할: 임베딩 백엔드 선택 (ingest / retriever / refactored_rag 공용)
+# - torch: SentenceTransformer(fp32 PyTorch) — 기존 동작
+# - onnx : ONNX Runtime + int8 동적 양자화 모델 (CPU 전용 서버에서 수 배 빠름)
+#          최초 사용 시 HF 모델을 ONNX로 export → quantize_dynamic → ONNX_DIR에 캐시
+#          풀링은 e5 sentence-transformers 구성과 동일(mean pooling → modules.json에 Normalize가 있거나
+#          normalize_embeddings면 L2 정규화 — SentenceTransformer와 같은 규칙)
+# - 두 백엔드 모두 .encode(texts, batch_size=, convert_to_numpy=, normalize_embeddings=) 제공
+#   → 기존 SentenceTransformer 호출부를 그대로 사용
+# - encode_batched: 토큰 길이로 정렬 → 토큰 예산(EMBED_BATCH_TOKENS) 기준 배치 → 원래 순서 복원
+#   (짧은 공지와 긴 규정 표가 섞여도 배치마다 패딩 낭비가 적음)
+# - LangChain용 어댑터(embed_documents / embed_query)
+#   e5 모델이면 ingest.py / retriever.py와 같은 프리픽스("passage: " / "query: ")를 붙임
+#   → 어느 경로로 넣은 청크든 어느 경로로 검색하든 같은 공간
+# - onnxruntime 미설치/변환 실패 시 torch로 폴백
+#
+# 환경변수
+# - EMBEDDER_MODEL=intfloat/multilingual-e5-small
+# - EMBED_BACKEND=torch|onnx          (기본 torch)
+# - ONNX_DIR=ai/rag/onnx_models       (모델별 하위 폴더에 model.onnx / model.int8.onnx)
+# - ONNX_QUANTIZE=true                (false면 fp32 ONNX)
+# - ONNX_THREADS=0                    (0 = onnxruntime 기본값)
+# - EMBED_BATCH=64                    (배치당 최대 문장 수)
+# - EMBED_BATCH_TOKENS=8192           (배치당 패딩 포함 토큰 예산 = 최장 길이 × 문장 수)
+# - EMBED_LOG_BATCHES=true            (배치별 처리량 로그, verbose=True인 인덱싱 경로에서만)
+# ================================================================
+from __future__ import annotations
+
+import json, os, threading, time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .config import BASE_DIR
+
+EMBEDDER_MODEL = os.getenv("EMBEDDER_MODEL", "intfloat/multilingual-e5-small")
+EMBED_BACKEND  = os.getenv("EMBED_BACKEND", "torch").lower()
+ONNX_DIR       = os.getenv("ONNX_DIR", str(BASE_DIR / "rag" / "onnx_models"))
+ONNX_QUANTIZE  = os.getenv("ONNX_QUANTIZE", "true").lower() == "true"
+ONNX_THREADS   = int(os.getenv("ONNX_THREADS", "0"))
+MAX_SEQ_LEN    = 512   # e5 계열 최대 입력 길이
+EMBED_BATCH        = int(os.getenv("EMBED_BATCH", "64"))
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "8192"))
+EMBED_LOG_BATCHES  = os.getenv("EMBED_LOG_BATCHES", "true").lower() == "true"
+
+# ================================================================
+# ONNX export / 양자화
+# ================================================================
+def _onnx_paths(model_name: str, quantize: bool) -> Tuple[str, str]:
+    out_dir = os.path.join(ONNX_DIR, model_name.replace("/", "__"))
+    return out_dir, os.path.join(out_dir, "model.int8.onnx" if quantize else "model.onnx")
+
+def export_onnx(model_name: str, quantize: bool = ONNX_QUANTIZE) -> str:
+    """HF 모델 → ONNX(fp32) → (옵션) int8 동적 양자화. 이미 있으면 재사용"""
+    out_dir, path = _onnx_paths(model_name, quantize)
+    if os.path.exists(path):
+        return path
+
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(out_dir, exist_ok=True)
+    tok = AutoTokenizer.from_pretrained(model_name)
+    tok.save_pretrained(out_dir)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    sample = tok(["passage: 동양미래대학교 학사 규정"], return_tensors="pt")
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    axes = {n: {0: "batch", 1: "seq"} for n in names}
+    axes["last_hidden_state"] = {0: "batch", 1: "seq"}
+
+    fp32 = os.path.join(out_dir, "model.onnx")
+    print(f"[embed] exporting {model_name} → {fp32}")
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[n] for n in names), fp32,
+            input_names=names, output_names=["last_hidden_state"],
+            dynamic_axes=axes, opset_version=14, dynamo=False,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        print(f"[embed] quantizing → {path}")
+        quantize_dynamic(fp32, path, weight_type=QuantType.QInt8)
+    return path
+
+def _has_normalize_module(model_name: str) -> bool:
+    """sentence-transformers modules.json에 Normalize 모듈이 있는지 (multilingual-e5: 2_Normalize)"""
+    path = os.path.join(model_name, "modules.json")
+    if not os.path.isfile(path):
+        try:
+            from huggingface_hub import hf_hub_download
+            path = hf_hub_download(model_name, "modules.json")
+        except Exception:
+            return False
+    try:
+        with open(path, encoding="utf-8") as f:
+            return any(m.get("type", "").endswith("Normalize") for m in json.load(f))
+    except (OSError, ValueError):
+        return False
+
+# ================================================================
+# ONNX 백엔드
+# ================================================================
+class OnnxEmbedder:
+    """SentenceTransformer.encode 호환 최소 인터페이스 (e5: mean pooling + 선택적 정규화)"""
+
+    def __init__(self, model_name: str, quantize: bool = ONNX_QUANTIZE):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        path = export_onnx(model_name, quantize)
+        self.model_name = model_name
+        self.tokenizer = AutoTokenizer.from_pretrained(os.path.dirname(path))
+        self.max_seq_length = min(MAX_SEQ_LEN, self.tokenizer.model_max_length or MAX_SEQ_LEN)
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if ONNX_THREADS > 0:
+            opts.intra_op_num_threads = ONNX_THREADS
+        self.session = ort.InferenceSession(path, opts, providers=["CPUExecutionProvider"])
+        self._inputs = {i.name for i in self.session.get_inputs()}
+        self._normalize_module = _has_normalize_module(model_name)
+
+    def _forward(self, texts: List[str]) -> np.ndarray:
+        enc = self.tokenizer(texts, padding=True, truncation=True,
+                             max_length=self.max_seq_length, return_tensors="np")
+        feeds = {k: v.astype(np.int64) for k, v in enc.items() if k in self._inputs}
+        hidden = self.session.run(None, feeds)[0]                       # (B, T, H)
+        mask = enc["attention_mask"][..., None].astype(np.float32)      # (B, T, 1)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled.astype(np.float32)
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True,
+               normalize_embeddings: bool = True, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        out = np.concatenate([self._forward(texts[i:i + batch_size])
+                              for i in range(0, len(texts), batch_size)])
+        # SentenceTransformer와 같은 규칙: 모델 구성에 Normalize 모듈이 있으면(multilingual-e5) 항상,
+        # 없으면 normalize_embeddings일 때만 L2 정규화
+        if normalize_embeddings or self._normalize_module:
+            out /= np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+        if single:
+            out = out[0]
+        return out if convert_to_numpy else out.tolist()
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return int(self.encode(["dim"])[0].shape[0])
+
+# ================================================================
+# 백엔드 선택 (프로세스당 모델별 1회 로드)
+# ================================================================
+_EMBEDDERS: Dict[Tuple[str, str], object] = {}
+_LOCK = threading.Lock()
+
+def get_embedder(model_name: Optional[str] = None, backend: Optional[str] = None):
+    model_name = model_name or EMBEDDER_MODEL
+    backend = (backend or EMBED_BACKEND).lower()
+    key = (model_name, backend)
+    if key not in _EMBEDDERS:
+        with _LOCK:
+            if key not in _EMBEDDERS:
+                _EMBEDDERS[key] = _load(model_name, backend)
+    return _EMBEDDERS[key]
+
+def _load(model_name: str, backend: str):
+    if backend == "onnx":
+        try:
+            return OnnxEmbedder(model_name)
+        except Exception as e:
+            print(f"[embed] onnx backend unavailable ({type(e).__name__}: {e}) → torch")
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+# ================================================================
+# 길이 버킷 + 토큰 예산 배치
+# ================================================================
+def _token_lengths(model, texts: List[str]) -> List[int]:
+    max_len = getattr(model, "max_seq_length", None) or MAX_SEQ_LEN
+    tok = getattr(model, "tokenizer", None)
+    if tok is not None:
+        try:
+            ids = tok(texts, add_special_tokens=True, truncation=True, max_length=max_len)["input_ids"]
+            return [len(x) for x in ids]
+        except Exception:
+            pass
+    # 토크나이저 없으면 글자 수 기반 근사
+    return [min(max_len, len(t) // 2 + 2) for t in texts]
+
+def plan_batches(lengths: List[int], token_budget: int = EMBED_BATCH_TOKENS,
+                 max_batch: int = EMBED_BATCH) -> List[List[int]]:
+    """길이 오름차순으로 묶되, (배치 내 최장 길이 × 문장 수)가 예산을 넘으면 새 배치"""
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    batches, cur = [], []
+    for i in order:
+        # 오름차순이므로 i를 넣으면 배치 최장 길이 = lengths[i]
+        if cur and (len(cur) >= max_batch or lengths[i] * (len(cur) + 1) > token_budget):
+            batches.append(cur)
+            cur = []
+        cur.append(i)
+    if cur:
+        batches.append(cur)
+    return batches
+
+def encode_batched(model, texts: List[str], normalize: bool = True,
+                   token_budget: int = EMBED_BATCH_TOKENS, max_batch: int = EMBED_BATCH,
+                   tag: str = "embed", verbose: bool = False) -> np.ndarray:
+    """
+    길이 버킷 배치로 인코딩 → 입력 순서대로 (N, D) 반환
+    - verbose=True(인덱싱 경로)일 때만 처리량 요약(+ EMBED_LOG_BATCHES면 배치별) 로그
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+    lengths = _token_lengths(model, texts)
+    batches = plan_batches(lengths, token_budget, max_batch)
+
+    out: Optional[np.ndarray] = None
+    t_all = time.perf_counter()
+    real_tokens = padded_tokens = 0
+    for b_no, idx in enumerate(batches, 1):
+        t0 = time.perf_counter()
+        emb = model.encode([texts[i] for i in idx], batch_size=len(idx),
+                           convert_to_numpy=True, normalize_embeddings=normalize)
+        dt = time.perf_counter() - t0
+        if out is None:
+            out = np.empty((len(texts), emb.shape[1]), dtype=np.float32)
+        out[idx] = emb
+        pad = max(lengths[i] for i in idx) * len(idx)
+        real = sum(lengths[i] for i in idx)
+        real_tokens += real
+        padded_tokens += pad
+        if verbose and EMBED_LOG_BATCHES:
+            print(f"[{tag}] batch {b_no}/{len(batches)} n={len(idx)} max_len={pad // len(idx)} "
+                  f"fill={real / pad:.0%} {len(idx) / dt:.1f} texts/s {real / dt:.0f} tok/s")
+    dt = time.perf_counter() - t_all
+    if verbose:
+        print(f"[{tag}] {len(texts)} texts in {len(batches)} batches, {dt:.2f}s "
+              f"({len(texts) / dt:.1f} texts/s, padding fill {real_tokens / max(padded_tokens, 1):.0%})")
+    return out
+
+# ================================================================
+# LangChain 어댑터 (Chroma(embedding_function=...)용)
+# ================================================================
+def e5_prefixes(model_name: Optional[str] = None) -> Tuple[str, str]:
+    """(질의, 문서) 프리픽스 — e5 계열은 학습 때처럼 "query: " / "passage: ", 그 외 모델은 없음"""
+    return ("query: ", "passage: ") if "e5" in (model_name or EMBEDDER_MODEL).lower() else ("", "")
+
+class LangChainEmbeddings:
+    """langchain Embeddings 인터페이스(덕 타이핑). e5면 문서/질의에 passage/query 프리픽스"""
+
+    def __init__(self, model_name: Optional[str] = None, backend: Optional[str] = None):
+        self.model = get_embedder(model_name, backend)
+        self.query_prefix, self.passage_prefix = e5_prefixes(model_name)
+
+    def embed_documents(self, texts: List[str], verbose: bool = False) -> List[List[float]]:
+        """verbose=True는 인덱싱 경로에서만 (LangChain 검색/질의 경로는 로그 없음)"""
+        texts = [self.passage_prefix + t.replace("\n", " ") for t in texts]
+        return encode_batched(self.model, texts, tag="ingest", verbose=verbose).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0].tolist()
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """질의 여러 개를 한 번에 (배치 로그 없음) → (Q, D)"""
+        texts = [self.query_prefix + t.replace("\n", " ") for t in texts]
+        return self.model.encode(texts, batch_size=EMBED_BATCH, convert_to_numpy=True, normalize_embeddings=True)
+
+def langchain_embeddings(model_name: Optional[str] = None) -> LangChainEmbeddings:
+    """EMBED_BACKEND(torch|onnx) 임베더를 LangChain 인터페이스로 (HuggingFaceEmbeddings 대체)"""
+    return LangChainEmbeddings(model_name or EMBEDDER_MODEL)
@@ -0,0 +1,314 @@
+# ai/rag/exact.py
+# ================================================================
+# 🎯 역할: 작은 컬렉션용 NumPy 완전 탐색(brute-force) 검색
+# - 컬렉션 벡터를 연속 float32(또는 float16) 행렬로 디스크에 저장하고 mmap으로 로드
+#   CHROMA_DIR/exact/<컬렉션>@<스탬프>/vectors.npy + norms.npy(|x|², 빌드 때 계산) + rows.json(ids/documents/metadatas)
+#   CHROMA_DIR/exact/<컬렉션>.current = 현재 스냅샷 폴더 이름 → 새 스냅샷은 새 폴더에 쓰고 이 파일만 rename으로 교체
+#   (지우고 바꾸는 사이 스냅샷이 없는 구간 없음, 직전 스냅샷 1개는 남겨 다른 프로세스가 읽는 중이어도 안전)
+# - 질의 = 행렬·벡터 곱 1번 + argpartition → 정확한 top-k (HNSW 근사 없음)
+#   질의 여러 개(query_many)는 행렬·행렬 곱 1번
+# - where 필터는 파이썬에서 평가($and/$or/$eq/$ne/$in/$nin/$gt/$gte/$lt/$lte)
+# - 거리 공간은 컬렉션 메타 hnsw:space(l2 기본 / cosine / ip)를 따라 Chroma와 같은 distance 반환
+# - 벡터 수가 EXACT_MAX_VECTORS를 넘으면 자동으로 HNSW(Chroma query) 사용
+# - 스냅샷은 컬렉션 count가 바뀌거나 버전 표식이 바뀌면 다시 생성
+#   · 인덱싱 경로가 끝날 때 invalidate()가 CHROMA_DIR/exact/<컬렉션>.version에 새 토큰을 씀(인덱싱 1번에 1번)
+#   · 스냅샷(rows.json)은 만들 때 읽은 토큰을 기록 → 질의마다 표식과 비교
+#   → 다른 프로세스(ingest 워커/CLI)가 같은 개수로 upsert한 경우도 다음 질의에서 반영
+#   · 다시 만드는 일은 백그라운드 스레드(컬렉션당 1개) → 끝날 때까지 질의는 HNSW로 응답(요청 경로에서 빌드 안 함)
+#
+# 환경변수
+# - RAG_SEARCH_ENGINE=auto|hnsw|exact   (기본 auto)
+# - EXACT_MAX_VECTORS=20000
+# - EXACT_DTYPE=float32|float16         (float16: 메모리 절반, 점수 오차 ~1e-3)
+# ================================================================
+from __future__ import annotations
+
+import json, os, shutil, threading, time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .config import CHROMA_DIR
+
+RAG_SEARCH_ENGINE = os.getenv("RAG_SEARCH_ENGINE", "auto").lower()
+EXACT_MAX_VECTORS = int(os.getenv("EXACT_MAX_VECTORS", "20000"))
+EXACT_DTYPE = os.getenv("EXACT_DTYPE", "float32").lower()
+EXACT_DIR = os.path.join(CHROMA_DIR, "exact")
+PAGE = 2000
+RETRY_S = 30   # 스냅샷 빌드 실패 후 다시 시도하기까지(그동안 HNSW)
+
+# ---------------- where 필터 (Chroma 문법) ----------------
+_OPS = {
+    "$eq":  lambda v, x: v == x,
+    "$ne":  lambda v, x: v != x,
+    "$in":  lambda v, x: v in x,
+    "$nin": lambda v, x: v not in x,
+    "$gt":  lambda v, x: v is not None and v > x,
+    "$gte": lambda v, x: v is not None and v >= x,
+    "$lt":  lambda v, x: v is not None and v < x,
+    "$lte": lambda v, x: v is not None and v <= x,
+}
+
+def filters_to_where(filters: Optional[Dict[str, List[str]]] = None,
+                     db_name: Optional[str] = None) -> Optional[Dict]:
+    """
+    {"dataset": ["a","b"]} 형태 필터 (+ db_name) → Chroma where (조건 2개 이상이면 $and)
+    - 이미 where 형식($and/$or, {"k": {"$in": ...}})이면 그대로 사용
+    """
+    if filters and any(k.startswith("$") or isinstance(v, dict) for k, v in filters.items()):
+        conds = [filters]
+    else:
+        conds = []
+        for key, values in (filters or {}).items():
+            values = values if isinstance(values, list) else [values]
+            conds.append({key: values[0]} if len(values) == 1 else {key: {"$in": values}})
+    if db_name:
+        conds.append({"db_name": db_name})
+    if not conds:
+        return None
+    return conds[0] if len(conds) == 1 else {"$and": conds}
+
+def match_where(meta: Dict, where: Optional[Dict]) -> bool:
+    if not where:
+        return True
+    for key, cond in where.items():
+        if key == "$and":
+            if not all(match_where(meta, c) for c in cond):
+                return False
+        elif key == "$or":
+            if not any(match_where(meta, c) for c in cond):
+                return False
+        elif isinstance(cond, dict):
+            v = meta.get(key)
+            for op, x in cond.items():
+                try:
+                    if not _OPS[op](v, x):
+                        return False
+                except TypeError:  # 타입이 달라 비교 불가 → 불일치
+                    return False
+        elif meta.get(key) != cond:
+            return False
+    return True
+
+# ---------------- 스냅샷 ----------------
+class ExactIndex:
+    def __init__(self, name: str, space: str, count: int, vectors: np.ndarray, sq_norms: np.ndarray,
+                 ids: List[str], documents: List[str], metadatas: List[Dict], version: str = ""):
+        self.name, self.space, self.count, self.version = name, space, count, version
+        self.vectors = vectors               # (N, D) mmap
+        self.sq_norms = sq_norms             # (N,) |x|² — 빌드 때 저장(열 때 mmap 전체를 다시 읽지 않음)
+        self.ids, self.documents, self.metadatas = ids, documents, metadatas
+        self._rows: Dict[str, np.ndarray] = {}   # where(JSON) → 통과 행 번호
+
+    def distances(self, q: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """q: (Q, D) → (Q, N) Chroma distance"""
+        m = self.vectors if rows is None else self.vectors[rows]
+        dots = (q.astype(m.dtype) @ m.T).astype(np.float32)
+        if self.space == "ip":
+            return 1.0 - dots
+        sq = self.sq_norms if rows is None else self.sq_norms[rows]
+        if self.space == "cosine":
+            norms = np.sqrt(sq)[None, :] * np.linalg.norm(q, axis=1, keepdims=True)
+            return 1.0 - dots / np.clip(norms, 1e-12, None)
+        qq = np.einsum("ij,ij->i", q, q)[:, None]
+        return np.maximum(sq[None, :] + qq - 2.0 * dots, 0.0)   # Chroma l2 = 제곱 거리
+
+    def filter_rows(self, where: Dict) -> np.ndarray:
+        key = json.dumps(where, sort_keys=True, ensure_ascii=False)
+        rows = self._rows.get(key)
+        if rows is None:
+            rows = np.fromiter((i for i, m in enumerate(self.metadatas) if match_where(m or {}, where)),
+                               dtype=np.int64)
+            if len(self._rows) >= 256:
+                self._rows.clear()
+            self._rows[key] = rows
+        return rows
+
+    def search_many(self, qvecs, k: int, where: Optional[Dict] = None) -> List[List[Dict]]:
+        """질의 Q개를 행렬·행렬 곱 1번으로 검색"""
+        q = np.atleast_2d(np.asarray(qvecs, dtype=np.float32))
+        rows = self.filter_rows(where) if where else None
+        if rows is not None and rows.size == 0:
+            return [[] for _ in range(q.shape[0])]
+        d = self.distances(q, rows)
+        n = d.shape[1]
+        k = min(k, n)
+        top = np.argpartition(d, k - 1, axis=1)[:, :k] if k < n else np.tile(np.arange(n), (q.shape[0], 1))
+        out = []
+        for qi in range(q.shape[0]):
+            order = top[qi][np.argsort(d[qi, top[qi]])]
+            hits = []
+            for j in order:
+                i = int(rows[j]) if rows is not None else int(j)
+                hits.append({"id": self.ids[i], "text": self.documents[i], "meta": self.metadatas[i] or {},
+                             "score": 1.0 - float(d[qi, j])})
+            out.append(hits)
+        return out
+
+    def search(self, qvec, k: int, where: Optional[Dict] = None) -> List[Dict]:
+        return self.search_many([qvec], k, where)[0]
+
+_INDEXES: Dict[str, ExactIndex] = {}
+_BUILDING: Dict[str, threading.Thread] = {}
+_FAILED_AT: Dict[str, float] = {}
+_LOCK = threading.Lock()
+
+def _current_path(name: str) -> str:
+    return os.path.join(EXACT_DIR, f"{name}.current")
+
+def _version_path(name: str) -> str:
+    return os.path.join(EXACT_DIR, f"{name}.version")
+
+def _read(path: str) -> str:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+def _write(path: str, text: str) -> None:
+    """tmp에 쓰고 rename → 읽는 쪽은 이전 값 또는 새 값만 봄"""
+    os.makedirs(EXACT_DIR, exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}-{threading.get_ident()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def _version(name: str) -> str:
+    """인덱싱 시점 표식 (없으면 "")"""
+    return _read(_version_path(name))
+
+def _space(col) -> str:
+    return ((col.metadata or {}).get("hnsw:space") or "l2").lower()
+
+def _prune(name: str, keep: List[str]) -> None:
+    """현재/직전 스냅샷을 뺀 이 컬렉션의 예전 스냅샷 폴더 삭제 (구 구조 exact/<컬렉션>/ 포함)"""
+    try:
+        entries = os.listdir(EXACT_DIR)
+    except OSError:
+        return
+    for e in entries:
+        if (e == name or e.startswith(f"{name}@")) and e not in keep:
+            shutil.rmtree(os.path.join(EXACT_DIR, e), ignore_errors=True)
+
+def _build(col, count: int, version: str) -> ExactIndex:
+    ids, docs, metas, vecs = [], [], [], []
+    for off in range(0, count, PAGE):
+        got = col.get(include=["embeddings", "documents", "metadatas"], limit=PAGE, offset=off)
+        ids += got["ids"]; docs += got["documents"]; metas += got["metadatas"]
+        vecs.append(np.asarray(got["embeddings"], dtype=np.float32))
+    dtype = np.float16 if EXACT_DTYPE == "float16" else np.float32
+    matrix = np.ascontiguousarray(np.concatenate(vecs) if vecs else np.zeros((0, 0)), dtype=dtype)
+    stored = matrix.astype(np.float32)   # 저장된 정밀도 그대로의 |x|² (질의 때 내적과 같은 값 기준)
+    sq_norms = np.einsum("ij,ij->i", stored, stored) if stored.size else np.zeros(len(ids), dtype=np.float32)
+
+    name = col.name
+    snap = f"{name}@{time.time_ns()}-{os.getpid()}"
+    d = os.path.join(EXACT_DIR, snap)
+    os.makedirs(d)
+    np.save(os.path.join(d, "vectors.npy"), matrix)
+    np.save(os.path.join(d, "norms.npy"), sq_norms.astype(np.float32))
+    with open(os.path.join(d, "rows.json"), "w", encoding="utf-8") as f:
+        json.dump({"count": count, "version": version, "space": _space(col), "dtype": EXACT_DTYPE,
+                   "ids": ids, "documents": docs, "metadatas": metas}, f, ensure_ascii=False)
+    prev = _read(_current_path(name))
+    _write(_current_path(name), snap)   # 교체는 포인터 파일 rename 1번
+    _prune(name, keep=[snap, prev])
+    print(f"[exact] snapshot {name}: {len(ids)} vectors ({EXACT_DTYPE})")
+    return _open(name)
+
+def _open(name: str) -> Optional[ExactIndex]:
+    snap = _read(_current_path(name))
+    if not snap:
+        return None
+    d = os.path.join(EXACT_DIR, snap)
+    try:
+        with open(os.path.join(d, "rows.json"), "r", encoding="utf-8") as f:
+            rows = json.load(f)
+        vectors = np.load(os.path.join(d, "vectors.npy"), mmap_mode="r")
+        sq_norms = np.load(os.path.join(d, "norms.npy"))
+    except (OSError, ValueError):
+        return None
+    if rows.get("dtype", "float32") != EXACT_DTYPE:
+        return None
+    return ExactIndex(name, rows["space"], rows["count"], vectors, sq_norms,
+                      rows["ids"], rows["documents"], rows["metadatas"], rows.get("version", ""))
+
+def _rebuild(col, count: int, version: str) -> None:
+    """백그라운드: 다른 프로세스가 이미 만든 스냅샷이 최신이면 열기만, 아니면 새로 만들어 교체"""
+    name = col.name
+    try:
+        idx = _open(name)
+        if idx is None or idx.count != count or idx.version != version:
+            idx = _build(col, count, version)
+        with _LOCK:
+            _INDEXES[name] = idx   # 참조 교체(읽는 쪽은 이전 스냅샷을 끝까지 사용)
+            _FAILED_AT.pop(name, None)
+    except Exception as e:
+        print(f"[exact] snapshot {name} failed ({type(e).__name__}: {e}) → HNSW, retry in {RETRY_S}s")
+        with _LOCK:
+            _FAILED_AT[name] = time.time()
+    finally:
+        with _LOCK:
+            _BUILDING.pop(name, None)
+
+def get_index(col) -> Optional[ExactIndex]:
+    """
+    정확 검색 대상이고 최신 스냅샷이 준비돼 있으면 그 스냅샷, 아니면 None(→ HNSW)
+    - 스냅샷이 없거나 오래됐으면 백그라운드 재생성만 걸고 바로 None (요청 경로에서 빌드/락 대기 없음)
+    """
+    if RAG_SEARCH_ENGINE == "hnsw":
+        return None
+    count = col.count()
+    if count == 0 or (RAG_SEARCH_ENGINE == "auto" and count > EXACT_MAX_VECTORS):
+        return None
+    version = _version(col.name)   # 스냅샷보다 먼저 읽음 → 만드는 중 바뀌면 다음 질의에서 다시 생성
+    idx = _INDEXES.get(col.name)
+    if idx is not None and idx.count == count and idx.version == version:
+        return idx
+    with _LOCK:
+        if col.name not in _BUILDING and time.time() - _FAILED_AT.get(col.name, 0.0) >= RETRY_S:
+            t = threading.Thread(target=_rebuild, args=(col, count, version),
+                                 name=f"exact-{col.name}", daemon=True)
+            _BUILDING[col.name] = t
+            t.start()
+    return None
+
+def invalidate(name: str) -> None:
+    """
+    인덱싱 후 호출: 버전 표식 갱신 → 같은 개수로 내용만 바뀐 경우(upsert)도
+    이 프로세스와 다른 프로세스 모두 다음 질의에서 재생성
+    """
+    _write(_version_path(name), f"{time.time_ns()}-{os.getpid()}")
+    with _LOCK:
+        _INDEXES.pop(name, None)
+
+def query_many(col, qvecs, k: int, where: Optional[Dict] = None) -> List[List[Dict]]:
+    """질의 벡터 여러 개 → 질의별 [{"id","text","meta","score"}] (정확 검색 또는 HNSW 다중 행 질의)"""
+    qvecs = np.atleast_2d(np.asarray(qvecs, dtype=np.float32))
+    if qvecs.shape[0] == 0:
+        return []
+    idx = get_index(col)
+    if idx is not None:
+        return idx.search_many(qvecs, k, where)
+    res = col.query(
+        query_embeddings=qvecs.tolist(),
+        n_results=k,
+        include=["documents", "metadatas", "distances"],  # 'ids'는 include 대상 아님(항상 반환)
+        where=where or None,
+    )
+    out = []
+    for qi in range(qvecs.shape[0]):
+        docs  = (res.get("documents") or [])[qi] if res.get("documents") else []
+        metas = (res.get("metadatas") or [])[qi] if res.get("metadatas") else []
+        dists = (res.get("distances") or [])[qi] if res.get("distances") else []
+        ids   = (res.get("ids") or [])[qi] if res.get("ids") else []
+        out.append([{"id": ids[i] if i < len(ids) else None, "text": doc,
+                     "meta": (metas[i] if i < len(metas) else None) or {},
+                     "score": 1.0 - float(dists[i]) if i < len(dists) and dists[i] is not None else None}
+                    for i, doc in enumerate(docs)])
+    return out
+
+def query(col, qvec, k: int, where: Optional[Dict] = None) -> List[Dict]:
+    """정확 검색 또는 HNSW(Chroma) 검색 → [{"id","text","meta","score"}]"""
+    return query_many(col, [qvec], k, where)[0]
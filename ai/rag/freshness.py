@@ -0,0 +1,153 @@
+# ai/rag/freshness.py
+# ================================================================
+# ⏱️ 역할: Mongo 컬렉션 최신 시각(freshness) 조회 — 변경 감지/증분 워터마크용
+# - DB당 aggregate 1번: 컬렉션마다 $unionWith 하위 파이프라인
+#     [{$sort: {updated_at: -1}}, {$limit: 1}]   (updated_at 인덱스 사용)
+#     [{$sort: {_id: -1}}, {$limit: 1}]          (updated_at 없는 컬렉션 → _id 생성시각)
+#   → 컬렉션 수와 무관하게 왕복 1번, 컬렉션당 인덱스 끝 1건만 읽음
+# - $unionWith 미지원(MongoDB < 4.4, mongomock 등)이면 컬렉션별 find().sort().limit(1)로 폴백
+# - (옵션) updated_at 인덱스 확인/생성: MONGO_ENSURE_INDEXES=true면 없을 때 생성, 아니면 경고만
+# - 결과는 FRESHNESS_TTL_S 동안 캐시 (auto_index 변경 감지가 질의마다 Mongo를 두드리지 않도록)
+#
+# 환경변수
+# - FRESHNESS_TTL_S=30
+# - MONGO_ENSURE_INDEXES=false
+# ================================================================
+from __future__ import annotations
+
+import datetime, os, re, threading, time
+from typing import Dict, List, Optional, Tuple
+
+from .config import MONGO_UPDATED_FIELD
+
+FRESHNESS_TTL_S = float(os.getenv("FRESHNESS_TTL_S", "30"))
+MONGO_ENSURE_INDEXES = os.getenv("MONGO_ENSURE_INDEXES", "false").lower() == "true"
+
+_CACHE: Dict[Tuple, Tuple[float, Dict[str, int]]] = {}
+_CHECKED: set = set()   # 인덱스 확인을 마친 (db, 컬렉션, 필드)
+_NO_UNION: set = set()  # $unionWith 실패한 DB
+_LOCK = threading.Lock()
+
+def _coerce_ts(v) -> Optional[int]:
+    if isinstance(v, datetime.datetime): return int(v.timestamp())
+    if isinstance(v, (int, float)):      return int(v)
+    if isinstance(v, str):
+        s = v.strip()
+        if re.fullmatch(r"\d{10,13}", s):
+            return int(s[:10])
+        try:
+            return int(datetime.datetime.fromisoformat(s.replace("Z", "").replace("T", " ")).timestamp())
+        except ValueError:
+            return None
+    return None
+
+def _ts_of(doc: Optional[Dict], uf: str) -> int:
+    if not doc:
+        return 0
+    ts = _coerce_ts(doc.get(uf))
+    if ts:
+        return ts
+    oid = doc.get("_id")
+    try:
+        return int(oid.generation_time.timestamp())
+    except AttributeError:
+        return 0
+
+# ---------------- 인덱스 ----------------
+def ensure_indexes(db, names: List[str], uf: Optional[str] = None,
+                   create: Optional[bool] = None) -> Dict[str, str]:
+    """{컬렉션: "ok" | "created" | "missing" | "error"} — uf로 시작하는 인덱스가 있는지 확인"""
+    uf = uf or MONGO_UPDATED_FIELD or "updated_at"
+    create = MONGO_ENSURE_INDEXES if create is None else create
+    out = {}
+    for cname in names:
+        try:
+            keys = [list(ix["key"])[0][0] for ix in db[cname].index_information().values() if ix.get("key")]
+            if uf in keys:
+                out[cname] = "ok"
+            elif create:
+                db[cname].create_index([(uf, -1)], name=f"{uf}_-1")
+                out[cname] = "created"
+            else:
+                out[cname] = "missing"
+        except Exception as e:
+            out[cname] = "error"
+            print(f"[freshness] index check failed {db.name}.{cname}: {e}")
+    missing = [c for c, v in out.items() if v == "missing"]
+    if missing:
+        print(f"[freshness] no index on {uf} in {db.name}: {missing} (MONGO_ENSURE_INDEXES=true로 생성)")
+    return out
+
+def _check_indexes_once(db, names: List[str], uf: str) -> None:
+    todo = [c for c in names if (db.name, c, uf) not in _CHECKED]
+    if todo:
+        ensure_indexes(db, todo, uf)
+        _CHECKED.update((db.name, c, uf) for c in todo)
+
+# ---------------- 최신 시각 ----------------
+def _branch(uf: str, cname: str) -> List[List[Dict]]:
+    by_uf = [{"$sort": {uf: -1}}, {"$limit": 1},
+             {"$project": {"_id": 1, uf: 1}}, {"$set": {"__c": cname}}]
+    by_id = [{"$sort": {"_id": -1}}, {"$limit": 1},
+             {"$project": {"_id": 1}}, {"$set": {"__c": cname}}]
+    return [by_uf, by_id]
+
+def _latest_aggregate(db, names: List[str], uf: str) -> Dict[str, int]:
+    first, *rest = names
+    pipeline = list(_branch(uf, first)[0])
+    pipeline.append({"$unionWith": {"coll": first, "pipeline": _branch(uf, first)[1]}})
+    for cname in rest:
+        for sub in _branch(uf, cname):
+            pipeline.append({"$unionWith": {"coll": cname, "pipeline": sub}})
+
+    by_uf: Dict[str, int] = {}
+    by_id: Dict[str, int] = {}
+    for doc in db[first].aggregate(pipeline):
+        c = doc.pop("__c")
+        ts = _coerce_ts(doc.get(uf))
+        if ts:
+            by_uf[c] = max(by_uf.get(c, 0), ts)
+        else:
+            by_id[c] = max(by_id.get(c, 0), _ts_of(doc, uf))
+    return {c: by_uf.get(c) or by_id.get(c, 0) for c in names}
+
+def _latest_find(db, names: List[str], uf: str) -> Dict[str, int]:
+    out = {}
+    for cname in names:
+        coll = db[cname]
+        doc = next(iter(coll.find({}, {uf: 1}).sort([(uf, -1)]).limit(1)), None)
+        if doc is None or not _coerce_ts(doc.get(uf)):
+            doc = next(iter(coll.find({}, {"_id": 1}).sort([("_id", -1)]).limit(1)), None)
+        out[cname] = _ts_of(doc, uf)
+    return out
+
+def latest_map(db, names: List[str], uf: Optional[str] = None, use_cache: bool = True) -> Dict[str, int]:
+    """{컬렉션: 최신 타임스탬프(updated_at, 없으면 _id 생성시각, 빈 컬렉션 0)}"""
+    uf = uf or MONGO_UPDATED_FIELD or "updated_at"
+    if not names:
+        return {}
+    key = (db.name, tuple(names), uf)
+    now = time.monotonic()
+    if use_cache:
+        hit = _CACHE.get(key)
+        if hit is not None and hit[0] > now:
+            return dict(hit[1])
+
+    _check_indexes_once(db, names, uf)
+    out = None
+    if db.name not in _NO_UNION:
+        try:
+            out = _latest_aggregate(db, names, uf)
+        except Exception as e:   # $unionWith 미지원 등 → 이 DB는 이후 바로 폴백
+            print(f"[freshness] aggregate unavailable on {db.name} ({type(e).__name__}) → per-collection find")
+            _NO_UNION.add(db.name)
+    if out is None:
+        out = _latest_find(db, names, uf)
+
+    with _LOCK:
+        _CACHE[key] = (now + FRESHNESS_TTL_S, out)
+    return dict(out)
+
+def invalidate() -> None:
+    with _LOCK:
+        _CACHE.clear()
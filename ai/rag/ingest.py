@@ -7,13 +7,21 @@
 #
 # 환경변수
 # - EMBEDDER_MODEL=intfloat/multilingual-e5-small | ...   (기본: small)
-# - EMBED_BATCH=64                                       (임베딩 배치 크기)
+# - EMBED_BATCH=64                                       (배치당 최대 문장 수)
+# - EMBED_BATCH_TOKENS=8192                              (배치당 토큰 예산, embeddings.encode_batched)
+# - EMBED_BACKEND=torch|onnx                             (임베딩 백엔드, embeddings.py 참고)
+# - EMBED_DIM=0|128|...                                  (PCA 차원 축소 저장, projection.py 참고)
 # - MONGO_INCREMENTAL=true|false                         (증분 인덱싱 on/off)
+# - MONGO_DBS=db1,db2                                    (여러 DB 인덱싱, 비우면 MONGO_DB)
+# - MONGO_INGEST_WORKERS=4                               (컬렉션 병렬 읽기 스레드 수)
+# - CHROMA_UPSERT_BATCH=2000                             (upsert 배치, Chroma max_batch_size 이하로 자동 제한)
+# - CHUNKER=sentence|legacy                              (청크 방식, chunker.py 참고)
 # ================================================================
 from __future__ import annotations
 
 from typing import List, Dict, Optional
 import os, re, glob, datetime, json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # --- PDF 추출 도구 (PyMuPDF 우선) ---
 try:
@@ -29,15 +37,21 @@ from pymongo import MongoClient
 
 from .config import (
     DATA_DIR, PDF_GLOBS, CHROMA_DIR, COLLECTION_NAME,
-    CHUNK_SIZE, CHUNK_OVERLAP,
+    CHUNK_SIZE, CHUNK_OVERLAP, CHUNKER,
     MONGO_URI, MONGO_DB, MONGO_COLL, MONGO_UPDATED_FIELD,
 )
 from .store import get_client, get_collection
+from .chunker import chunk_text, neighbor_meta
+from .embeddings import get_embedder, encode_batched, e5_prefixes
+from . import docstore, exact, freshness, projection
 
 # ---------------- 설정 ----------------
 EMBEDDER_MODEL = os.getenv("EMBEDDER_MODEL", "intfloat/multilingual-e5-small")
 EMBED_BATCH    = int(os.getenv("EMBED_BATCH", "64"))
 MONGO_INCREMENTAL = os.getenv("MONGO_INCREMENTAL", "true").lower() == "true"
+MONGO_DBS = os.getenv("MONGO_DBS", "")                                  # 쉼표 구분, 비우면 MONGO_DB
+MONGO_INGEST_WORKERS = int(os.getenv("MONGO_INGEST_WORKERS", "4"))      # 컬렉션 병렬 읽기 스레드
+CHROMA_UPSERT_BATCH = int(os.getenv("CHROMA_UPSERT_BATCH", "2000"))     # upsert 배치(≤ max_batch_size)
 _WATERMARK = os.path.join(CHROMA_DIR, "mongo_watermarks.json")
 
 # ================================================================
@@ -54,14 +68,16 @@ def split_paragraphs(text: str) -> List[str]:
     return paras if paras else [text]
 
 def to_chunks(paras: List[str], size=CHUNK_SIZE, overlap=CHUNK_OVERLAP) -> List[str]:
-    buf, chunks = "", []
+    """legacy: 문자수 기준 + 앞 청크 꼬리(overlap) 중복"""
+    buf, buf_len, chunks = [], 0, []
     for p in paras:
-        if len(buf) + len(p) + 1 <= size:
-            buf = (buf + "\n" + p).strip()
+        if not buf or buf_len + len(p) + 1 <= size:
+            buf.append(p)
+            buf_len += len(p) + (1 if buf_len else 0)
         else:
-            if buf: chunks.append(buf)
-            buf = p
-    if buf: chunks.append(buf)
+            chunks.append("\n".join(buf))
+            buf, buf_len = [p], len(p)
+    if buf: chunks.append("\n".join(buf))
     if overlap > 0 and len(chunks) > 1:
         with_overlap = []
         for i, c in enumerate(chunks):
@@ -70,6 +86,11 @@ def to_chunks(paras: List[str], size=CHUNK_SIZE, overlap=CHUNK_OVERLAP) -> List[
         chunks = with_overlap
     return chunks
 
+def make_chunks(text: str) -> List[str]:
+    if CHUNKER == "legacy":
+        return to_chunks(split_paragraphs(text))
+    return chunk_text(text)
+
 def _sanitize_meta(meta: Dict) -> Dict:
     """Chroma 메타 타입 보정: None 제거/기본값 강제."""
     fixed = {}
@@ -83,24 +104,18 @@ def _sanitize_meta(meta: Dict) -> Dict:
     return fixed
 
 def _encode_in_batches(model: SentenceTransformer, docs: List[str]) -> List[List[float]]:
-    """대량 문서를 배치로 임베딩(list[float])."""
-    vecs: List[List[float]] = []
-    for i in range(0, len(docs), EMBED_BATCH):
-        batch = docs[i:i + EMBED_BATCH]
-        emb = model.encode(
-            [f"passage: {d}" for d in batch],
-            convert_to_numpy=True,
-            normalize_embeddings=True,
-        )
-        vecs.extend(emb.tolist())
-    return vecs
-
-# 전역 싱글톤 임베더
+    """대량 문서를 배치로 임베딩(list[float]). 길이순 버킷 + 토큰 예산 배치, 결과는 입력 순서."""
+    passage = e5_prefixes(EMBEDDER_MODEL)[1]
+    emb = encode_batched(model, [passage + d for d in docs],
+                         normalize=True, max_batch=EMBED_BATCH, tag="ingest", verbose=True)
+    return emb.tolist()
+
+# 전역 싱글톤 임베더 (EMBED_BACKEND에 따라 SentenceTransformer 또는 OnnxEmbedder)
 _model = None
 def embedder() -> SentenceTransformer:
     global _model
     if _model is None:
-        _model = SentenceTransformer(EMBEDDER_MODEL)
+        _model = get_embedder(EMBEDDER_MODEL)
     return _model
 
 # ================================================================
@@ -158,7 +173,9 @@ def _ingest_one_pdf(path: str) -> Dict:
         merged = "\n\n".join([t_text, t_table]).strip()
         if not merged:
             continue
-        for idx, chunk in enumerate(to_chunks(split_paragraphs(merged))):
+        chunks = make_chunks(merged)
+        page_ids = [f"pdf::{abspath}::{idx_page+1}-{idx}" for idx in range(len(chunks))]
+        for chunk, cid, nb in zip(chunks, page_ids, neighbor_meta(page_ids)):
             docs.append(chunk)
             metas.append({
                 "source_type": "pdf",
@@ -168,8 +185,9 @@ def _ingest_one_pdf(path: str) -> Dict:
                 "uri": abspath,
                 "updated_at": mtime,
                 "dataset": "규정집",
+                **nb,
             })
-            ids.append(f"pdf::{abspath}::{idx_page+1}-{idx}")
+            ids.append(cid)
 
     if not ids:
         return {"path": path, "pages": n, "chunks": 0}
@@ -179,11 +197,14 @@ def _ingest_one_pdf(path: str) -> Dict:
 
     client = get_client(CHROMA_DIR)
     col    = get_collection(client, name=COLLECTION_NAME)
+    embeds = projection.for_ingest(col, embeds)
     try:
-        col.delete(ids=ids)
+        # 청크 방식/개수가 바뀌면 id가 달라지므로 파일 단위로 기존 청크 삭제
+        col.delete(where={"source_id": abspath})
     except Exception:
         pass
-    col.add(documents=docs, embeddings=embeds, metadatas=metas, ids=ids)
+    col.upsert(documents=docs, embeddings=embeds, metadatas=metas, ids=ids)
+    docstore.index_chunks(ids, docs, metas)
     return {"path": path, "pages": n, "chunks": len(docs)}
 
 def ingest_pdfs(paths: Optional[List[str]] = None) -> Dict:
@@ -193,9 +214,13 @@ def ingest_pdfs(paths: Optional[List[str]] = None) -> Dict:
             paths.extend(glob.glob(os.path.join(DATA_DIR, pat)))
     paths = sorted(set(paths))
     results = []
-    for p in paths:
-        if os.path.exists(p):
-            results.append(_ingest_one_pdf(p))
+    try:
+        for p in paths:
+            if os.path.exists(p):
+                results.append(_ingest_one_pdf(p))
+    finally:
+        if results:   # 파일마다가 아니라 끝에 1번 → exact 스냅샷 재생성도 1번
+            exact.invalidate(COLLECTION_NAME)
     return {"pdf_count": len(paths), "pdf_results": results}
 
 # ================================================================
@@ -240,19 +265,6 @@ def _flatten_texts(obj, max_len=30000) -> str:
 def _updated_field_for(_: str) -> str:
     return (MONGO_UPDATED_FIELD or "updated_at")
 
-def _latest_ts(coll, uf: str) -> int:
-    try:
-        doc = coll.find().sort([(uf, -1)]).limit(1).next()
-        ts  = _coerce_ts(doc.get(uf))
-        if ts: return ts
-    except Exception:
-        pass
-    try:
-        doc = coll.find().sort([("_id", -1)]).limit(1).next()
-        return int(doc["_id"].generation_time.timestamp())
-    except Exception:
-        return 0
-
 def _load_watermarks() -> Dict[str, int]:
     try:
         with open(_WATERMARK, "r", encoding="utf-8") as f:
@@ -265,131 +277,201 @@ def _save_watermarks(wm: Dict[str, int]) -> None:
     with open(_WATERMARK, "w", encoding="utf-8") as f:
         json.dump(wm, f, ensure_ascii=False, indent=2)
 
-def ingest_mongo_all(query: Optional[Dict] = None, limit: Optional[int] = None) -> Dict:
+TEXT_FIELD_CANDIDATES = (
+    "title","subject","content","body","summary","text","desc","description",
+    "content_html","html","markdown",
+    "내용","본문","요약","설명","비고","세부내용","공지내용",
+    "content_list","details",
+)
+
+def _mongo_targets(db_names: Optional[List[str]] = None) -> List[tuple]:
     """
-    - DB 내 여러(또는 모든) 컬렉션 순회 → 본문 구성 → 청크 → 임베딩(배치) → upsert
-    - MONGO_INCREMENTAL=true면 컬렉션별 워터마크 기반 증분 인덱싱
-    - 컬렉션 단위로 한 번만 col.add() 호출
+    [(db, 컬렉션명, dataset, id_key)]
+    - dataset = "<db>.<컬렉션>" (consolidate / LangChain 로더 / 시간표와 같은 규칙 → db_name·dataset 필터가 모든 writer에 맞음)
+    - id_key: 청크 id prefix — MONGO_DB(또는 DB 1개)는 예전처럼 컬렉션명(기존 id를 그대로 덮어씀), 그 외 DB는 dataset
     """
-    db = _connect_db()
-    results, total_docs = [], 0
-    wm = _load_watermarks() if MONGO_INCREMENTAL else {}
+    names = db_names or [d.strip() for d in (MONGO_DBS or MONGO_DB).split(",") if d.strip()]
+    if names == [MONGO_DB]:
+        dbs = [_connect_db()]
+    else:
+        cli = MongoClient(MONGO_URI)
+        dbs = [cli[n] for n in names]
+    targets = []
+    for db in dbs:
+        primary = len(dbs) == 1 or db.name == MONGO_DB
+        for cname in _collection_names(db):
+            dataset = f"{db.name}.{cname}"
+            targets.append((db, cname, dataset, cname if primary else dataset))
+    return targets
+
+def _read_collection(db, cname: str, dataset: str, id_key: str, query: Optional[Dict],
+                     limit: Optional[int], since: int, latest_ts: int) -> Dict:
+    """컬렉션 1개 읽기 → 본문 구성 → 청크/메타/ID (리더 스레드에서 실행)"""
+    coll = db[cname]
+    uf   = _updated_field_for(cname)
+
+    # 증분 쿼리 결합
+    q = dict(query or {})
+    if MONGO_INCREMENTAL and since:
+        q[uf] = {"$gt": datetime.datetime.fromtimestamp(since)}
+
+    cur = coll.find(q)
+    try:
+        cur = cur.sort([(uf, -1)])
+    except Exception:
+        cur = cur.sort([("_id", -1)])
+    if limit:
+        cur = cur.limit(limit)
 
-    TEXT_FIELD_CANDIDATES = (
-        "title","subject","content","body","summary","text","desc","description",
-        "content_html","html","markdown",
-        "내용","본문","요약","설명","비고","세부내용","공지내용",
-        "content_list","details",
-    )
+    docs, metas, ids, src_ids = [], [], [], []
 
-    for cname in _collection_names(db):
-        coll = db[cname]
-        uf   = _updated_field_for(cname)
+    for rec in cur:
+        # --- 본문 구성 ---
+        parts = []
 
-        # 증분 쿼리 결합
-        q = dict(query or {})
-        since = wm.get(cname, 0)
-        if MONGO_INCREMENTAL and since:
-            q[uf] = {"$gt": datetime.datetime.fromtimestamp(since)}
+        ttl = rec.get("title") or rec.get("subject")
+        if isinstance(ttl, str) and ttl.strip():
+            parts.append(f"제목: {ttl.strip()}")
 
-        cur = coll.find(q)
-        try:
-            cur = cur.sort([(uf, -1)])
-        except Exception:
-            cur = cur.sort([("_id", -1)])
-        if limit:
-            cur = cur.limit(limit)
-
-        docs, metas, ids = [], [], []
-
-        for rec in cur:
-            # --- 본문 구성 ---
-            parts = []
-
-            ttl = rec.get("title") or rec.get("subject")
-            if isinstance(ttl, str) and ttl.strip():
-                parts.append(f"제목: {ttl.strip()}")
-
-            if isinstance(rec.get("content_list"), list) and rec["content_list"]:
-                parts.append(_flatten_texts(rec["content_list"]))
-            if isinstance(rec.get("details"), dict) and rec["details"]:
-                parts.append(_flatten_texts(rec["details"]))
-
-            for k in TEXT_FIELD_CANDIDATES:
-                if k in ("content_list", "details"):
-                    continue
-                v = rec.get(k)
-                if isinstance(v, str) and v.strip():
-                    parts.append(v.strip())
-                elif isinstance(v, (list, dict)):
-                    s = _flatten_texts(v)
-                    if s:
-                        parts.append(s)
-
-            if not any(parts):
-                continue
+        if isinstance(rec.get("content_list"), list) and rec["content_list"]:
+            parts.append(_flatten_texts(rec["content_list"]))
+        if isinstance(rec.get("details"), dict) and rec["details"]:
+            parts.append(_flatten_texts(rec["details"]))
 
-            full_text = "\n\n".join(parts)
-
-            # --- 타임스탬프/URI ---
-            ts = _coerce_ts(rec.get(uf))
-            if ts is None:
-                ts = _coerce_ts(rec.get("작성일"))
-            if ts is None:
-                ts = int(rec["_id"].generation_time.timestamp())
-            uri = rec.get("url") or rec.get("link") or ""
-
-            # --- 청크 & 메타/ID ---
-            for idx, chunk in enumerate(to_chunks(split_paragraphs(full_text))):
-                docs.append(chunk)
-                metas.append(_sanitize_meta({
-                    "source_type": "mongo",
-                    "source_id": str(rec.get("_id")),
-                    "title": (ttl or cname) or "",
-                    "page": 0,
-                    "uri": uri or "",
-                    "updated_at": int(ts),
-                    "dataset": cname or "",
-                }))
-                ids.append(f"mongo::{cname}::{str(rec.get('_id'))}::{idx}")
-
-        # --- 컬렉션 단위 upsert ---
-        n_docs, n_ids, n_meta = len(docs), len(ids), len(metas)
-        if n_docs == 0 or n_ids == 0 or n_meta == 0:
-            results.append({"collection": cname, "ingested": 0, "latest_ts": _latest_ts(coll, uf)})
-            # 증분 모드면 워터마크 최신화(신규 없음 케이스)
-            if MONGO_INCREMENTAL:
-                latest = _latest_ts(coll, uf)
-                if latest:
-                    wm[cname] = max(wm.get(cname, 0), latest)
+        for k in TEXT_FIELD_CANDIDATES:
+            if k in ("content_list", "details"):
+                continue
+            v = rec.get(k)
+            if isinstance(v, str) and v.strip():
+                parts.append(v.strip())
+            elif isinstance(v, (list, dict)):
+                s = _flatten_texts(v)
+                if s:
+                    parts.append(s)
+
+        if not any(parts):
             continue
 
-        if not (n_docs == n_ids == n_meta):
-            min_n = min(n_docs, n_ids, n_meta)
-            docs, ids, metas = docs[:min_n], ids[:min_n], metas[:min_n]
-
-        model  = embedder()
-        embeds = _encode_in_batches(model, docs)
-
-        client = get_client(CHROMA_DIR)
-        col    = get_collection(client, name=COLLECTION_NAME)
+        full_text = "\n\n".join(parts)
+
+        # --- 타임스탬프/URI ---
+        ts = _coerce_ts(rec.get(uf))
+        if ts is None:
+            ts = _coerce_ts(rec.get("작성일"))
+        if ts is None:
+            ts = int(rec["_id"].generation_time.timestamp())
+        uri = rec.get("url") or rec.get("link") or ""
+
+        # --- 청크 & 메타/ID ---
+        chunks = make_chunks(full_text)
+        rec_ids = [f"mongo::{id_key}::{str(rec.get('_id'))}::{idx}" for idx in range(len(chunks))]
+        src_ids.append(str(rec.get("_id")))
+        for chunk, cid, nb in zip(chunks, rec_ids, neighbor_meta(rec_ids)):
+            docs.append(chunk)
+            metas.append(_sanitize_meta({
+                "source_type": "mongo",
+                "source_id": str(rec.get("_id")),
+                "title": (ttl or cname) or "",
+                "page": 0,
+                "uri": uri or "",
+                "updated_at": int(ts),
+                "dataset": dataset or "",
+                "db_name": db.name or "",
+                **nb,
+            }))
+            ids.append(cid)
+
+    return {"dataset": dataset, "id_key": id_key, "docs": docs, "metas": metas, "ids": ids,
+            "src_ids": src_ids, "latest_ts": latest_ts}
+
+def _write_collection(col, part: Dict, embeds: List[List[float]], batch: int) -> int:
+    """단일 writer 스레드: 기존 청크 삭제 → batch 단위 upsert (Chroma max_batch_size 이하)"""
+    dataset, src_ids = part["dataset"], part["src_ids"]
+    datasets = sorted({dataset, part["id_key"]})   # 예전 규칙(dataset=컬렉션명)으로 쓴 청크도 함께 정리
+    docs, metas, ids = part["docs"], part["metas"], part["ids"]
+    embeds = projection.for_ingest(col, embeds)
+    for i in range(0, len(src_ids), batch):
         try:
-            col.delete(ids=ids)
+            # 레코드 단위로 기존 청크 삭제(청크 수가 줄어든 경우 남는 id 방지)
+            col.delete(where={"$and": [{"dataset": {"$in": datasets}}, {"source_id": {"$in": src_ids[i:i + batch]}}]})
         except Exception:
             pass
-        col.add(documents=docs, embeddings=embeds, metadatas=metas, ids=ids)
+    for i in range(0, len(ids), batch):
+        sl = slice(i, i + batch)
+        col.upsert(documents=docs[sl], embeddings=embeds[sl], metadatas=metas[sl], ids=ids[sl])
+        docstore.index_chunks(ids[sl], docs[sl], metas[sl])
+    print(f"[ingest][{dataset}] docs={len(docs)} ids={len(ids)} metas={len(metas)}")
+    return len(ids)
+
+def ingest_mongo_all(query: Optional[Dict] = None, limit: Optional[int] = None,
+                     db_names: Optional[List[str]] = None, workers: Optional[int] = None) -> Dict:
+    """
+    - 여러 DB(MONGO_DBS) × 컬렉션을 리더 스레드 N개(MONGO_INGEST_WORKERS)가 병렬로 읽고 청크화
+    - 읽기가 끝난 컬렉션부터 임베딩(공유 모델 1개, 토큰 예산 배치)
+    - Chroma 쓰기는 단일 writer 스레드가 순서대로(max_batch_size 이하 배치 upsert)
+      → 읽기 / 임베딩 / 쓰기가 서로 겹쳐서 진행
+    - MONGO_INCREMENTAL=true면 컬렉션별 워터마크 기반 증분 인덱싱
+    """
+    targets = _mongo_targets(db_names)
+    # 워터마크 키 = dataset("<db>.<컬렉션>") → 예전 키(컬렉션명)만 있는 MONGO_DB 컬렉션은 한 번 전체를 다시 읽어
+    # 같은 id에 새 메타(dataset)를 덮어씀
+    wm = _load_watermarks() if MONGO_INCREMENTAL else {}
 
-        ing_cnt = len(docs)
-        total_docs += ing_cnt
-        results.append({"collection": cname, "ingested": ing_cnt, "latest_ts": _latest_ts(coll, uf)})
+    # 컬렉션별 최신 시각: 읽기 전에 DB당 aggregate 1번 (읽는 도중 바뀐 문서는 다음 증분에서 다시 읽힘)
+    latest: Dict[tuple, int] = {}
+    by_db: Dict[str, tuple] = {}
+    for db, cname, _, _ in targets:
+        by_db.setdefault(db.name, (db, []))[1].append(cname)
+    for db, names in by_db.values():
+        for cname, ts in freshness.latest_map(db, names, use_cache=False).items():
+            latest[(db.name, cname)] = ts
+    workers = max(1, workers or MONGO_INGEST_WORKERS)
 
-        # 워터마크 갱신
-        if MONGO_INCREMENTAL:
-            latest = _latest_ts(coll, uf)
-            if latest:
-                wm[cname] = max(wm.get(cname, 0), latest)
+    client = get_client(CHROMA_DIR)
+    col    = get_collection(client, name=COLLECTION_NAME)
+    batch  = max(1, min(CHROMA_UPSERT_BATCH, client.get_max_batch_size()))
+    model  = embedder()
 
-        print(f"[ingest][{cname}] docs={len(docs)} ids={len(ids)} metas={len(metas)}")
+    results, total_docs, pending = [], 0, []
+    # 빈 컬렉션 + EMBED_DIM: 컬렉션 하나가 PCA 학습 개수보다 작을 수 있으므로 학습 개수가 모일 때까지 쓰기 보류
+    need = projection.fit_size(col)
+    held: List[tuple] = []   # (part, embeds)
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mongo-read") as readers, \
+             ThreadPoolExecutor(max_workers=1, thread_name_prefix="chroma-write") as writer:
+            futs = [readers.submit(_read_collection, db, cname, dataset, id_key, query, limit,
+                                   wm.get(dataset, 0), latest.get((db.name, cname), 0))
+                    for db, cname, dataset, id_key in targets]
+            for fut in as_completed(futs):
+                part = fut.result()
+                dataset = part["dataset"]
+                n = len(part["ids"])
+                if n:
+                    held.append((part, _encode_in_batches(model, part["docs"])))
+                    if sum(len(e) for _, e in held) >= need:
+                        if need:
+                            projection.fit(col, [v for _, e in held for v in e])
+                            need = 0
+                        for p, embeds in held:
+                            # 임베딩이 쓰기보다 많이 앞서면 메모리만 쌓이므로 대기 중 쓰기는 2개까지
+                            while len(pending) >= 2:
+                                pending.pop(0).result()
+                            pending.append(writer.submit(_write_collection, col, p, embeds, batch))
+                        held = []
+                total_docs += n
+                results.append({"collection": dataset, "ingested": n, "latest_ts": part["latest_ts"]})
+
+                # 워터마크 갱신 (신규 없음 케이스 포함)
+                if MONGO_INCREMENTAL and part["latest_ts"]:
+                    wm[dataset] = max(wm.get(dataset, 0), part["latest_ts"])
+            # 전체가 학습 개수보다 적으면 전체 차원으로 저장 (for_ingest가 안내 출력)
+            for p, embeds in held:
+                pending.append(writer.submit(_write_collection, col, p, embeds, batch))
+            for f in pending:
+                f.result()
+    finally:
+        if total_docs:   # 컬렉션마다가 아니라 끝(실패 포함)에 1번 → exact 스냅샷 재생성도 1번
+            exact.invalidate(col.name)
 
     if MONGO_INCREMENTAL:
         _save_watermarks(wm)
@@ -0,0 +1,234 @@
+# ai/rag/jobs.py
+# ================================================================
+# 🧵 역할: 인덱싱 작업 큐 (HTTP 요청과 분리된 백그라운드 실행)
+# - submit() → job id 즉시 반환, 백그라운드 워커 스레드 1개가 등록 순서대로 실행
+#   (서빙 워커/프록시 타임아웃과 무관하게 긴 재인덱싱 수행)
+# - 큐/상태/진행률은 SQLite(INGEST_JOBS_PATH, 기본 CHROMA_DIR/jobs.sqlite3)에 저장
+#   → 서버 재시작 후에도 대기 작업 유지
+#   → 실행 중에는 별도 타이머 스레드가 INGEST_JOB_STALE_S/3마다 heartbeat 갱신
+#     (진행률이 안 바뀌는 긴 단계 — 큰 PDF 파싱/임베딩 — 에서도 살아 있음을 알림)
+#   → heartbeat가 INGEST_JOB_STALE_S 넘게 멈춘 running 작업(프로세스 종료)은 queued로 되돌려 처음부터 재실행
+#     (청크 id가 결정적이고 upsert라 재실행해도 중복 없음)
+# - 단계별 진행률: docs(읽은 문서) / chunks / embedded / upserted (+ 단계별 total)
+# - 취소: queued는 즉시 cancelled, running은 다음 배치 경계(progress.check())에서 중단
+#   (이미 upsert된 배치는 남음)
+# - 같은 파일을 쓰는 여러 프로세스가 있어도 UPDATE ... WHERE status='queued'로 1곳만 실행
+#
+# 작업 함수 규약: fn(**params, progress=Progress) → dict(결과)
+# params는 JSON으로 저장 가능한 값만 (datetime 등은 submit에서 ValueError — 문자열로 바뀌어 실행되지 않도록)
+# ================================================================
+from __future__ import annotations
+
+import importlib, json, os, sqlite3, threading, time, traceback, uuid
+from typing import Dict, List, Optional
+
+from .config import INGEST_JOBS_PATH, INGEST_JOB_STALE_S
+
+# kind → "모듈:함수" (rag 패키지 기준 상대 경로, 워커에서 지연 import)
+RUNNERS = {
+    "ingest_data": ".refactored_rag:ingest_data",        # PDF + Mongo 전체 (stt-tts /rag/ingest)
+    "update_vector_db": ".app:update_vector_db",         # 최근 N일 Mongo 증분 (rag/app.py /ingest)
+}
+STAGES = ("docs", "chunks", "embedded", "upserted")
+FLUSH_INTERVAL_S = 0.5   # 진행률 저장 최소 간격
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    params      TEXT NOT NULL,
+    status      TEXT NOT NULL,          -- queued | running | done | failed | cancelled
+    progress    TEXT NOT NULL DEFAULT '{}',
+    result      TEXT,
+    error       TEXT,
+    cancel      INTEGER NOT NULL DEFAULT 0,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    heartbeat   REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+"""
+
+class JobCancelled(Exception):
+    pass
+
+_LOCAL = threading.local()
+
+def _conn() -> sqlite3.Connection:
+    con = getattr(_LOCAL, "con", None)
+    if con is None:
+        os.makedirs(os.path.dirname(INGEST_JOBS_PATH) or ".", exist_ok=True)
+        con = sqlite3.connect(INGEST_JOBS_PATH, timeout=30, isolation_level=None)  # autocommit
+        con.execute("PRAGMA journal_mode=WAL")
+        con.executescript(_SCHEMA)
+        con.row_factory = sqlite3.Row
+        _LOCAL.con = con
+    return con
+
+# ---------------- 진행률 ----------------
+class Progress:
+    """
+    작업 함수에 전달되는 진행률/취소 핸들
+    - job_id 없이 만들면(직접 호출/동기 실행) 집계만 하고 저장/취소 없음
+    """
+
+    def __init__(self, job_id: Optional[str] = None):
+        self.job_id = job_id
+        self.counts = {s: 0 for s in STAGES}
+        self.totals: Dict[str, int] = {}
+        self._flushed = 0.0
+
+    def add(self, stage: str, n: int = 1) -> None:
+        self.counts[stage] = self.counts.get(stage, 0) + n
+        self._flush()
+
+    def total(self, stage: str, n: int) -> None:
+        self.totals[stage] = n
+        self._flush(force=True)
+
+    def check(self) -> None:
+        """배치 경계에서 호출: 취소 요청이 있으면 JobCancelled"""
+        if self.job_id is None:
+            return
+        self._flush()
+        row = _conn().execute("SELECT cancel FROM jobs WHERE id=?", (self.job_id,)).fetchone()
+        if row is not None and row["cancel"]:
+            raise JobCancelled(self.job_id)
+
+    def snapshot(self) -> Dict:
+        return {"counts": dict(self.counts), "totals": dict(self.totals)}
+
+    def _flush(self, force: bool = False) -> None:
+        if self.job_id is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._flushed < FLUSH_INTERVAL_S:
+            return
+        self._flushed = now
+        _conn().execute("UPDATE jobs SET progress=?, heartbeat=? WHERE id=?",
+                        (json.dumps(self.snapshot()), time.time(), self.job_id))
+
+# ---------------- 큐 API ----------------
+def _row(r: sqlite3.Row) -> Dict:
+    d = dict(r)
+    d["params"] = json.loads(d["params"] or "{}")
+    d["progress"] = json.loads(d["progress"] or "{}")
+    d["result"] = json.loads(d["result"]) if d["result"] else None
+    d["cancel"] = bool(d["cancel"])
+    return d
+
+def submit(kind: str, params: Optional[Dict] = None) -> Dict:
+    if kind not in RUNNERS:
+        raise ValueError(f"unknown job kind: {kind}")
+    try:
+        raw = json.dumps(params or {})
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"job params must be JSON-serializable: {e}") from e
+    job_id = uuid.uuid4().hex
+    _conn().execute(
+        "INSERT INTO jobs(id, kind, params, status, created_at) VALUES (?,?,?,?,?)",
+        (job_id, kind, raw, "queued", time.time()),
+    )
+    start_worker()
+    _WAKE.set()
+    return get(job_id)
+
+def get(job_id: str) -> Optional[Dict]:
+    r = _conn().execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+    return _row(r) if r else None
+
+def list_jobs(limit: int = 20, status: Optional[str] = None) -> List[Dict]:
+    if status:
+        rows = _conn().execute("SELECT * FROM jobs WHERE status=? ORDER BY created_at DESC LIMIT ?",
+                               (status, limit)).fetchall()
+    else:
+        rows = _conn().execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+    return [_row(r) for r in rows]
+
+def cancel(job_id: str) -> Optional[Dict]:
+    con = _conn()
+    con.execute("UPDATE jobs SET status='cancelled', cancel=1, finished_at=? WHERE id=? AND status='queued'",
+                (time.time(), job_id))
+    con.execute("UPDATE jobs SET cancel=1 WHERE id=? AND status='running'", (job_id,))
+    return get(job_id)
+
+# ---------------- 워커 ----------------
+_WORKER: Optional[threading.Thread] = None
+_WORKER_LOCK = threading.Lock()
+_WAKE = threading.Event()
+
+def _claim() -> Optional[Dict]:
+    con = _conn()
+    while True:
+        r = con.execute("SELECT id FROM jobs WHERE status='queued' ORDER BY created_at LIMIT 1").fetchone()
+        if r is None:
+            return None
+        now = time.time()
+        cur = con.execute("UPDATE jobs SET status='running', started_at=?, heartbeat=? "
+                          "WHERE id=? AND status='queued'", (now, now, r["id"]))
+        if cur.rowcount == 1:   # 다른 프로세스가 먼저 가져가면 다음 작업
+            return get(r["id"])
+
+def _resolve(kind: str):
+    mod, fn = RUNNERS[kind].split(":")
+    return getattr(importlib.import_module(mod, __package__), fn)
+
+def _heartbeat(job_id: str, done: threading.Event) -> None:
+    """작업이 끝날 때까지 INGEST_JOB_STALE_S/3마다 heartbeat만 갱신 (진행률 저장과 별개)"""
+    while not done.wait(max(1.0, INGEST_JOB_STALE_S / 3)):
+        try:
+            _conn().execute("UPDATE jobs SET heartbeat=? WHERE id=? AND status='running'", (time.time(), job_id))
+        except sqlite3.Error as e:
+            print(f"[jobs] heartbeat failed {job_id}: {e}")
+
+def run_job(job: Dict) -> None:
+    job_id = job["id"]
+    progress = Progress(job_id)
+    status, result, error = "done", None, None
+    done = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job_id, done), name=f"job-heartbeat-{job_id[:8]}",
+                     daemon=True).start()
+    print(f"[jobs] start {job_id} ({job['kind']})")
+    try:
+        progress.check()
+        result = _resolve(job["kind"])(**job["params"], progress=progress)
+    except JobCancelled:
+        status = "cancelled"
+    except Exception as e:
+        status, error = "failed", f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=3)}"
+    finally:
+        done.set()
+    progress._flush(force=True)
+    _conn().execute("UPDATE jobs SET status=?, result=?, error=?, finished_at=? WHERE id=?",
+                    (status, json.dumps(result, default=str) if result is not None else None,
+                     error, time.time(), job_id))
+    print(f"[jobs] {status} {job_id} {progress.snapshot()['counts']}")
+
+def _requeue_stale() -> None:
+    con, cutoff = _conn(), time.time() - INGEST_JOB_STALE_S
+    con.execute("UPDATE jobs SET status='cancelled', finished_at=? "
+                "WHERE status='running' AND cancel=1 AND heartbeat < ?", (time.time(), cutoff))
+    cur = con.execute("UPDATE jobs SET status='queued', started_at=NULL "
+                      "WHERE status='running' AND cancel=0 AND heartbeat < ?", (cutoff,))
+    if cur.rowcount:
+        print(f"[jobs] requeued {cur.rowcount} stale job(s)")
+
+def _loop() -> None:
+    while True:
+        _requeue_stale()
+        job = _claim()
+        if job is None:
+            _WAKE.wait(timeout=5.0)
+            _WAKE.clear()
+            continue
+        run_job(job)
+
+def start_worker() -> None:
+    """워커 스레드 시작(여러 번 호출해도 1개)"""
+    global _WORKER
+    with _WORKER_LOCK:
+        if _WORKER is not None and _WORKER.is_alive():
+            return
+        _WORKER = threading.Thread(target=_loop, name="ingest-jobs", daemon=True)
+        _WORKER.start()
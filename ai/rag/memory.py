@@ -0,0 +1,238 @@
+# ai/rag/memory.py
+# ================================================================
+# 💬 역할: 세션별 대화 기록 — 후속 질문("그럼 병결은?")에 이전 맥락 제공
+# - 세션 키: 로그인 uid("uid:<uid>"), 비로그인은 클라이언트가 보낸 session_id("anon:<id>")
+# - 최근 턴은 __slots__ 레코드(Turn: 질문/답변/토큰 수) deque로 보관
+#   · 답변은 MEMORY_ANSWER_TOKENS로 잘라 저장(긴 RAG 답변이 기록을 불리지 않도록)
+# - 최근 턴 토큰 합이 MEMORY_HISTORY_TOKENS(또는 턴 수가 MEMORY_MAX_TURNS)를 넘으면
+#   가장 오래된 턴부터 요약 줄("질문 → 답변 첫 문장")로 롤업
+#   · 요약은 LLM 호출 없이 추출식 → 답변은 여전히 LLM 1회
+#   · 요약이 MEMORY_SUMMARY_TOKENS를 넘으면 오래된 줄부터 버림
+#   → 프롬프트 증가량 상한 = 요약 + 최근 턴 (대화가 길어져도 일정)
+# - 프로세스 메모리 LRU(MEMORY_MAX_SESSIONS) + 유휴 만료(MEMORY_TTL_S)
+# - (옵션) 영속화 MEMORY_BACKEND
+#     memory : 없음 (기본)
+#     local  : Redis 호환(get/set ex/delete) 로컬 대체물, SQLite(MEMORY_STORE_PATH)
+#     redis  : MEMORY_REDIS_URL (redis 패키지 필요, 없으면 local로 폴백)
+#   → 턴마다 세션을 JSON으로 저장(SET key value EX ttl), 메모리에 없을 때만 읽음
+#     (서버 재시작/다중 워커 간 이어가기)
+# ================================================================
+from __future__ import annotations
+
+import json, os, re, sqlite3, threading, time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+from .config import (
+    MEMORY_ENABLED, MEMORY_BACKEND, MEMORY_REDIS_URL, MEMORY_STORE_PATH, MEMORY_TTL_S,
+    MEMORY_MAX_SESSIONS, MEMORY_MAX_TURNS, MEMORY_HISTORY_TOKENS, MEMORY_SUMMARY_TOKENS,
+    MEMORY_ANSWER_TOKENS,
+)
+from .tokens import count_tokens, truncate_tokens
+
+KEY_PREFIX = "rag:memory:"
+SUMMARY_LINE_TOKENS = 80   # 요약 1줄 상한
+_SENT_END = re.compile(r"(?<=[.!?。])\s+|\n")
+
+# ---------------- 레코드 ----------------
+class Turn:
+    __slots__ = ("question", "answer", "tokens")
+
+    def __init__(self, question: str, answer: str, tokens: Optional[int] = None):
+        self.question = question
+        self.answer = answer
+        self.tokens = tokens if tokens is not None else count_tokens(question) + count_tokens(answer)
+
+class Session:
+    __slots__ = ("turns", "summary", "touched")
+
+    def __init__(self):
+        self.turns: deque = deque()
+        self.summary: List[str] = []
+        self.touched = time.monotonic()
+
+    def to_json(self) -> str:
+        return json.dumps({"turns": [[t.question, t.answer, t.tokens] for t in self.turns],
+                           "summary": self.summary}, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, raw) -> "Session":
+        d = json.loads(raw)
+        s = cls()
+        s.turns.extend(Turn(q, a, n) for q, a, n in d.get("turns", []))
+        s.summary = list(d.get("summary", []))
+        return s
+
+# ---------------- 영속화 백엔드 ----------------
+class LocalKV:
+    """Redis의 get / set(ex=) / delete 만 흉내 낸 SQLite 저장소 (단일 호스트용 대체물)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            con = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("CREATE TABLE IF NOT EXISTS kv (k TEXT PRIMARY KEY, v TEXT NOT NULL, expires REAL)")
+            self._local.con = con
+        return con
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._conn().execute("SELECT v, expires FROM kv WHERE k=?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] is not None and row[1] <= time.time():
+            self.delete(key)
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str, ex: Optional[float] = None) -> bool:
+        expires = time.time() + ex if ex else None
+        self._conn().execute("INSERT OR REPLACE INTO kv(k, v, expires) VALUES (?,?,?)", (key, value, expires))
+        return True
+
+    def delete(self, key: str) -> int:
+        return self._conn().execute("DELETE FROM kv WHERE k=?", (key,)).rowcount
+
+def _make_backend():
+    if MEMORY_BACKEND == "redis":
+        try:
+            import redis
+            return redis.Redis.from_url(MEMORY_REDIS_URL, decode_responses=True)
+        except ImportError:
+            print("[memory] redis package not installed → local store")
+            return LocalKV(MEMORY_STORE_PATH)
+    if MEMORY_BACKEND == "local":
+        return LocalKV(MEMORY_STORE_PATH)
+    return None
+
+# ---------------- 저장소 ----------------
+_SESSIONS: "OrderedDict[str, Session]" = OrderedDict()
+_LOCK = threading.Lock()
+_BACKEND = None
+_BACKEND_READY = False
+
+def _backend():
+    global _BACKEND, _BACKEND_READY
+    if not _BACKEND_READY:
+        with _LOCK:
+            if not _BACKEND_READY:
+                _BACKEND = _make_backend()
+                _BACKEND_READY = True
+    return _BACKEND
+
+def session_key(uid: Optional[str] = None, session_id: Optional[str] = None) -> Optional[str]:
+    """로그인 uid 우선, 없으면 클라이언트 session_id (서로 다른 네임스페이스 → uid 사칭 불가)"""
+    if not MEMORY_ENABLED:
+        return None
+    if uid:
+        return f"uid:{uid}"
+    if session_id:
+        return f"anon:{str(session_id)[:64]}"
+    return None
+
+def _get(key: str, create: bool) -> Optional[Session]:
+    now = time.monotonic()
+    with _LOCK:
+        s = _SESSIONS.get(key)
+        if s is not None and now - s.touched > MEMORY_TTL_S:
+            _SESSIONS.pop(key)
+            s = None
+        if s is not None:
+            _SESSIONS.move_to_end(key)
+            return s
+
+    backend = _backend()
+    if backend is not None:
+        try:
+            raw = backend.get(KEY_PREFIX + key)
+            if raw:
+                s = Session.from_json(raw)
+        except Exception as e:
+            print(f"[memory] load failed {key}: {e}")
+    if s is None and not create:
+        return None
+    s = s or Session()
+    with _LOCK:
+        s = _SESSIONS.setdefault(key, s)
+        _SESSIONS.move_to_end(key)
+        while len(_SESSIONS) > MEMORY_MAX_SESSIONS:
+            _SESSIONS.popitem(last=False)
+    return s
+
+def _first_sentence(text: str) -> str:
+    text = " ".join((text or "").split())
+    parts = _SENT_END.split(text, maxsplit=1)
+    return parts[0] if parts else text
+
+def _roll_up(s: Session) -> None:
+    """예산 초과분을 오래된 턴부터 요약 줄로 옮기고 요약도 예산 안으로"""
+    total = sum(t.tokens for t in s.turns)
+    while s.turns and (total > MEMORY_HISTORY_TOKENS or len(s.turns) > MEMORY_MAX_TURNS):
+        t = s.turns.popleft()
+        total -= t.tokens
+        s.summary.append(truncate_tokens(f"{t.question} → {_first_sentence(t.answer)}", SUMMARY_LINE_TOKENS))
+    while s.summary and sum(count_tokens(line) for line in s.summary) > MEMORY_SUMMARY_TOKENS:
+        s.summary.pop(0)
+
+# ---------------- API ----------------
+def history(key: Optional[str]) -> List[Dict[str, str]]:
+    """LLM에 넣을 이전 대화 메시지 [{"role","content"}] (요약 → 최근 턴 순, 없으면 [])"""
+    if not key:
+        return []
+    s = _get(key, create=False)
+    if s is None:
+        return []
+    with _LOCK:
+        summary, turns = list(s.summary), list(s.turns)
+    out: List[Dict[str, str]] = []
+    if summary:
+        out.append({"role": "system", "content": "이전 대화 요약:\n" + "\n".join(f"- {x}" for x in summary)})
+    for t in turns:
+        out.append({"role": "user", "content": t.question})
+        out.append({"role": "assistant", "content": t.answer})
+    return out
+
+def append(key: Optional[str], question: str, answer: str) -> None:
+    """턴 추가 → 예산 초과분 롤업 → (옵션) 영속화"""
+    if not key or not question or not answer:
+        return
+    answer = truncate_tokens(answer.strip(), MEMORY_ANSWER_TOKENS)
+    s = _get(key, create=True)
+    with _LOCK:
+        s.turns.append(Turn(question.strip(), answer))
+        s.touched = time.monotonic()
+        _roll_up(s)
+        raw = s.to_json() if _BACKEND is not None else None
+    if raw is not None:
+        try:
+            _BACKEND.set(KEY_PREFIX + key, raw, ex=int(MEMORY_TTL_S))
+        except Exception as e:
+            print(f"[memory] save failed {key}: {e}")
+
+def clear(key: Optional[str]) -> bool:
+    if not key:
+        return False
+    with _LOCK:
+        found = _SESSIONS.pop(key, None) is not None
+    backend = _backend()
+    if backend is not None:
+        try:
+            found = bool(backend.delete(KEY_PREFIX + key)) or found
+        except Exception as e:
+            print(f"[memory] delete failed {key}: {e}")
+    return found
+
+def stats() -> Dict:
+    with _LOCK:
+        sessions = list(_SESSIONS.values())
+    return {
+        "backend": MEMORY_BACKEND,
+        "sessions": len(sessions),
+        "turns": sum(len(s.turns) for s in sessions),
+        "summary_lines": sum(len(s.summary) for s in sessions),
+    }
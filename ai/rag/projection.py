@@ -0,0 +1,193 @@
+# ai/rag/projection.py
+# ================================================================
+# 📉 역할: 저장 벡터 차원 축소 (PCA) — 컬렉션별 투영 파라미터를 인덱스와 함께 보관
+# - EMBED_DIM>0 이고 빈 컬렉션에 처음 인덱싱하는 배치가 충분히 크면(EMBED_PCA_MIN_FIT개 이상, dim 초과)
+#   그 배치로 PCA를 학습 (Mongo 인덱싱/consolidate는 작은 컬렉션·페이지를 학습 개수만큼 모아서 넘김) → CHROMA_DIR/projections/<컬렉션>.npz 저장 + 컬렉션 메타에 embed_dim/projection 기록
+#   배치가 작으면(PDF 1개, 작은 컬렉션) 학습하지 않고 전체 차원으로 저장 → 나중에 reproject로 변환
+# - 이후 인덱싱/질의는 투영 파일이 있으면 자동으로 같은 투영 적용 (EMBED_DIM 값과 무관)
+#   ※ 투영 후 다시 L2 정규화 → 기존과 같은 거리 공간(코사인 ≈ L2)
+# - 이미 전체 차원 벡터가 들어있는 컬렉션에는 적용하지 않음(차원 혼합 불가)
+#   → 기존 인덱스는 reproject로 새 컬렉션에 옮김:
+#     python -m rag.projection reproject --src school_corpus --dst school_corpus_p128 --dim 128
+#
+# 환경변수
+# - EMBED_DIM=0        (0 = 끔, 예: 128 / 192)
+# - EMBED_PCA_MIN_FIT=2000
+# ================================================================
+from __future__ import annotations
+
+import argparse, os, threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .config import CHROMA_DIR, EMBED_DIM, EMBED_PCA_MIN_FIT
+
+PROJECTION_DIR = os.path.join(CHROMA_DIR, "projections")
+
+class Projection:
+    """x → normalize((x - mean) @ components.T)"""
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray, explained: float = 0.0):
+        self.mean = mean.astype(np.float32)
+        self.components = components.astype(np.float32)
+        self.explained = float(explained)
+
+    @property
+    def dim(self) -> int:
+        return int(self.components.shape[0])
+
+    def apply(self, x) -> np.ndarray:
+        x = np.asarray(x, dtype=np.float32)
+        single = x.ndim == 1
+        y = (np.atleast_2d(x) - self.mean) @ self.components.T
+        y /= np.clip(np.linalg.norm(y, axis=1, keepdims=True), 1e-12, None)
+        return y[0] if single else y
+
+def fit_pca(vectors, dim: int) -> Projection:
+    x = np.asarray(vectors, dtype=np.float32)
+    if x.shape[0] <= dim:
+        raise ValueError(f"PCA needs more than {dim} vectors to fit (got {x.shape[0]})")
+    mean = x.mean(axis=0)
+    _, s, vt = np.linalg.svd(x - mean, full_matrices=False)
+    var = s ** 2
+    return Projection(mean, vt[:dim], var[:dim].sum() / max(var.sum(), 1e-12))
+
+# ---------------- 저장/로드 (컬렉션 이름 기준, 프로세스 캐시) ----------------
+# 이름 → (파일 mtime_ns 또는 None, 투영) — 호출마다 stat만 해서 다른 프로세스(reproject CLI, 다른 워커)가
+# 만들거나 바꾼 투영 파일도 바로 반영 ("없음"을 영구 캐시하지 않음)
+_CACHE: Dict[str, tuple] = {}
+_LOCK = threading.Lock()
+
+def _path(name: str) -> str:
+    return os.path.join(PROJECTION_DIR, f"{name}.npz")
+
+def _mtime(p: str) -> Optional[int]:
+    try:
+        return os.stat(p).st_mtime_ns
+    except OSError:
+        return None
+
+def load(name: str) -> Optional[Projection]:
+    p = _path(name)
+    mtime = _mtime(p)
+    hit = _CACHE.get(name)
+    if hit is not None and hit[0] == mtime:
+        return hit[1]
+    with _LOCK:
+        hit = _CACHE.get(name)
+        if hit is None or hit[0] != mtime:
+            proj = None
+            if mtime is not None:
+                z = np.load(p)
+                proj = Projection(z["mean"], z["components"], float(z["explained"]))
+            hit = _CACHE[name] = (mtime, proj)
+    return hit[1]
+
+def save(name: str, proj: Projection, col=None) -> None:
+    os.makedirs(PROJECTION_DIR, exist_ok=True)
+    np.savez(_path(name), mean=proj.mean, components=proj.components, explained=proj.explained)
+    with _LOCK:
+        _CACHE[name] = (_mtime(_path(name)), proj)
+    if col is not None:
+        try:
+            meta = dict(col.metadata or {})
+            meta.update({"projection": "pca", "embed_dim": proj.dim,
+                         "projection_explained": round(proj.explained, 4)})
+            col.modify(metadata=meta)
+        except Exception as e:
+            print(f"[projection] collection metadata not updated: {e}")
+    print(f"[projection] {name}: pca {proj.mean.shape[0]}→{proj.dim} "
+          f"(explained variance {proj.explained:.1%})")
+
+# ---------------- 인덱싱/질의 경로 ----------------
+def _min_fit() -> int:
+    return max(EMBED_PCA_MIN_FIT, EMBED_DIM + 1)
+
+def fit_size(col) -> int:
+    """
+    이 컬렉션에 PCA를 학습시키려면 한 번에 넘겨야 하는 벡터 수 (학습 대상이 아니면 0)
+    → 컬렉션/페이지 단위로 쓰는 쪽(ingest Mongo, consolidate)은 이만큼 모아서 학습
+    """
+    if EMBED_DIM <= 0 or load(col.name) is not None or col.count() > 0:
+        return 0
+    return _min_fit()
+
+def fit(col, vectors) -> Optional[Projection]:
+    """빈 컬렉션 + EMBED_DIM>0 + 충분히 많은 벡터면 PCA 학습/저장 → 투영 (아니면 안내만 출력하고 None)"""
+    if EMBED_DIM <= 0 or not len(vectors) or EMBED_DIM >= len(vectors[0]):
+        return None
+    if col.count() > 0:
+        print(f"[projection] {col.name} already holds full-dim vectors → EMBED_DIM ignored "
+              f"(use `python -m rag.projection reproject`)")
+        return None
+    if len(vectors) < _min_fit():
+        print(f"[projection] {col.name}: {len(vectors)} vectors < {_min_fit()} "
+              f"→ stored full-dim (use `python -m rag.projection reproject` once the index is larger)")
+        return None
+    proj = fit_pca(vectors, EMBED_DIM)
+    save(col.name, proj, col)
+    return proj
+
+def for_ingest(col, vectors: List[List[float]]) -> List[List[float]]:
+    """저장 직전 벡터 투영 (빈 컬렉션 + 충분히 큰 배치면 이 배치로 PCA 학습, 아니면 전체 차원 그대로)"""
+    proj = load(col.name) or fit(col, vectors)
+    return vectors if proj is None else proj.apply(vectors).tolist()
+
+def for_query(name: str, vec):
+    """질의 벡터를 컬렉션의 투영 공간으로 (투영 없으면 그대로)"""
+    proj = load(name)
+    return vec if proj is None else proj.apply(vec)
+
+class ProjectedEmbeddings:
+    """LangChain 임베딩 래퍼: 질의/문서 임베딩에 컬렉션 투영 적용"""
+
+    def __init__(self, base, proj: Projection):
+        self.base, self.proj = base, proj
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.proj.apply(self.base.embed_documents(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.proj.apply(self.base.embed_query(text)).tolist()
+
+def wrap_embeddings(base, name: str):
+    proj = load(name)
+    return base if proj is None else ProjectedEmbeddings(base, proj)
+
+# ================================================================
+# CLI: 기존(전체 차원) 컬렉션 → 투영 컬렉션으로 복사
+# ================================================================
+def reproject(src: str, dst: str, dim: int, page: int = 2000) -> Dict:
+    from .store import get_client
+
+    if load(src) is not None:
+        raise ValueError(f"{src} is already projected; reproject from a full-dimension collection")
+    client = get_client(CHROMA_DIR)
+    s = client.get_collection(name=src)
+    n = s.count()
+    ids, docs, metas, vecs = [], [], [], []
+    for off in range(0, n, page):
+        got = s.get(include=["embeddings", "documents", "metadatas"], limit=page, offset=off)
+        ids += got["ids"]; docs += got["documents"]; metas += got["metadatas"]
+        vecs += [list(v) for v in got["embeddings"]]
+
+    proj = fit_pca(vecs, dim)
+    d = client.get_or_create_collection(name=dst, metadata=s.metadata or None)
+    save(dst, proj, d)
+    y = proj.apply(vecs).tolist()
+    for i in range(0, len(ids), page):
+        d.upsert(ids=ids[i:i + page], documents=docs[i:i + page],
+                 metadatas=metas[i:i + page], embeddings=y[i:i + page])
+    return {"src": src, "dst": dst, "vectors": len(ids), "dim": dim,
+            "explained_variance": round(proj.explained, 4)}
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="PCA projection for Chroma collections")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rp = sub.add_parser("reproject", help="기존 컬렉션 벡터로 PCA 학습 후 새 컬렉션에 저장")
+    rp.add_argument("--src", required=True)
+    rp.add_argument("--dst", required=True)
+    rp.add_argument("--dim", type=int, default=EMBED_DIM or 128)
+    args = ap.parse_args()
+    print(reproject(args.src, args.dst, args.dim))
@@ -1,10 +1,11 @@
 # qa.py
 from typing import Dict
-from langchain.chains.retrieval_qa.base import RetrievalQA
 from langchain.prompts import PromptTemplate
 from langchain_core.language_models import BaseChatModel
 from langchain_core.vectorstores import VectorStoreRetriever
 
+from .context import pack_context, context_tokens
+
 # ------------------------------
 # 1️⃣ 프롬프트 템플릿 정의
 # ------------------------------
@@ -25,33 +26,35 @@ QA_PROMPT = PromptTemplate.from_template(PROMPT_TEMPLATE)
 def answer(query: str, retriever: VectorStoreRetriever, llm: BaseChatModel) -> Dict:
     """
     질문(query)과 Retriever, LLM을 받아 RAG 답변과 소스를 반환
+    - 검색 결과는 context.pack_context로 토큰 예산(RAG_MAX_*) 안에 담음
     """
-    # RetrievalQA 체인 설정
-    chain = RetrievalQA.from_chain_type(
-        llm=llm,
-        retriever=retriever,
-        return_source_documents=True,
-        chain_type_kwargs={"prompt": QA_PROMPT.partial(system_prompt=SYSTEM_PROMPT)}
-    )
+    # 검색 (retriever 순서 = 유사도 순)
+    docs = retriever.invoke(query)
+    packed = pack_context([
+        {"text": d.page_content, "meta": d.metadata or {}, "score": None} for d in docs
+    ])
 
-    # 체인 실행
-    result = chain.invoke({"query": query})
+    # LLM 호출 (stuff 방식: 청크를 빈 줄로 이어 붙임)
+    context = "\n\n".join(c["text"] for c in packed)
+    prompt = QA_PROMPT.format(system_prompt=SYSTEM_PROMPT, context=context, question=query)
+    msg = llm.invoke(prompt)
+    answer_text = getattr(msg, "content", msg)
 
     # 소스 문서 포맷팅
     sources = []
-    if result.get("source_documents"):
-        for doc in result["source_documents"]:
-            # 메타데이터를 안전하게 추출
-            meta = doc.metadata or {}
-            sources.append({
-                "_id": meta.get("_id"),
-                "page_content": doc.page_content, # 청크 내용
-                # 필요 시 다른 메타데이터 필드 추가
-                # "page": meta.get("page"),
-                # "title": meta.get("title"),
-            })
+    for c in packed:
+        # 메타데이터를 안전하게 추출
+        meta = c["meta"]
+        sources.append({
+            "_id": meta.get("_id"),
+            "page_content": c["text"], # 청크 내용(패킹 후)
+            # 필요 시 다른 메타데이터 필드 추가
+            # "page": meta.get("page"),
+            # "title": meta.get("title"),
+        })
 
     return {
-        "answer": result.get("result", "답변을 생성할 수 없습니다."),
-        "sources": sources
-    }
\ No newline at end of file
+        "answer": answer_text or "답변을 생성할 수 없습니다.",
+        "sources": sources,
+        "context_tokens": context_tokens(packed),
+    }
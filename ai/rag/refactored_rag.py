@@ -1,13 +1,13 @@
 import os
 import re
 import glob
+import hashlib
 import sys # Added for debugging sys.path
 from typing import List, Dict, Optional
 
 from langchain_core.documents import Document
 
 from langchain_openai import ChatOpenAI
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.document_loaders import PyPDFLoader # Reverted import
 
 from pymongo import MongoClient # Ensure this is present
@@ -18,11 +18,12 @@ from .config import (
     MONGO_URI, MONGO_COLL, MONGO_UPDATED_FIELD,
     PDF_GLOBS, DATA_DIR
 )
+from .embeddings import langchain_embeddings
 
 # ... (other imports)
 
 # --- Embeddings and LLM ---
-embeddings = HuggingFaceEmbeddings(model_name="intfloat/multilingual-e5-small")
+embeddings = langchain_embeddings("intfloat/multilingual-e5-small")  # EMBED_BACKEND=torch|onnx
 llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.2)
 
 # --- Custom MongoDB Document Loader ---
@@ -151,8 +152,13 @@ from datetime import datetime
 from .config import (
     CHROMA_DIR, COLLECTION_NAME, CHUNK_SIZE, CHUNK_OVERLAP,
     MONGO_URI, MONGO_DB, MONGO_COLL, MONGO_UPDATED_FIELD,
-    PDF_GLOBS, DATA_DIR
+    PDF_GLOBS, DATA_DIR, CHUNKER, RAG_COLLECTION_MODE, INGEST_JOB_BATCH
 )
+from .context import pack_context, context_tokens
+from .chunker import chunk_text, neighbor_meta
+from .tokens import count_tokens
+from . import docstore, exact, jobs, projection, rewrite, timetable
+import numpy as np
 
 def _clean_metadata(metadata: Dict) -> Dict:
     print(f"[DEBUG] _clean_metadata: Original metadata: {metadata}")
@@ -174,8 +180,27 @@ def _clean_metadata(metadata: Dict) -> Dict:
     print(f"[DEBUG] _clean_metadata: Cleaned metadata: {cleaned}")
     return cleaned
 
+def _sentence_splits(documents: List[Document]) -> List[Document]:
+    """chunker.chunk_text로 문서별 분할 + 결정적 id/이웃 메타(prev_id/next_id) 부여"""
+    splits = []
+    for doc in documents:
+        meta = doc.metadata or {}
+        key = f"{meta.get('source_id') or meta.get('source') or ''}::{meta.get('dataset', '')}::{meta.get('page', 0)}"
+        base = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        chunks = chunk_text(doc.page_content)
+        ids = [f"chunk_{base}_{i}" for i in range(len(chunks))]
+        for text, cid, nb in zip(chunks, ids, neighbor_meta(ids)):
+            splits.append(Document(page_content=text, metadata={**meta, "chunk_id": cid, **nb}))
+    return splits
+
 # --- Ingestion Function ---
-def ingest_data(pdf_paths: Optional[List[str]] = None, mongo_query: Optional[Dict] = None):
+def ingest_data(pdf_paths: Optional[List[str]] = None, mongo_query: Optional[Dict] = None,
+                progress: Optional["jobs.Progress"] = None) -> Dict:
+    """
+    PDF + Mongo → 청크 → 임베딩 → upsert
+    progress: jobs.Progress (작업 큐 실행 시 단계별 진행률 저장 + 배치 경계에서 취소 확인)
+    """
+    progress = progress or jobs.Progress()
     try:
         from langchain_text_splitters import RecursiveCharacterTextSplitter
         import chromadb
@@ -197,6 +222,8 @@ def ingest_data(pdf_paths: Optional[List[str]] = None, mongo_query: Optional[Dic
         loaded_mongo_docs = mongo_loader.load(mongo_query)
         print(f"[DEBUG]     Loaded {len(loaded_mongo_docs)} documents from MongoDB sources.")
         documents.extend(loaded_mongo_docs)
+        progress.add("docs", len(loaded_mongo_docs))
+        progress.check()
 
         # Load PDF documents if paths are provided
         if pdf_paths:
@@ -207,29 +234,29 @@ def ingest_data(pdf_paths: Optional[List[str]] = None, mongo_query: Optional[Dic
                     loaded_pdf_docs = loader.load()
                     print(f"[DEBUG]     Loaded {len(loaded_pdf_docs)} documents from PDF: {p_path}")
                     documents.extend(loaded_pdf_docs)
+                    progress.add("docs", len(loaded_pdf_docs))
+                    progress.check()
                 except Exception as pdf_e:
                     print(f"[DEBUG]     Error loading PDF {p_path}: {pdf_e}")
 
         print(f"[DEBUG] Total documents before splitting: {len(documents)}") # Re-added in correct place
 
-        # Split documents
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
-        splits = text_splitter.split_documents(documents)
+        # Split documents (CHUNKER=legacy → 문자수 + overlap 방식)
+        if CHUNKER == "legacy":
+            text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+            splits = text_splitter.split_documents(documents)
+        else:
+            splits = _sentence_splits(documents)
         print(f"[DEBUG] Value of splits after splitting: {len(splits)} splits.")
         print(f"[DEBUG] Number of splits: {len(splits)}")
         if splits:
             print(f"[DEBUG] First split content: {splits[0].page_content[:200]}")
             print(f"[DEBUG] First split metadata (before cleaning): {splits[0].metadata}\n")
 
-            # Add new logging here
-            import tiktoken
-            encoding = tiktoken.get_encoding("cl100k_base") # Common encoding for GPT models
-
-            print("[DEBUG] --- Sample Chunks Content and Token Counts (tiktoken) ---")
+            print("[DEBUG] --- Sample Chunks Content and Token Counts ---")
             for i, split in enumerate(splits[:5]): # Log first 5 splits
                 content = split.page_content
-                tokens = encoding.encode(content)
-                print(f"[DEBUG] Split {i+1} (Chars: {len(content)}, Tokens: {len(tokens)}):")
+                print(f"[DEBUG] Split {i+1} (Chars: {len(content)}, Tokens: {count_tokens(content)}):")
                 print(f"[DEBUG] Content (first 200 chars): {content[:200]}")
                 print(f"[DEBUG] Metadata: {split.metadata}")
                 print("-" * 20)
@@ -245,7 +272,7 @@ def ingest_data(pdf_paths: Optional[List[str]] = None, mongo_query: Optional[Dic
         if not cleaned_splits: # Add this check
             print("[DEBUG] No cleaned splits to process.")
             print(f"Ingested 0 chunks into ChromaDB.") # Handle this case
-            return
+            return {"docs": len(documents), "chunks": 0}
 
         # Manually prepare texts, metadatas, and ids for chromadb client
         texts = []
@@ -254,519 +281,234 @@ def ingest_data(pdf_paths: Optional[List[str]] = None, mongo_query: Optional[Dic
         for i, doc in enumerate(cleaned_splits):
             texts.append(doc.page_content)
             metadatas.append(doc.metadata)
-            # Generate a unique ID for each chunk
-            doc_id = f"chunk_{hash(doc.page_content + str(doc.metadata))}"
+            # sentence 청크는 결정적 id(재인덱싱 시 덮어쓰기), legacy는 기존 방식
+            doc_id = doc.metadata.get("chunk_id") or f"chunk_{hash(doc.page_content + str(doc.metadata))}"
             ids.append(doc_id)
 
         if not texts:
             print("[DEBUG] No texts to add to ChromaDB.")
             print(f"Ingested 0 chunks into ChromaDB.") # Handle this case
-            return
-
-        # Manually generate embeddings
-        embeddings_list = embeddings.embed_documents(texts)
+            return {"docs": len(documents), "chunks": 0}
+        progress.add("chunks", len(texts))
+        progress.total("embedded", len(texts))
+        progress.total("upserted", len(texts))
+
+        # Manually generate embeddings (INGEST_JOB_BATCH 단위 → 진행률/취소 확인)
+        embeddings_list = []
+        for i in range(0, len(texts), INGEST_JOB_BATCH):
+            progress.check()
+            embeddings_list.extend(embeddings.embed_documents(texts[i:i + INGEST_JOB_BATCH], verbose=True))
+            progress.add("embedded", min(INGEST_JOB_BATCH, len(texts) - i))
 
         # Initialize raw chromadb client
         client = chromadb.PersistentClient(path=CHROMA_DIR)
         collection = client.get_or_create_collection(name=COLLECTION_NAME)
+        embeddings_list = projection.for_ingest(collection, embeddings_list)  # EMBED_DIM
 
-        # Add data to chromadb collection
-        collection.add(
-            documents=texts,
-            embeddings=embeddings_list,
-            metadatas=metadatas,
-            ids=ids
-        )
+        # Add data to chromadb collection (같은 id는 갱신)
+        upserted = 0
+        try:
+            for i in range(0, len(texts), INGEST_JOB_BATCH):
+                progress.check()
+                sl = slice(i, i + INGEST_JOB_BATCH)
+                collection.upsert(
+                    documents=texts[sl],
+                    embeddings=embeddings_list[sl],
+                    metadatas=metadatas[sl],
+                    ids=ids[sl]
+                )
+                docstore.index_chunks(ids[sl], texts[sl], metadatas[sl])
+                upserted += len(ids[sl])
+                progress.add("upserted", len(ids[sl]))
+        finally:
+            if upserted:   # 배치마다가 아니라 끝(취소 포함)에 1번 → exact 스냅샷 재생성도 1번
+                exact.invalidate(collection.name)
         print(f"Ingested {len(texts)} chunks into ChromaDB.") # Changed to len(texts)
+        return {"docs": len(documents), "chunks": len(texts)}
+    except jobs.JobCancelled:
+        print(f"[DEBUG] ingest_data cancelled: {progress.snapshot()['counts']}")
+        raise
     except Exception as e: # Add except block here
         print(f"[DEBUG] Error in ingest_data: {e}")
         import traceback
         traceback.print_exc()
         raise # Re-raise the exception so FastAPI catches it
 
-
-
-
-
 # --- QA Function ---
+# 키워드 → Mongo DB 라우팅 (단일 컬렉션에서는 db_name where 필터, fanout에서는 컬렉션 이름 prefix)
+KEYWORD_TO_DB = {
+    "Academic_Information_db": ["휴학", "병결", "졸업", "성적"],
+    "University_Introduction": ["시설", "번호", "센터"],
+    "depatement_all_db": ["교수", "학과 소개", "자격증", "직장"],
+}
+
+def _route_db(query: str) -> Optional[str]:
+    for db_name, keywords in KEYWORD_TO_DB.items():
+        if any(keyword in query for keyword in keywords):
+            return db_name
+    return None
 
-
-def ask_question(query: str, k: int = 3, filters: Optional[Dict[str, List[str]]] = None) -> Dict:
-
-
+def _unified_collection(client):
+    """RAG_COLLECTION_MODE=auto|single 이고 COLLECTION_NAME에 데이터가 있으면 단일 컬렉션 사용"""
+    if RAG_COLLECTION_MODE == "fanout":
+        return None
+    try:
+        col = client.get_collection(name=COLLECTION_NAME)
+        if col.count() > 0:
+            return col
+    except Exception:
+        pass
+    if RAG_COLLECTION_MODE == "single":
+        print(f"[DEBUG] Unified collection {COLLECTION_NAME} is empty or missing; falling back to fan-out.")
+    return None
+
+def _query_collection(client, name: str, qvecs, k: int, where: Optional[Dict]) -> List[List[Dict]]:
+    # 작은 컬렉션은 NumPy 정확 검색, 큰 컬렉션은 HNSW (exact.query_many가 자동 선택)
+    col = client.get_collection(name=name)
+    return exact.query_many(col, projection.for_query(name, qvecs), k, where)
+
+def search_chunks_many(queries: List[str], k: int = 3,
+                       filters: Optional[Dict[str, List[str]]] = None) -> List[List[Dict]]:
+    """
+    여러 질의 검색 → 질의별 [{"text","meta","score"}] (점수 내림차순, 입력 순서 유지)
+    - 질의 임베딩은 배치 1번, 라우팅 DB가 같은 질의끼리 컬렉션당 다중 행 질의 1번
+    """
     import chromadb
 
-
-    from langchain_chroma import Chroma
-
-
-    from langchain.chains.combine_documents import create_stuff_documents_chain
-
-
-    from langchain.chains import create_retrieval_chain
-
-
-    from langchain_core.prompts import ChatPromptTemplate
-
-
-    from langchain_core.documents import Document
-
-
-
-
-
-    # Initialize the ChromaDB client
-
-
+    if not queries:
+        return []
     client = chromadb.PersistentClient(path=CHROMA_DIR)
+    qvecs = np.asarray(embeddings.embed_queries(queries), dtype=np.float32)
+    hits: List[List[Dict]] = [[] for _ in queries]
+
+    groups: Dict[Optional[str], List[int]] = {}
+    for i, q in enumerate(queries):
+        groups.setdefault(_route_db(q), []).append(i)
+
+    unified = _unified_collection(client)
+    for target_db, idxs in groups.items():
+        if unified is not None:
+            # 단일 컬렉션: 라우팅은 where 필터, 결과가 없으면 DB 제한 없이 재검색
+            print(f"[DEBUG] Querying unified collection {unified.name} (db_name={target_db}, queries={len(idxs)}).")
+            got = _query_collection(client, unified.name, qvecs[idxs], k, exact.filters_to_where(filters, target_db))
+            retry = [j for j, g in zip(idxs, got) if not g] if target_db else []
+            for j, g in zip(idxs, got):
+                hits[j] = g
+            if retry:
+                for j, g in zip(retry, _query_collection(client, unified.name, qvecs[retry], k, exact.filters_to_where(filters))):
+                    hits[j] = g
+            continue
 
-
-
-
-
-    # Get all collections
-
-
-    collections = client.list_collections()
-
-
-    if not collections:
-
-
-        print("[DEBUG] No collections found in ChromaDB.")
-
-
-        # Fallback to LLM without context
-
-
-        try:
-
-
-            prompt = ChatPromptTemplate.from_messages([
-
-
-                ("system", "You are a helpful assistant. Answer the user's question based on the provided context."),
-
-
-                ("user", "Question: {input}")
-
-
-            ])
-
-
-            question_answer_chain = create_stuff_documents_chain(llm, prompt)
-
-
-            result = question_answer_chain.invoke({"input": query, "context": []})
-
-
-            answer_text = result
-
-
-        except Exception as e:
-
-
-            print(f"[DEBUG] Error during fallback LLM invocation: {e}")
-
-
-            answer_text = "답변을 생성할 수 없습니다."
-
-
-        return {"answer": answer_text, "sources": []}
-
-
-
-
-
-    # Keyword-based routing logic
-
-
-    keyword_to_db = {
-
-
-        "Academic_Information_db": ["휴학", "병결", "졸업", "성적"],
-
-
-        "University_Introduction": ["시설", "번호", "센터"],
-
-
-        "depatement_all_db": ["교수", "학과 소개", "자격증", "직장"],
-
-
-    }
-
-
-
-
-
-    target_db = None
-
-
-    for db_name, keywords in keyword_to_db.items():
-
-
-        if any(keyword in query for keyword in keywords):
-
-
-            target_db = db_name
-
-
-            break
-
-
-
-
-
-    collections_to_query = []
-
-
-    if target_db:
-
-
+        # 컬렉션별 인덱스(구 구조): 라우팅 DB prefix 컬렉션만 검색
+        collections = client.list_collections()
+        if target_db:
+            collections = [c for c in collections if c.name.startswith(target_db)]
+            print(f"[DEBUG] Keyword found in query. Filtering to collections in {target_db}.")
+        else:
+            print("[DEBUG] No specific keywords found. Searching all collections.")
+        where = exact.filters_to_where(filters)
         for collection in collections:
+            try:
+                got = _query_collection(client, collection.name, qvecs[idxs], k, where)
+                n = sum(len(g) for g in got)
+                if n:
+                    print(f"[DEBUG] Retrieved {n} source documents from {collection.name}.")
+                for j, g in zip(idxs, got):
+                    hits[j].extend(g)
+            except Exception as e:
+                print(f"[DEBUG] Error querying collection {collection.name}: {e}")
+
+    return [sorted(h, key=lambda c: c["score"], reverse=True) for h in hits]
+
+def search_chunks(query: str, k: int = 3, filters: Optional[Dict[str, List[str]]] = None) -> List[Dict]:
+    """검색만 수행 → [{"text","meta","score"}] (점수 내림차순)"""
+    return search_chunks_many([query], k, filters)[0]
+
+def _answer_without_context(query: str, history: Optional[List[Dict]] = None) -> Dict:
+    from langchain.chains.combine_documents import create_stuff_documents_chain
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
+    # Fallback to LLM without context
+    try:
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", "You are a helpful assistant. Answer the user's question based on the provided context."),
+            MessagesPlaceholder("history", optional=True),
+            ("user", "Question: {input}")
+        ])
+        question_answer_chain = create_stuff_documents_chain(llm, prompt)
+        result = question_answer_chain.invoke({"input": query, "context": [], "history": history or []})
+        answer_text = result
+    except Exception as e:
+        print(f"[DEBUG] Error during fallback LLM invocation: {e}")
+        answer_text = "답변을 생성할 수 없습니다."
+    return {"answer": answer_text, "sources": []}
+
+def search_query(query: str, history: Optional[List[Dict]] = None) -> str:
+    """후속 질문이면 단독 검색 질의로 재작성 (규칙 → 필요할 때만 LLM, LRU 캐시)"""
+    return rewrite.standalone(query, history, llm)["query"] if history else query
+
+def retrieve_chunks(query: str, k: int = 3, filters: Optional[Dict[str, List[str]]] = None,
+                    expand: Optional[str] = None, history: Optional[List[Dict]] = None) -> List[Dict]:
+    """검색 + (옵션) 이웃/부모 청크 확장만 수행 (/rag/preview용, history가 있으면 질의 재작성 후 검색)"""
+    chunks = search_chunks(search_query(query, history), k=k, filters=filters)
+    # (옵션) 이웃/부모 청크 확장: expand=neighbors|parent (기본 RAG_EXPAND)
+    return docstore.expand(chunks, mode=expand) if chunks else []
+
+def ask_question(query: str, k: int = 3, filters: Optional[Dict[str, List[str]]] = None,
+                 expand: Optional[str] = None, chunks: Optional[List[Dict]] = None,
+                 history: Optional[List[Dict]] = None) -> Dict:
+    """
+    chunks: 이미 검색한 retrieve_chunks 결과(/rag/preview 토큰) → 검색 생략
+    history: 이전 대화 메시지(memory.history) → 같은 LLM 호출의 프롬프트에 포함 (후속 질문 처리)
+    """
+    from langchain.chains.combine_documents import create_stuff_documents_chain
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+    from langchain_core.documents import Document
 
-            if collection.name.startswith(target_db):
-
-
-                collections_to_query.append(collection)
-
-
-        print(f"[DEBUG] Keyword found in query. Filtering to collections in {target_db}.")
-
-
-    else:
-
-
-        # If no specific keywords are found, search all collections
-
-
-        collections_to_query = collections
-
-
-        print("[DEBUG] No specific keywords found. Searching all collections.")
-
-
-
-
-
-    if not collections_to_query:
-
-
-        print("[DEBUG] No collections to query after filtering.")
-
-
-        # Fallback to LLM without context
-
-
-        try:
-
-
-            prompt = ChatPromptTemplate.from_messages([
-
-
-                ("system", "You are a helpful assistant. Answer the user's question based on the provided context."),
-
-
-                ("user", "Question: {input}")
-
-
-            ])
-
-
-            question_answer_chain = create_stuff_documents_chain(llm, prompt)
-
-
-            result = question_answer_chain.invoke({"input": query, "context": []})
-
-
-            answer_text = result
-
-
-        except Exception as e:
-
-
-            print(f"[DEBUG] Error during fallback LLM invocation: {e}")
-
-
-            answer_text = "답변을 생성할 수 없습니다."
-
-
-        return {"answer": answer_text, "sources": []}
-
-
-
-
-
-    all_source_documents = []
-
-
-    
-
-
-    for collection in collections_to_query:
-
-
-        try:
-
-
-            print(f"[DEBUG] Querying collection: {collection.name}")
-
-
-            vectorstore = Chroma(
-
-
-                client=client,
-
-
-                collection_name=collection.name,
-
-
-                embedding_function=embeddings,
-
-
-            )
-
-
-
-
-
-            # Create retriever for this collection
-
-
-            search_kwargs = {"k": k}
-
-
-            if filters:
-
-
-                langchain_filters = {}
-
-
-                for key, values in filters.items():
-
-
-                    if isinstance(values, list) and len(values) == 1:
-
-
-                        langchain_filters[key] = values[0]
-
-
-                    else:
-
-
-                        langchain_filters[key] = {"$in": values}
-
-
-                search_kwargs["filter"] = langchain_filters
-
-
-            
-
-
-            retriever = vectorstore.as_retriever(search_kwargs=search_kwargs)
-
-
-            
-
-
-            # Retrieve documents from this collection
-
-
-            source_documents = retriever.get_relevant_documents(query)
-
-
-            
-
-
-            if source_documents:
-
-
-                print(f"[DEBUG] Retrieved {len(source_documents)} source documents from {collection.name}.")
-
-
-                all_source_documents.extend(source_documents)
-
-
-
-
-
-        except Exception as e:
-
-
-            print(f"[DEBUG] Error querying collection {collection.name}: {e}")
-
-
-
+    # 후속 질문("그럼 병결은?")은 검색/시간표 조회용으로만 단독 질의로 재작성 (답변 프롬프트는 원래 질문)
+    sq = search_query(query, history)
 
+    # 수업/시간표 질의(교수·강의실·요일·학과 등)는 school_db 테이블 조회로 바로 답변 (검색/LLM 생략)
+    structured = timetable.answer(sq)
+    if structured is not None:
+        return {**structured, "search_query": sq}
 
+    all_source_documents = chunks if chunks is not None else retrieve_chunks(sq, k, filters, expand)
     if not all_source_documents:
-
-
         print("[DEBUG] No source documents found across all collections.")
+        return {**_answer_without_context(query, history), "search_query": sq}
 
+    # 점수순으로 토큰 예산(RAG_MAX_CONTEXT_TOKENS)을 채우고, 겹치는 문장 제거 + 문장 경계에서 자름
+    packed = pack_context(all_source_documents)
+    print(f"[DEBUG] Packed {len(packed)}/{len(all_source_documents)} chunks, {context_tokens(packed)} tokens.")
 
-        # Fallback to LLM without context
-
-
-        try:
-
-
-            prompt = ChatPromptTemplate.from_messages([
-
-
-                ("system", "You are a helpful assistant. Answer the user's question based on the provided context."),
-
-
-                ("user", "Question: {input}")
-
-
-            ])
-
-
-            question_answer_chain = create_stuff_documents_chain(llm, prompt)
-
-
-            result = question_answer_chain.invoke({"input": query, "context": []})
-
-
-            answer_text = result
-
-
-        except Exception as e:
-
-
-            print(f"[DEBUG] Error during fallback LLM invocation: {e}")
-
-
-            answer_text = "답변을 생성할 수 없습니다."
-
-
-        return {"answer": answer_text, "sources": []}
-
-
-
-
-
-    # Limit the number of documents and truncate their content
-
-
-    MAX_DOCS = 5
-
-
-    MAX_CHARS_PER_DOC = 1000
-
-
-
-
-
-    if len(all_source_documents) > MAX_DOCS:
-
-
-        # A more sophisticated re-ranking would be better here,
-
-
-        # but for now, we'll just take the first MAX_DOCS.
-
-
-        all_source_documents = all_source_documents[:MAX_DOCS]
-
-
-
-
-
-    truncated_documents = []
-
-
-    for doc in all_source_documents:
-
-
-        truncated_content = doc.page_content[:MAX_CHARS_PER_DOC]
-
-
-        truncated_doc = Document(page_content=truncated_content, metadata=doc.metadata)
-
-
-        truncated_documents.append(truncated_doc)
-
-
-
-
-
-    # Use the truncated documents to generate an answer
-
+    truncated_documents = [Document(page_content=c["text"], metadata=c["meta"]) for c in packed]
 
+    # Use the packed documents to generate an answer
     prompt = ChatPromptTemplate.from_messages([
-
-
         ("system", "You are a helpful assistant. Answer the user's question based on the provided context."),
-
-
+        MessagesPlaceholder("history", optional=True),
         ("user", "Context:\n{context}\n\nQuestion: {input}")
-
-
     ])
-
-
     question_answer_chain = create_stuff_documents_chain(llm, prompt)
 
-
-    
-
-
-    result = question_answer_chain.invoke({"input": query, "context": truncated_documents})
-
-
+    result = question_answer_chain.invoke({"input": query, "context": truncated_documents,
+                                           "history": history or []})
     answer_text = result
 
-
-
-
-
     # Format output
-
-
     sources = []
-
-
-    for doc in truncated_documents: # Use truncated_documents for the sources as well
-
-
-        meta = doc.metadata
-
-
+    for c in packed: # Use packed chunks for the sources as well
+        meta = c["meta"]
         sources.append({
-
-
             "id": meta.get("source_id"),
-
-
             "page": meta.get("page"),
-
-
             "title": meta.get("title"),
-
-
             "dataset": meta.get("dataset"),
-
-
             "uri": meta.get("uri"),
-
-
-            "score": None,
-
-
+            "score": c["score"],
             "source_type": meta.get("source_type"),
-
-
-            "text": doc.page_content
-
-
+            "text": c["text"]
         })
 
-
-
-
-
-    return {"answer": answer_text, "sources": sources}
-
+    return {"answer": answer_text, "sources": sources, "search_query": sq}
@@ -0,0 +1,63 @@
+# ai/rag/retrieval_cache.py
+# ================================================================
+# 🎟️ 역할: 검색 결과 단기 보관 (미리보기 → 답변 재사용)
+# - /rag/preview 가 검색(+확장)만 수행하고 결과를 토큰으로 보관
+# - /rag/chat 이 retrieval_token을 넘기면 검색을 건너뛰고 그 청크로 답변 생성
+# - 토큰은 RAG_RETRIEVAL_TTL_S 동안 유효, 검색 조건이 모두 같을 때만 사용 가능(다르면 무시)
+#   조건 = 정규화된 질문 + filters + top_k + expand + 대화 기록 digest
+#   (후속 질문은 기록에 따라 검색 질의가 재작성되므로 기록이 바뀌면 다른 검색)
+# - 프로세스 메모리 보관(서버 재시작/다중 워커 간 공유 안 됨) → 없으면 평소처럼 검색
+# ================================================================
+from __future__ import annotations
+
+import hashlib, json, secrets, threading, time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from .config import RAG_RETRIEVAL_TTL_S, RAG_RETRIEVAL_CACHE_MAX
+
+# token → (만료 시각, 검색 조건 서명, 청크)
+_ENTRIES: "OrderedDict[str, tuple]" = OrderedDict()
+_LOCK = threading.Lock()
+
+def _norm(query: str) -> str:
+    return " ".join((query or "").split())
+
+def _signature(query: str, filters: Optional[Dict], top_k: Optional[int], expand: Optional[str],
+               history: Optional[List[Dict]]) -> str:
+    hist = hashlib.blake2b(json.dumps(history or [], sort_keys=True, ensure_ascii=False).encode("utf-8"),
+                           digest_size=8).hexdigest()
+    return json.dumps([_norm(query), filters or None, top_k, expand, hist], sort_keys=True, ensure_ascii=False)
+
+def _evict(now: float) -> None:
+    while _ENTRIES:
+        token, (expires, _, _) = next(iter(_ENTRIES.items()))
+        if expires > now and len(_ENTRIES) <= RAG_RETRIEVAL_CACHE_MAX:
+            break
+        _ENTRIES.pop(token)
+
+def put(query: str, chunks: List[Dict], filters: Optional[Dict] = None, top_k: Optional[int] = None,
+        expand: Optional[str] = None, history: Optional[List[Dict]] = None) -> str:
+    """검색 결과 + 검색 조건 보관 → retrieval_token"""
+    token = secrets.token_urlsafe(16)
+    sig = _signature(query, filters, top_k, expand, history)
+    now = time.monotonic()
+    with _LOCK:
+        _ENTRIES[token] = (now + RAG_RETRIEVAL_TTL_S, sig, chunks)
+        _evict(now)   # 삽입 순서 = 만료 순서 → 앞에서부터 정리
+    return token
+
+def get(token: Optional[str], query: str, filters: Optional[Dict] = None, top_k: Optional[int] = None,
+        expand: Optional[str] = None, history: Optional[List[Dict]] = None) -> Optional[List[Dict]]:
+    """유효한 토큰이고 검색 조건(질문/filters/top_k/expand/기록)이 같으면 청크, 아니면 None(→ 다시 검색)"""
+    if not token:
+        return None
+    with _LOCK:
+        entry = _ENTRIES.get(token)
+        if entry is None:
+            return None
+        expires, sig, chunks = entry
+        if expires <= time.monotonic():
+            _ENTRIES.pop(token, None)
+            return None
+    return chunks if sig == _signature(query, filters, top_k, expand, history) else None
@@ -4,12 +4,16 @@
 #   - Chroma v0.5+ 에서는 include에 "ids"를 넣으면 에러가 납니다.
 #   - 그래서 include=["documents","metadatas","distances"]만 요청하고,
 #     반환값에 ids가 있으면 사용, 없으면 메타데이터로 대체 ID 생성합니다.
+#   - 작은 컬렉션은 exact.py(NumPy 완전 탐색)로 처리 → RAG_SEARCH_ENGINE
+#   - retrieve_many: 여러 질의를 임베딩 배치 1번 + 다중 행 질의 1번으로 검색
 # ================================================================
 
 # rag/retriever.py
 import os
 from typing import List, Dict, Optional
 from .store import get_client, get_collection
+from . import docstore, exact, projection
+from .embeddings import EMBED_BATCH, EMBEDDER_MODEL, e5_prefixes, get_embedder
 from .config import CHROMA_DIR, COLLECTION_NAME, TOP_K
 from sentence_transformers import SentenceTransformer
 import numpy as np
@@ -22,53 +26,39 @@ def _embedder():
     if _EMBEDDER is None:
         import os
         model_name = os.getenv("EMBEDDER_MODEL", "intfloat/multilingual-e5-small")
-        _EMBEDDER = SentenceTransformer(model_name)
+        _EMBEDDER = get_embedder(model_name)
     return _EMBEDDER
 
 def _encode_query(q: str) -> np.ndarray:
-    # 💡 e5는 query/passsage 프리픽스를 반드시 맞춰야 함
-    emb = _embedder().encode([f"query: {q.strip()}"],
+    # 💡 e5는 query/passsage 프리픽스를 반드시 맞춰야 함 (embeddings.e5_prefixes — ingest/LangChain 경로와 공용)
+    emb = _embedder().encode([e5_prefixes(EMBEDDER_MODEL)[0] + q.strip()],
                              convert_to_numpy=True, normalize_embeddings=True)
     return emb[0]
 
-def retrieve(query: str, k: int = 6, filters=None):
+def retrieve_many(queries: List[str], k: int = 6, filters=None,
+                  expand: Optional[str] = None) -> List[List[Dict]]:
+    """
+    여러 질의를 한 번에 검색 → 질의별 청크 리스트 (입력 순서 유지)
+    - 질의 임베딩은 배치 1번, Chroma에는 다중 행 query_embeddings 1번(작은 컬렉션은 행렬 곱 1번)
+    """
+    if not queries:
+        return []
     model = embedder()
-    qvec = model.encode([f"query: {query}"], convert_to_numpy=True, normalize_embeddings=True)[0]
+    prefix = e5_prefixes(EMBEDDER_MODEL)[0]
+    qvecs = model.encode([prefix + q for q in queries], batch_size=EMBED_BATCH,
+                         convert_to_numpy=True, normalize_embeddings=True)
 
     client = get_client(CHROMA_DIR)
     col = get_collection(client, name=COLLECTION_NAME)
+    qvecs = projection.for_query(col.name, qvecs)  # 인덱스에 PCA 투영이 있으면 동일하게 적용
 
-    res = col.query(
-        query_embeddings=[qvec.tolist()],
-        n_results=k,
-        include=["documents", "metadatas", "distances"],  # 'ids'는 include 대상 아님
-        where=filters or None,
-    )
+    # 작은 컬렉션은 NumPy 정확 검색(mmap), EXACT_MAX_VECTORS 초과 시 HNSW
+    results = exact.query_many(col, qvecs, k, exact.filters_to_where(filters))
+    return [docstore.expand(chunks, mode=expand) for chunks in results]
 
-    docs  = (res.get("documents") or [[]])[0]
-    metas = (res.get("metadatas") or [[]])[0]
-    dists = (res.get("distances") or [[]])[0]
-    ids   = (res.get("ids") or [[]])[0] if res.get("ids") is not None else [None] * len(docs)
-
-    chunks = []
-    for i, doc in enumerate(docs):
-        meta = metas[i] if i < len(metas) else {}
-        dist = dists[i] if i < len(dists) else None
-        cid  = ids[i]   if i < len(ids)   else None
-
-        # 점수는 거리 → 유사도로 단순 변환(가까울수록 높게)
-        score = None
-        try:
-            if dist is not None:
-                score = 1.0 - float(dist)
-        except Exception:
-            pass
-
-        chunks.append({
-            "id": cid,
-            "text": doc,
-            "meta": meta or {},
-            "score": score,
-        })
-
-    return chunks
+def retrieve(query: str, k: int = 6, filters=None, expand: Optional[str] = None):
+    """
+    expand: None(=RAG_EXPAND) | "none" | "neighbors" | "parent"
+      → 히트 청크에 docstore의 이웃/부모 청크를 붙여 반환 (id/score는 히트 기준)
+    """
+    return retrieve_many([query], k, filters, expand)[0]
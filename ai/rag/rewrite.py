@@ -0,0 +1,184 @@
+# ai/rag/rewrite.py
+# ================================================================
+# ✏️ 역할: 후속 질문 → 단독 검색 질의로 재작성 (검색/시간표 조회 앞단)
+# - "그럼 병결은?"을 그대로 임베딩하면 이전 질문의 맥락(무엇을 묻는지)이 빠짐
+# - 단계 (싼 것부터)
+#   1) 기록 없음 / 후속 질문 아님 → 그대로 사용 (LLM 호출 X)
+#      후속 질문 = 앞에 접속어("그럼") 또는 지시어("그거", "그 교수")가 있거나,
+#      혼자서는 검색이 안 되는 짧은 생략형(한 어절, 한정어 없음: "병결은?", "복학은?")
+#      → "도서관 운영시간은?", "컴퓨터공학과 졸업요건은?"처럼 그 자체로 검색되는 질문은 건드리지 않음
+#   2) 생략형 "(그럼) X은?" → 이전 주제에 X를 대입 (규칙, LLM 호출 X)
+#      · 이전 주제 = 대상 한정어(학과/교수/센터 등) + 본문 + 끝의 속성어("신청 기간", "확인 방법")
+#      · X가 대상이면 한정어만 교체, 아니면 본문을 X로 교체 (한정어·속성어 유지)
+#        ("기계공학과 휴학 신청 기간이 언제야?" → "그럼 복학 신청은?" → "기계공학과 복학 신청 기간"
+#         "휴학 신청 기간이 언제야?" → "그럼 병결은?" → "병결 신청 기간"
+#         "기계공학과 휴학 신청 기간이 언제야?" → "그럼 컴퓨터공학과는?" → "컴퓨터공학과 휴학 신청 기간")
+#      · 이전 질문의 서술("언제야")은 이어받지 않음 — X에 맞는 서술인지 알 수 없음
+#      · 현재 질문이 자기 한정어를 가지면 이전 한정어는 안 붙임
+#   3) 그 외(지시어 "그거/거기/그 교수" 등) → LLM 1회(짧은 출력, temperature 0)
+#      REWRITE_LLM=false거나 실패하면: 지시어가 있으면 "이전 주제 + 현재 질문",
+#      없으면 "이전 한정어 + 현재 질문" (이전 주제를 통째로 붙이면 오히려 이전 주제 쪽으로 검색됨)
+# - 결과는 LRU(REWRITE_CACHE_MAX) 캐시: 키 = (최근 질문들 digest, 정규화된 질문)
+#   → 같은 흐름의 같은 후속 질문(미리보기 → 답변, 재시도)은 LLM 재호출 없음
+# - 답변 생성 프롬프트에는 원래 질문 + 대화 기록(memory.py)이 그대로 들어감 (재작성은 검색용)
+# ================================================================
+from __future__ import annotations
+
+import hashlib, re, threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from .config import (
+    REWRITE_ENABLED, REWRITE_LLM, REWRITE_CACHE_MAX, REWRITE_HISTORY_TURNS, REWRITE_MAX_TOKENS,
+)
+
+# 앞에 붙는 접속어 ("그럼 병결은?")
+# ("혹시", "또"는 단독 질문에도 흔히 붙으므로 제외: "혹시 도서관 운영시간 알아?")
+_CONNECTIVE = re.compile(r"^(그럼|그러면|그렇다면|그리고|그럼요|그\s?외에?|그\s?밖에)\s*[,.]?\s*")
+# 이전 대화를 가리키는 표현
+_REFERENCE = re.compile(
+    r"(그거|그것|그건|그게|그걸|거기|그곳|그때|그분|이거|이것|이건|저거|저것|해당|위에서|앞에서|방금|아까"
+    r"|그\s?(학과|교수님?|과목|수업|강의|기간|서류|건물|장학금|제도|사람))"
+)
+# 생략형: 1~3어절 + 은/는(요) + ? ("병결은?", "복학 신청은요?", "병결 서류 제출은?")
+# 접속어/지시어 없이 생략형만으로 후속 질문으로 보는 건 한 어절, ELLIPTIC_MAX_CHARS 글자 이하일 때만
+_ELLIPTIC = re.compile(r"^(\S+(?:\s\S+){0,2}?)\s?(은|는)(요)?\s*\??$")
+# 이전 질문의 "주제 + 은/는/이/가 + 서술" 분리
+_TOPIC_SPLIT = re.compile(r"^(.+?)(은|는|이|가)\s+(.+)$")
+# 이전 주제에서 이어받을 한정어 (학과/교수/센터 등 대상 이름)
+# "…과"는 학과 이름 어간(공학/디자인/건축…)일 때만 — "결과", "효과" 같은 일반 명사 제외
+_QUALIFIER = re.compile(r"\S+(학과|학부|대학|대학원|교수님?|센터|팀)$"
+                        r"|\S*(공학|디자인|건축|소프트웨어|콘텐츠|경영|회계|관리|관광|마케팅|정보|통신|전자|생명|개발)과$")
+# 이전 주제 끝의 속성어(+ 바로 앞 행위 명사) — 생략형 대입 시 유지
+_ATTRIBUTE = re.compile(r"(기간|일정|날짜|마감|방법|절차|기준|조건|자격|대상|금액|장소|위치|시간|서류|연락처|전화번호)$")
+_ACTION = re.compile(r"(신청|제출|확인|조회|발급|정정|접수)$")
+# 어절 끝 조사/문장부호 ("컴퓨터공학과는?" → "컴퓨터공학과")
+_PARTICLE = re.compile(r"(은|는|이|가|을|를|의|도|에서|에|랑|하고)?(요)?[?.!]*$")
+ELLIPTIC_MAX_CHARS = 4
+
+_CACHE: "OrderedDict[tuple, tuple]" = OrderedDict()   # → (질의, 방법)
+_LOCK = threading.Lock()
+_STATS = {"skipped": 0, "rule": 0, "llm": 0, "concat": 0, "cache_hits": 0}
+
+def _norm(text: str) -> str:
+    return " ".join((text or "").split())
+
+def previous_questions(history: Optional[List[Dict]], n: int = REWRITE_HISTORY_TURNS) -> List[str]:
+    """대화 기록(memory.history)에서 최근 사용자 질문 n개 (없으면 요약 줄의 질문 부분)"""
+    if not history:
+        return []
+    qs = [m["content"] for m in history if m.get("role") == "user"]
+    if not qs:
+        for m in history:
+            if m.get("role") == "system":
+                qs += [line[2:].split(" → ")[0] for line in m["content"].splitlines() if line.startswith("- ")]
+    return [_norm(q) for q in qs[-n:] if q.strip()]
+
+def _is_qualifier(word: str) -> bool:
+    w = _PARTICLE.sub("", word)
+    return bool(_QUALIFIER.match(w)) or w in ("교수", "교수님")   # "이종명 교수님"
+
+def _has_qualifier(text: str) -> bool:
+    return any(_is_qualifier(w) for w in text.split())
+
+def needs_rewrite(query: str) -> bool:
+    """이전 맥락 없이는 뜻이 안 통하는 질문인지 (접속어/지시어, 또는 혼자 검색 안 되는 생략형)"""
+    q = _norm(query)
+    if _CONNECTIVE.match(q) or _REFERENCE.search(q):
+        return True
+    m = _ELLIPTIC.match(q)
+    return bool(m and " " not in m.group(1) and len(m.group(1)) <= ELLIPTIC_MAX_CHARS
+                and not _has_qualifier(m.group(1)))
+
+def _topic(prev: str) -> str:
+    """이전 질문의 주제 ("휴학 신청 기간이 언제야?" → "휴학 신청 기간", "확인 방법은?" → "확인 방법")"""
+    p = _TOPIC_SPLIT.match(prev)
+    if p:
+        return p.group(1)
+    words = prev.split()
+    return " ".join(words[:-1] + [_PARTICLE.sub("", words[-1])]) if words else prev
+
+def _qualifiers(prev: str, rest: str) -> List[str]:
+    """이전 주제의 대상 한정어 (현재 질문이 자기 한정어를 가지면 없음)"""
+    if _has_qualifier(rest):
+        return []
+    return [w for w in _topic(prev).split() if _is_qualifier(w)]
+
+def _attribute_tail(body: List[str]) -> List[str]:
+    """본문 끝의 속성어 ("휴학 신청 기간" → ["신청", "기간"])"""
+    if not body or not _ATTRIBUTE.search(body[-1]):
+        return []
+    return body[-2:] if len(body) >= 2 and _ACTION.search(body[-2]) else body[-1:]
+
+def _rule(query: str, prev: str) -> Optional[str]:
+    rest = _CONNECTIVE.sub("", _norm(query))
+    if _REFERENCE.search(rest):
+        return None
+    m = _ELLIPTIC.match(rest)
+    if not m:
+        return None
+    words = m.group(1).split()
+    topic = _topic(prev).split()
+    body = [w for w in topic if not _is_qualifier(w)]
+    if _has_qualifier(m.group(1)):
+        # 대상만 바뀐 질문 ("그럼 컴퓨터공학과는?") → 이전 본문에 새 대상
+        return " ".join(words + body)
+    tail = _attribute_tail(body)
+    if _ACTION.search(words[-1]):   # "병결 서류 제출" + "신청 기간" → "병결 서류 제출 기간"
+        tail = [w for w in tail if not _ACTION.search(w)]
+    tail = [w for w in tail if w not in words]
+    return " ".join([w for w in topic if _is_qualifier(w)] + words + tail)
+
+def _fallback(query: str, prev: str) -> str:
+    rest = _CONNECTIVE.sub("", _norm(query))
+    if _REFERENCE.search(rest):
+        return f"{_topic(prev)} {rest}"
+    return " ".join([*_qualifiers(prev, rest), rest])
+
+def _llm_rewrite(query: str, prev: List[str], llm) -> Optional[str]:
+    msgs = [
+        ("system", "이전 질문들을 참고해 사용자의 후속 질문을 그 자체로 이해되는 한국어 검색 질의 한 문장으로 바꾸세요. "
+                   "질의만 출력하세요."),
+        ("user", "이전 질문:\n" + "\n".join(f"- {q}" for q in prev) + f"\n\n후속 질문: {query}"),
+    ]
+    try:
+        out = llm.invoke(msgs, temperature=0, max_tokens=REWRITE_MAX_TOKENS)
+        text = _norm(getattr(out, "content", out) or "").strip("\"'")
+        return text or None
+    except Exception as e:
+        print(f"[rewrite] LLM rewrite failed: {type(e).__name__}: {e}")
+        return None
+
+def standalone(query: str, history: Optional[List[Dict]] = None, llm=None) -> Dict:
+    """→ {"query": 검색용 질의, "method": "none"|"rule"|"llm"|"concat", "cached": bool}"""
+    q = _norm(query)
+    prev = previous_questions(history)
+    if not REWRITE_ENABLED or not prev or not needs_rewrite(q):
+        _STATS["skipped"] += 1
+        return {"query": q, "method": "none", "cached": False}
+
+    key = (hashlib.blake2b("\n".join(prev).encode("utf-8"), digest_size=8).hexdigest(), q)
+    with _LOCK:
+        hit = _CACHE.get(key)
+        if hit is not None:
+            _CACHE.move_to_end(key)
+            _STATS["cache_hits"] += 1
+            return {"query": hit[0], "method": hit[1], "cached": True}
+
+    method, out = "rule", _rule(q, prev[-1])
+    if out is None and REWRITE_LLM and llm is not None:
+        method, out = "llm", _llm_rewrite(q, prev, llm)
+    if out is None:
+        method, out = "concat", _fallback(q, prev[-1])
+    _STATS[method] += 1
+
+    with _LOCK:
+        _CACHE[key] = (out, method)
+        while len(_CACHE) > REWRITE_CACHE_MAX:
+            _CACHE.popitem(last=False)
+    print(f"[rewrite] {method}: {q!r} → {out!r}")
+    return {"query": out, "method": method, "cached": False}
+
+def stats() -> Dict:
+    with _LOCK:
+        return {**_STATS, "cache_size": len(_CACHE)}
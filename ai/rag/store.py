@@ -7,6 +7,7 @@
 # ================================================================
 
 import os
+import threading
 import chromadb
 from .config import CHROMA_DIR, ACTIVE_NAME_FILE, COLLECTION_PREFIX
 
@@ -20,10 +21,21 @@ def _read_active_name():
     # 초기값 없으면 A로
     return f"{COLLECTION_PREFIX}_A"
 
+# 경로별 클라이언트 캐시 (컬렉션/요청마다 새로 만들지 않음, Chroma 클라이언트는 스레드 안전)
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
 def get_client(persist_dir: str = CHROMA_DIR):
-    return chromadb.Client(chromadb.config.Settings(
-        is_persistent=True, persist_directory=persist_dir
-    ))
+    client = _CLIENTS.get(persist_dir)
+    if client is None:
+        with _CLIENTS_LOCK:
+            client = _CLIENTS.get(persist_dir)
+            if client is None:
+                client = chromadb.Client(chromadb.config.Settings(
+                    is_persistent=True, persist_directory=persist_dir
+                ))
+                _CLIENTS[persist_dir] = client
+    return client
 
 def get_collection(client, name: str | None = None):
     name = name or _read_active_name()
@@ -0,0 +1,417 @@
+# ai/rag/timetable.py
+# ================================================================
+# 🗓️ 역할: 수업/시간표 구조화 질의 (school_db `class`, `student_class`)
+# - "이종명 교수 목요일 수업", "6-304 강의실 화요일 야간", "인공지능소프트웨어학과 전필 과목" 같은 질문은
+#   벡터 검색/LLM 없이 테이블 조회로 정확히 답함 (ms 단위)
+# - schedule 문자열 파싱 → (요일, 주/야, 시작 교시, 끝 교시) 슬롯
+#     "월:주2-3" → (월, 주, 2, 3) / "토:주5" → (토, 주, 5, 5) / "수:1-2" → (수, 주, 1, 2) / "월;주1-3"도 허용
+# - 메모리 스냅샷 인덱스: 교수 / 강의실 / 요일 / (요일, 주야, 교시) / 학과(괄호 표기 제거한 기본 이름) /
+#   이수구분 / 과목 / 학생 → 수업 id frozenset
+#   질의는 조건별 집합 교집합 (+ 남은 교시 조건 확인) → 수 µs
+# - 데이터: MySQL(SCHOOL_DB_*) → 실패 시 저장소의 school_db.sql 덤프 (TIMETABLE_SOURCE=auto)
+# - 갱신: 백그라운드 스레드가 TIMETABLE_REFRESH_S마다 체크섬만 확인
+#   (MySQL: CHECKSUM TABLE class, student_class / 덤프: 파일 mtime+크기)
+#   → 바뀌었거나 TIMETABLE_MAX_AGE_S가 지났을 때만 다시 읽어 새 스냅샷을 만들고 참조만 교체
+#   → 읽는 쪽은 락 없이 현재 스냅샷 사용, 질문 수와 무관하게 MySQL 부하 일정
+# - refactored_rag.ask_question이 먼저 answer(query)를 호출 → 구조화 질의로 판단되면 바로 반환
+#
+# 환경변수
+# - TIMETABLE_ENABLED=true
+# - TIMETABLE_SOURCE=auto|mysql|dump
+# - TIMETABLE_DUMP=<repo>/school_db.sql
+# - TIMETABLE_REFRESH_S=60 / TIMETABLE_MAX_AGE_S=3600 / TIMETABLE_MAX_ROWS=30
+# - TIMETABLE_RETRY_S=60   (적재 실패 후 질문 경로 재시도 간격 — REFRESH_S=0이어도 매 질문 재적재하지 않음)
+# - SCHOOL_DB_HOST / SCHOOL_DB_PORT / SCHOOL_DB_USER / SCHOOL_DB_PASS (기본: DB_* 값) / SCHOOL_DB_NAME=school_db
+# ================================================================
+from __future__ import annotations
+
+import datetime, os, re, threading, time
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
+
+from .config import (
+    SCHOOL_DB_HOST, SCHOOL_DB_NAME, SCHOOL_DB_PASS, SCHOOL_DB_PORT, SCHOOL_DB_USER,
+    TIMETABLE_DUMP, TIMETABLE_ENABLED, TIMETABLE_MAX_AGE_S, TIMETABLE_MAX_ROWS, TIMETABLE_REFRESH_S,
+    TIMETABLE_RETRY_S, TIMETABLE_SOURCE,
+)
+
+CLASS_COLUMNS = ["id", "subject", "major", "professor", "classroom", "hours_per_week",
+                 "credit", "course_type", "schedule", "semester"]
+DAYS = "월화수목금토일"
+SESSIONS = {"주": "주간", "야": "야간"}
+
+# ---------------- schedule 파싱 ----------------
+_SLOT = re.compile(r"([월화수목금토일])\s*[:;]\s*(주|야)?\s*(\d+)(?:\s*-\s*(\d+))?")
+
+def parse_schedule(raw: Optional[str]) -> List[Dict]:
+    """'월:주2-3' → [{"day": "월", "session": "주", "start": 2, "end": 3}] (여러 슬롯은 쉼표/공백 구분)"""
+    slots = []
+    for day, sess, a, b in _SLOT.findall(raw or ""):
+        start = int(a)
+        end = int(b) if b else start
+        slots.append({"day": day, "session": sess or "주", "start": min(start, end), "end": max(start, end)})
+    return slots
+
+def base_major(major: Optional[str]) -> str:
+    """'컴퓨터정보공학과(3)' / '(학)경영학과' / '기계공학과(위)' → 기본 학과 이름"""
+    m = re.sub(r"\([^)]*\)", "", major or "").strip()
+    # '웹응용소프트웨어공학과웹응용소프트웨어공학과' 처럼 중복 입력된 값
+    half = len(m) // 2
+    if len(m) % 2 == 0 and m[:half] == m[half:]:
+        m = m[:half]
+    return m
+
+def split_classrooms(raw: Optional[str]) -> List[str]:
+    """'인터넷, 6-308' → ['인터넷', '6-308']"""
+    return [r.strip() for r in (raw or "").split(",") if r.strip()]
+
+# ---------------- 로드 (MySQL / SQL 덤프) ----------------
+_TUPLE = re.compile(r"\(((?:'(?:[^'\\]|\\.)*'|[^()'])*)\)")
+_FIELD = re.compile(r"'((?:[^'\\]|\\.)*)'|(NULL)|(-?\d+(?:\.\d+)?)")
+
+def _dump_rows(sql: str, table: str) -> List[list]:
+    rows = []
+    for line in sql.splitlines():
+        if not line.startswith(f"INSERT INTO `{table}` VALUES"):
+            continue
+        for tup in _TUPLE.findall(line):
+            row = []
+            for s, null, num in _FIELD.findall(tup):
+                if null:
+                    row.append(None)
+                elif num:
+                    row.append(float(num) if "." in num else int(num))
+                else:
+                    row.append(re.sub(r"\\(.)", r"\1", s))
+            rows.append(row)
+    return rows
+
+def _load_dump(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        sql = f.read()
+    classes = [dict(zip(CLASS_COLUMNS, r)) for r in _dump_rows(sql, "class")]
+    enrolled = [(str(r[0]), r[1]) for r in _dump_rows(sql, "student_class") if r[0] is not None and r[1] is not None]
+    return classes, enrolled
+
+def _dump_checksum(path: str):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+def _mysql_conn():
+    import mysql.connector
+
+    return mysql.connector.connect(host=SCHOOL_DB_HOST, port=SCHOOL_DB_PORT, user=SCHOOL_DB_USER,
+                                   password=SCHOOL_DB_PASS or "", database=SCHOOL_DB_NAME,
+                                   connection_timeout=3)
+
+def _mysql_checksum(cur):
+    cur.execute("CHECKSUM TABLE class, student_class")
+    return tuple(tuple(r.values()) if isinstance(r, dict) else tuple(r) for r in cur.fetchall())
+
+def _load_mysql():
+    conn = _mysql_conn()
+    try:
+        cur = conn.cursor(dictionary=True)
+        checksum = _mysql_checksum(cur)
+        cur.execute(f"SELECT {', '.join(CLASS_COLUMNS)} FROM class")
+        classes = cur.fetchall()
+        cur.execute("SELECT student_id, class_id FROM student_class WHERE class_id IS NOT NULL")
+        enrolled = [(str(r["student_id"]), r["class_id"]) for r in cur.fetchall()]
+        cur.close()
+    finally:
+        conn.close()
+    return classes, enrolled, checksum
+
+# ---------------- 인덱스 ----------------
+class Timetable:
+    def __init__(self, classes: List[Dict], enrolled: List[tuple], source: str = ""):
+        self.source = source
+        self.classes: Dict[int, Dict] = {}
+        self.slots: Dict[int, List[Dict]] = {}
+        self.by_professor: Dict[str, Set[int]] = defaultdict(set)
+        self.by_classroom: Dict[str, Set[int]] = defaultdict(set)
+        self.by_day: Dict[str, Set[int]] = defaultdict(set)
+        self.by_major: Dict[str, Set[int]] = defaultdict(set)
+        self.by_subject: Dict[str, Set[int]] = defaultdict(set)
+        self.by_type: Dict[str, Set[int]] = defaultdict(set)
+        self.by_student: Dict[str, Set[int]] = defaultdict(set)
+        self.by_slot: Dict[tuple, Set[int]] = defaultdict(set)   # (요일, 주|야, 교시)
+        for c in classes:
+            cid = int(c["id"])
+            self.classes[cid] = c
+            self.slots[cid] = parse_schedule(c.get("schedule"))
+            if c.get("professor"):
+                self.by_professor[c["professor"].strip()].add(cid)
+            for room in split_classrooms(c.get("classroom")):
+                self.by_classroom[room].add(cid)
+            for s in self.slots[cid]:
+                self.by_day[s["day"]].add(cid)
+                for p in range(s["start"], s["end"] + 1):
+                    self.by_slot[(s["day"], s["session"], p)].add(cid)
+            if c.get("major"):
+                self.by_major[base_major(c["major"])].add(cid)
+            if c.get("subject"):
+                self.by_subject[_compact(c["subject"])].add(cid)
+            if c.get("course_type"):
+                self.by_type[c["course_type"]].add(cid)
+        for sid, cid in enrolled:
+            if int(cid) in self.classes:
+                self.by_student[sid].add(int(cid))
+        # 스냅샷은 만든 뒤 바뀌지 않음 → 일반 dict + frozenset (여러 스레드가 락 없이 읽음)
+        for name in ("by_professor", "by_classroom", "by_day", "by_major", "by_subject",
+                     "by_type", "by_student", "by_slot"):
+            setattr(self, name, {k: frozenset(v) for k, v in getattr(self, name).items()})
+        # 질의 문장에서 이름을 찾을 때 긴 이름 우선 (교수 이름은 정규식 1개로 미리 컴파일)
+        self.professor_names = sorted(self.by_professor, key=len, reverse=True)
+        self.professor_re = re.compile(
+            rf"(?<![가-힣A-Za-z])({'|'.join(map(re.escape, self.professor_names))}){_NAME_TAIL}"
+        ) if self.professor_names else None
+        self.major_names = sorted((m for m in self.by_major if m), key=len, reverse=True)
+        self.subject_names = sorted((s for s in self.by_subject if len(s) >= 2), key=len, reverse=True)
+
+    def find(self, professor: Optional[str] = None, classroom: Optional[str] = None,
+             day: Optional[str] = None, major: Optional[str] = None, subject: Optional[str] = None,
+             session: Optional[str] = None, period: Optional[int] = None,
+             course_type: Optional[str] = None, student_id: Optional[str] = None) -> List[Dict]:
+        """조건(AND)에 맞는 수업 [{...class 컬럼, "slots": [...]}] — 요일/교시 순 정렬"""
+        sets = []
+        if professor:   sets.append(self.by_professor.get(professor.strip(), frozenset()))
+        if classroom:   sets.append(self.by_classroom.get(classroom.strip(), frozenset()))
+        if major:       sets.append(self.by_major.get(base_major(major), frozenset()))
+        if subject:     sets.append(self.by_subject.get(_compact(subject), frozenset()))
+        if course_type: sets.append(self.by_type.get(course_type, frozenset()))
+        if student_id:  sets.append(self.by_student.get(str(student_id), frozenset()))
+        if day and period is not None:
+            sess = [session[0]] if session else list(SESSIONS)
+            sets.append(frozenset().union(*(self.by_slot.get((day[0], x, period), ()) for x in sess)))
+        elif day:
+            sets.append(self.by_day.get(day[0], frozenset()))
+        if sets:
+            sets.sort(key=len)
+            ids = sets[0].intersection(*sets[1:])
+        else:
+            ids = self.classes.keys()
+
+        out = []
+        for cid in ids:
+            slots = [s for s in self.slots[cid]
+                     if (not day or s["day"] == day[0])
+                     and (not session or s["session"] == session[0])
+                     and (period is None or s["start"] <= period <= s["end"])]
+            if (day or session or period is not None) and not slots:
+                continue
+            out.append({**self.classes[cid], "slots": slots or self.slots[cid]})
+        out.sort(key=lambda c: (_slot_key(c["slots"][0]) if c["slots"] else (9, 9, 99), c["subject"] or ""))
+        return out
+
+def _compact(s: str) -> str:
+    return re.sub(r"\s+", "", s or "")
+
+def _slot_key(s: Dict):
+    return (DAYS.index(s["day"]), 0 if s["session"] == "주" else 1, s["start"])
+
+_TT: Optional[Timetable] = None   # 현재 스냅샷 (교체는 참조 대입 1번)
+_CHECKSUM = None
+_LOADED_AT: Optional[float] = None
+_LOCK = threading.Lock()           # 적재/갱신끼리만 직렬화 (읽기는 락 없음)
+_REFRESHER: Optional[threading.Thread] = None
+
+def _build() -> Optional[tuple]:
+    """(Timetable, 체크섬) — MySQL 실패 시 덤프, 둘 다 실패하면 None"""
+    t0 = time.perf_counter()
+    built = None
+    if TIMETABLE_SOURCE in ("auto", "mysql"):
+        try:
+            classes, enrolled, checksum = _load_mysql()
+            built = (Timetable(classes, enrolled, source=f"mysql:{SCHOOL_DB_NAME}"), checksum)
+        except Exception as e:
+            print(f"[timetable] mysql load failed: {type(e).__name__}: {e}")
+    if built is None and TIMETABLE_SOURCE in ("auto", "dump"):
+        try:
+            checksum = _dump_checksum(TIMETABLE_DUMP)
+            built = (Timetable(*_load_dump(TIMETABLE_DUMP), source=f"dump:{TIMETABLE_DUMP}"), checksum)
+        except OSError as e:
+            print(f"[timetable] dump load failed: {e}")
+    if built is not None:
+        print(f"[timetable] {len(built[0].classes)} classes from {built[0].source} "
+              f"({(time.perf_counter() - t0) * 1000:.0f} ms)")
+    return built
+
+def _current_checksum():
+    """지금 스냅샷 출처의 체크섬 (읽기 실패 시 예외)"""
+    if _TT.source.startswith("mysql:"):
+        conn = _mysql_conn()
+        try:
+            cur = conn.cursor(dictionary=True)
+            checksum = _mysql_checksum(cur)
+            cur.close()
+        finally:
+            conn.close()
+        return checksum
+    return _dump_checksum(TIMETABLE_DUMP)
+
+def refresh(force: bool = False) -> bool:
+    """체크섬이 바뀌었거나 TIMETABLE_MAX_AGE_S가 지났으면 새 스냅샷으로 교체 → 교체 여부"""
+    global _TT, _CHECKSUM, _LOADED_AT
+    with _LOCK:
+        stale = (_TT is None or force or _LOADED_AT is None
+                 or time.monotonic() - _LOADED_AT >= TIMETABLE_MAX_AGE_S)
+        if not stale:
+            try:
+                if _current_checksum() == _CHECKSUM:
+                    return False
+            except Exception as e:   # 출처를 못 읽으면 기존 스냅샷 유지
+                print(f"[timetable] checksum failed, keeping snapshot: {type(e).__name__}: {e}")
+                return False
+        built = _build()
+        _LOADED_AT = time.monotonic()   # 실패해도 다음 주기까지 재시도하지 않음
+        if built is None:
+            return False
+        _TT, _CHECKSUM = built
+        return True
+
+def _refresh_loop() -> None:
+    while True:
+        time.sleep(TIMETABLE_REFRESH_S)
+        try:
+            refresh()
+        except Exception as e:
+            print(f"[timetable] refresh error: {type(e).__name__}: {e}")
+
+def load(force: bool = False) -> Optional[Timetable]:
+    """현재 스냅샷 (첫 호출 때만 적재 + 갱신 스레드 시작, 이후에는 락 없이 바로 반환)"""
+    global _REFRESHER
+    if force:
+        refresh(force=True)
+    tt = _TT
+    if tt is not None:
+        return tt
+    with _LOCK:
+        if _REFRESHER is None and TIMETABLE_REFRESH_S > 0:
+            _REFRESHER = threading.Thread(target=_refresh_loop, name="timetable-refresh", daemon=True)
+            _REFRESHER.start()
+    # 적재 실패 후에는 TIMETABLE_RETRY_S 동안 재시도하지 않음 (갱신 주기와 별개)
+    if _TT is None and (_LOADED_AT is None or time.monotonic() - _LOADED_AT >= TIMETABLE_RETRY_S):
+        refresh()
+    return _TT
+
+# ---------------- 질의 문장 → 조건 ----------------
+# 수업 질문임을 드러내는 말 — "언제/어디서/누구/학점/전공" 같은 일반 의문사·단어는 제외
+# ("컴퓨터정보공학과 졸업 학점은?", "이종명 교수님 연구실 어디서 찾아?"는 문서 검색으로)
+_INTENT = re.compile(r"수업|강의|과목|시간표|교시|가르[치쳐칠친]")
+_DAY = re.compile(r"([월화수목금토일])요일|([월화수목금토일])\s*(?=\d+\s*교시|주간|야간)")
+_PERIOD = re.compile(r"(\d{1,2})\s*교시")
+_ROOM = re.compile(r"\d{1,2}-B?\d{3}(?:-\d)?")
+_STUDENT = re.compile(r"(?<!\d)(20\d{6})(?!\d)")
+_TYPES = {"전필": "전필", "전공필수": "전필", "전선": "전선", "전공선택": "전선",
+          "교필": "교필", "교양필수": "교필", "교선": "교선", "교양선택": "교선"}
+# 이름 뒤에 올 수 있는 말 (이름이 다른 단어의 일부로 잡히지 않게)
+_NAME_TAIL = r"(?=\s|$|[^가-힣]|교수|선생|님|의|이|가|은|는|께서|이랑|랑|과|와)"
+
+def parse_query(query: str, tt: Timetable) -> Optional[Dict]:
+    """
+    시간표 질의면 find() 조건 dict, 아니면 None
+    (교수/강의실/학과/과목/학번 중 하나 + 수업 관련 표현(_INTENT) 또는 요일/교시)
+    """
+    q = (query or "").strip()
+    if not q:
+        return None
+    f: Dict = {}
+    m = tt.professor_re.search(q) if tt.professor_re else None
+    f["professor"] = m.group(1) if m else None
+    room = _ROOM.search(q)
+    f["classroom"] = room.group(0) if room else None
+    f["major"] = next((m for m in tt.major_names if m in q), None)
+    compact = _compact(q)
+    subj = next((s for s in tt.subject_names if len(s) >= 3 and s in compact), None)
+    f["subject"] = tt.classes[min(tt.by_subject[subj])]["subject"] if subj else None   # 원래 표기
+    sid = _STUDENT.search(q)
+    f["student_id"] = sid.group(1) if sid else None
+    if not any(f.values()):
+        return None
+
+    d = _DAY.search(q)
+    if d:
+        f["day"] = d.group(1) or d.group(2)
+    elif "오늘" in q or "내일" in q:
+        wd = (datetime.date.today().weekday() + (1 if "내일" in q else 0)) % 7
+        f["day"] = DAYS[wd]
+    if "야간" in q:
+        f["session"] = "야"
+    elif "주간" in q:
+        f["session"] = "주"
+    p = _PERIOD.search(q)
+    if p:
+        f["period"] = int(p.group(1))
+    for word, t in _TYPES.items():
+        if word in q:
+            f["course_type"] = t
+            break
+    if not (_INTENT.search(q) or f.get("day") or f.get("period") is not None):
+        return None
+    return {k: v for k, v in f.items() if v is not None}
+
+# ---------------- 답변 ----------------
+def _fmt_slot(s: Dict) -> str:
+    period = f"{s['start']}" if s["start"] == s["end"] else f"{s['start']}-{s['end']}"
+    return f"{s['day']} {SESSIONS[s['session']]} {period}교시"
+
+def format_row(c: Dict) -> str:
+    when = ", ".join(_fmt_slot(s) for s in c["slots"]) or "시간 미정"
+    extra = " / ".join(x for x in [c.get("classroom"), f"{c['credit']}학점" if c.get("credit") else None,
+                                   c.get("course_type"), c.get("major")] if x)
+    return f"- {c['subject']} ({c['professor']}) · {when} · {extra}"
+
+def _describe(f: Dict) -> str:
+    parts = []
+    if f.get("student_id"): parts.append(f"학번 {f['student_id']}")
+    if f.get("professor"):  parts.append(f"{f['professor']} 교수")
+    if f.get("major"):      parts.append(f["major"])
+    if f.get("subject"):    parts.append(f"'{f['subject']}'")
+    if f.get("classroom"):  parts.append(f"{f['classroom']} 강의실")
+    if f.get("day"):        parts.append(f"{f['day']}요일")
+    if f.get("session"):    parts.append(SESSIONS[f["session"]])
+    if f.get("period") is not None: parts.append(f"{f['period']}교시")
+    if f.get("course_type"): parts.append(f["course_type"])
+    return " ".join(parts)
+
+def answer(query: str) -> Optional[Dict]:
+    """구조화 질의면 {"answer", "sources", "structured": True, "filters", "total"}, 아니면 None"""
+    if not TIMETABLE_ENABLED:
+        return None
+    tt = load()
+    if tt is None:
+        return None
+    f = parse_query(query, tt)
+    if f is None:
+        return None
+    t0 = time.perf_counter()
+    rows = tt.find(**f)
+    desc = _describe(f)
+    if rows:
+        shown = rows[:TIMETABLE_MAX_ROWS]
+        lines = [f"{desc} 조건의 수업은 {len(rows)}개입니다."] + [format_row(c) for c in shown]
+        if len(rows) > len(shown):
+            lines.append(f"(외 {len(rows) - len(shown)}개)")
+    else:
+        lines = [f"{desc} 조건에 맞는 수업이 없습니다."]
+    if any(k in f for k in ("day", "session", "period")):
+        # 시간 조건이 있으면 시간표가 비어 있는 수업은 판단할 수 없음 → 개수 안내
+        base = {k: v for k, v in f.items() if k not in ("day", "session", "period")}
+        unknown = sum(1 for c in tt.find(**base) if not c["slots"])
+        if unknown:
+            lines.append(f"※ 시간표 정보가 없는 수업 {unknown}개는 제외했습니다.")
+
+    sources = [{
+        "id": f"class:{c['id']}",
+        "page": None,
+        "title": c["subject"],
+        "dataset": f"{SCHOOL_DB_NAME}.class",
+        "uri": None,
+        "score": 1.0,
+        "source_type": "mysql",
+        "text": format_row(c)[2:],
+    } for c in rows[:TIMETABLE_MAX_ROWS]]
+    print(f"[timetable] {f} → {len(rows)} rows ({(time.perf_counter() - t0) * 1000:.2f} ms)")
+    return {"answer": "\n".join(lines), "sources": sources, "structured": True,
+            "filters": f, "total": len(rows)}
@@ -0,0 +1,64 @@
+# ai/rag/tokens.py
+# ================================================================
+# 역할: 토큰 수 계산 (컨텍스트 예산/청크 크기 기준)
+# - tiktoken 인코딩을 프로세스당 1회만 로드(싱글톤)
+# - 같은 청크가 반복 검색되므로 텍스트별 토큰 수도 LRU 캐시
+# - tiktoken 미설치/오프라인(BPE 파일 다운로드 불가)이면 UTF-8 바이트 기반 근사치 사용
+#
+# 환경변수
+# - RAG_TOKENIZER=o200k_base   (gpt-4o 계열 인코딩)
+# ================================================================
+from __future__ import annotations
+
+import os, threading
+from functools import lru_cache
+from typing import List, Optional
+
+RAG_TOKENIZER = os.getenv("RAG_TOKENIZER", "o200k_base")
+
+_ENC = None
+_ENC_FAILED = False
+_ENC_LOCK = threading.Lock()
+
+def _encoding():
+    """tiktoken 인코딩 싱글톤 (실패 시 None → 근사치 모드)"""
+    global _ENC, _ENC_FAILED
+    if _ENC is None and not _ENC_FAILED:
+        with _ENC_LOCK:
+            if _ENC is None and not _ENC_FAILED:
+                try:
+                    import tiktoken
+                    _ENC = tiktoken.get_encoding(RAG_TOKENIZER)
+                except Exception as e:
+                    print(f"[tokens] tiktoken unavailable ({type(e).__name__}) → byte estimate")
+                    _ENC_FAILED = True
+    return _ENC
+
+def _estimate(text: str) -> int:
+    # 한글 1자 = UTF-8 3바이트 ≈ 0.75토큰, ASCII 4자 ≈ 1토큰
+    return (len(text.encode("utf-8")) + 3) // 4
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    enc = _encoding()
+    if enc is None:
+        return _estimate(text)
+    return len(enc.encode(text, disallowed_special=()))
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """토큰 기준 하드 컷 (문장 경계로 자를 수 없을 때만 사용)"""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    enc = _encoding()
+    if enc is None:
+        # 근사치 모드: 바이트 예산만큼 앞에서 자르고 깨진 글자 제거
+        return text.encode("utf-8")[: max_tokens * 4].decode("utf-8", errors="ignore")
+    ids: List[int] = enc.encode(text, disallowed_special=())[:max_tokens]
+    return enc.decode(ids).rstrip("\ufffd")
+
+def tokenizer_name() -> Optional[str]:
+    return RAG_TOKENIZER if _encoding() is not None else None
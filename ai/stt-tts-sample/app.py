@@ -19,11 +19,13 @@
 import os
 import base64
 import asyncio
+import hashlib
+import hmac
 from io import BytesIO
 import time
 from typing import Optional, List, Dict, Any
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Request
 from fastapi.responses import JSONResponse, FileResponse
 from pydantic import BaseModel
 
@@ -48,7 +50,8 @@ if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
 from llm_runtime.llm_client import chat
-from guard import violates_policy
+from guard import StreamGuard, violates_policy
+from rag import memory as chat_memory, rewrite as query_rewrite
 
 # -----------------------------------------------------------------------------
 # Windows용 이벤트 루프 설정 (asyncio 관련 오류 방지)
@@ -84,6 +87,14 @@ WHISPER_DEVICE = (os.getenv("WHISPER_DEVICE", "cpu") or "cpu").lower()
 # edge-tts 한국어 음성 & 포맷 (MP3 권장)
 TTS_VOICE = os.getenv("TTS_VOICE", "ko-KR-SunHiNeural")
 
+# 🔑 Flask 프록시(UI_MODE=flask)와 공유하는 비밀 → 서명된 X-User-Id만 로그인 uid로 인정
+#    (비어 있으면 헤더 uid는 항상 무시, 비로그인과 같이 session_id 사용)
+PROXY_SHARED_SECRET = os.getenv("PROXY_SHARED_SECRET", "")
+PROXY_SIG_MAX_AGE_S = int(os.getenv("PROXY_SIG_MAX_AGE_S", "300"))
+
+# 🛡️ 차단 멘트 (voice-chat은 미리 합성해 둔 MP3를 재사용)
+REFUSAL_TEXT = "⚠️ 부적절하거나 개인정보가 포함된 요청입니다. 다른 질문을 해 주세요."
+
 # -----------------------------------------------------------------------------
 # FastAPI 앱 설정
 # -----------------------------------------------------------------------------
@@ -138,6 +149,14 @@ async def _warmup():
         except Exception as e:
             _step(f"LLM ping failed: {e}")
 
+        # 차단 멘트 MP3 미리 합성
+        try:
+            _step("refusal clip")
+            await get_refusal_clip()
+            _step("refusal clip ok")
+        except Exception as e:
+            _step(f"refusal clip failed: {e}")
+
         _step("all done")
     except Exception as e:
         _step(f"warmup error: {type(e).__name__}: {e}")
@@ -149,6 +168,9 @@ async def _warmup():
 async def on_startup():
     if WARMUP_ON_STARTUP:
         asyncio.create_task(_warmup())
+    # 재시작 전에 대기 중이던 인덱싱 작업 이어서 실행
+    from rag import jobs as ingest_jobs
+    ingest_jobs.start_worker()
 
 # --- 상태 확인/수동 시작 ---
 @app.get("/warmup/status")
@@ -194,6 +216,7 @@ def get_stt_model() -> WhisperModel:
 # -----------------------------------------------------------------------------
 class ChatRequest(BaseModel):
     text: str
+    session_id: Optional[str] = None   # 비로그인 대화 기록 키 (로그인 시 uid 사용)
 
 class TTSRequest(BaseModel):
     text: str
@@ -204,12 +227,20 @@ class VoiceChatResponse(BaseModel):
     assistant_text: str
     audio_b64: str       # MP3 Base64
     audio_mime: str = "audio/mpeg"
+    blocked: bool = False  # 가드 위반으로 전사 중단 + LLM 생략
 
 # -----------------------------------------------------------------------------
 # Helper 함수들
 # -----------------------------------------------------------------------------
-def stt_transcribe_bytes(audio_bytes: bytes) -> Dict[str, Any]:
-    """Bytes → STT → {text, language, segments}"""
+# 조기 차단 통계 (/health)
+guard_stats = {"checked": 0, "blocked_early": 0, "audio_s_skipped": 0.0}
+
+def stt_transcribe_bytes(audio_bytes: bytes, guard: bool = False) -> Dict[str, Any]:
+    """
+    Bytes → STT → {text, language, segments, blocked}
+    - guard=True: 세그먼트가 나올 때마다 부분 전사를 가드로 검사,
+      위반이면 그 자리에서 디코딩 중단(세그먼트 제너레이터 close) → blocked에 위반 정보
+    """
     if not audio_bytes:
         raise ValueError("empty audio payload")
 
@@ -217,6 +248,8 @@ def stt_transcribe_bytes(audio_bytes: bytes) -> Dict[str, Any]:
     segments, info = model.transcribe(BytesIO(audio_bytes), beam_size=1)
 
     out_segments, full_text_parts = [], []
+    checker = StreamGuard() if guard else None
+    blocked = None
     for seg in segments:
         seg_text = (seg.text or "").strip()
         if seg_text:
@@ -224,25 +257,73 @@ def stt_transcribe_bytes(audio_bytes: bytes) -> Dict[str, Any]:
             out_segments.append(
                 {"text": seg_text, "start": float(seg.start), "end": float(seg.end)}
             )
+            if checker is not None:
+                blocked = checker.feed(seg_text)
+                if blocked:
+                    if hasattr(segments, "close"):
+                        segments.close()   # 남은 오디오는 디코딩하지 않음
+                    break
+
+    if checker is not None:
+        guard_stats["checked"] += 1
+        if blocked:
+            duration = float(getattr(info, "duration", 0.0) or 0.0)
+            skipped = max(0.0, duration - out_segments[-1]["end"])
+            guard_stats["blocked_early"] += 1
+            guard_stats["audio_s_skipped"] = round(guard_stats["audio_s_skipped"] + skipped, 2)
+            print(f"[guard] STT stopped at {out_segments[-1]['end']:.1f}s"
+                  f"{f'/{duration:.1f}s' if duration else ''} ({blocked['kind']})")
 
     text = " ".join(full_text_parts).strip()
     language = info.language or "unknown"
-    return {"text": text, "language": language, "segments": out_segments}
+    return {"text": text, "language": language, "segments": out_segments, "blocked": blocked}
 
-def chat_answer(user_text: str) -> str:
+def proxy_uid(request: Request) -> Optional[str]:
+    """
+    Flask 프록시가 서명한 X-User-Id → uid (서명 없음/불일치/만료면 None)
+    - 이 서버(:9000)는 브라우저가 CORS로 직접 부르기도 하므로 헤더만으로는 믿지 않음
+    """
+    uid = request.headers.get("x-user-id")
+    sig = request.headers.get("x-user-sig") or ""
+    if not uid or not PROXY_SHARED_SECRET or "." not in sig:
+        return None
+    ts, mac = sig.split(".", 1)
+    if not ts.isdigit() or abs(time.time() - int(ts)) > PROXY_SIG_MAX_AGE_S:
+        return None
+    want = hmac.new(PROXY_SHARED_SECRET.encode(), f"{uid}.{ts}".encode(), hashlib.sha256).hexdigest()
+    return uid if hmac.compare_digest(mac, want) else None
+
+def memory_key(request: Request, session_id: Optional[str] = None) -> Optional[str]:
+    """
+    대화 기록 키
+    - UI_MODE=asgi: 같은 앱의 세션 쿠키 uid
+    - UI_MODE=flask: Flask 프록시가 서명해 붙인 X-User-Id (proxy_uid)
+    - 비로그인 / 서명 없는 요청: 클라이언트가 보낸 session_id
+    """
+    if "session" in request.scope:
+        uid = request.session.get("uid")
+    else:
+        uid = proxy_uid(request)
+    return chat_memory.session_key(uid, session_id)
+
+def chat_answer(user_text: str, memory: Optional[str] = None) -> str:
     """
     텍스트 → GPT-4o-mini 답변(str)
     (기존 TinyLlama/vLLM 호출을 llm_runtime.llm_client.chat()으로 교체)
+    memory: 대화 기록 키 → 이전 대화(요약 + 최근 턴)를 같은 호출에 포함하고 이번 턴 저장
     """
     # 🛡️ Guard: 금지어/PII 포함 시 차단 멘트
     if violates_policy(user_text):
-        return "⚠️ 부적절하거나 개인정보가 포함된 요청입니다. 다른 질문을 해 주세요."
+        return REFUSAL_TEXT
 
     messages = [
         {"role": "system", "content": "You are a helpful Korean assistant."},
+        *chat_memory.history(memory),
         {"role": "user", "content": user_text.strip()},
     ]
-    return chat(messages)  # <-- GPT-4o-mini 호출
+    answer = chat(messages)  # <-- GPT-4o-mini 호출
+    chat_memory.append(memory, user_text, answer)
+    return answer
 
 async def tts_synthesize_mp3(text: str, voice: str) -> bytes:
     """텍스트를 음성(MP3)으로 변환"""
@@ -259,6 +340,19 @@ async def tts_synthesize_mp3(text: str, voice: str) -> bytes:
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"TTS synth failed: {e}")
 
+_refusal_clip: Optional[str] = None   # REFUSAL_TEXT MP3 (base64)
+_refusal_lock = asyncio.Lock()
+
+async def get_refusal_clip() -> str:
+    """차단 멘트 MP3(base64) — 처음 1번만 합성(웜업에서 미리), 이후 재사용"""
+    global _refusal_clip
+    if _refusal_clip is None:
+        async with _refusal_lock:
+            if _refusal_clip is None:
+                mp3_bytes = await tts_synthesize_mp3(REFUSAL_TEXT, TTS_VOICE)
+                _refusal_clip = base64.b64encode(mp3_bytes).decode("utf-8")
+    return _refusal_clip
+
 # -----------------------------------------------------------------------------
 # Health 체크
 # -----------------------------------------------------------------------------
@@ -269,6 +363,9 @@ def health():
         "llm": "gpt-4o-mini-via-llm_runtime",
         "warmup_done": warmup_state["done"],
         "warmup_running": warmup_state["running"],
+        "guard": dict(guard_stats),
+        "memory": chat_memory.stats(),
+        "rewrite": query_rewrite.stats(),
     }
 
 # -----------------------------------------------------------------------------
@@ -291,13 +388,13 @@ async def stt_endpoint(file: UploadFile = File(...)):
 # Chat 엔드포인트
 # -----------------------------------------------------------------------------
 @app.post("/chat")
-async def chat_endpoint(req: ChatRequest):
+async def chat_endpoint(req: ChatRequest, request: Request):
     """텍스트 입력 → GPT-4o-mini 응답 반환"""
     text = (req.text or "").strip()
     if not text:
         raise HTTPException(status_code=400, detail="Empty text")
     try:
-        answer = chat_answer(text)
+        answer = chat_answer(text, memory_key(request, req.session_id))
         return {"answer": answer}
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"LLM request failed: {e}")
@@ -326,21 +423,36 @@ async def tts_endpoint(req: TTSRequest):
 # Voice Chat 엔드포인트
 # -----------------------------------------------------------------------------
 @app.post("/voice-chat", response_model=VoiceChatResponse)
-async def voice_chat(file: UploadFile = File(...)):
-    """음성 → STT → GPT-4o-mini → TTS → JSON 반환"""
-    # 1) STT
+async def voice_chat(request: Request, file: UploadFile = File(...),
+                     session_id: Optional[str] = Form(None)):
+    """음성 → STT(+가드) → GPT-4o-mini → TTS → JSON 반환"""
+    # 1) STT — 부분 전사마다 가드 검사, 위반이면 전사 중단
     try:
         audio = await file.read()
-        stt = stt_transcribe_bytes(audio)
+        stt = stt_transcribe_bytes(audio, guard=True)
         user_text = (stt.get("text") or "").strip()
         if not user_text:
             raise HTTPException(status_code=400, detail="STT produced empty text")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"voice-chat STT error: {e}")
 
+    # 1-1) 가드 위반 → LLM/TTS 생략, 미리 합성한 차단 멘트 반환
+    if stt["blocked"]:
+        try:
+            audio_b64 = await get_refusal_clip()
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=f"voice-chat TTS error: {e}")
+        return VoiceChatResponse(
+            user_text=user_text,
+            assistant_text=REFUSAL_TEXT,
+            audio_b64=audio_b64,
+            audio_mime="audio/mpeg",
+            blocked=True,
+        )
+
     # 2) LLM (GPT-4o-mini)
     try:
-        assistant_text = chat_answer(user_text) or "죄송해요. 지금은 대답을 생성할 수 없어요."
+        assistant_text = chat_answer(user_text, memory_key(request, session_id)) or "죄송해요. 지금은 대답을 생성할 수 없어요."
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"voice-chat LLM error: {e}")
 
@@ -358,27 +470,6 @@ async def voice_chat(file: UploadFile = File(...)):
         audio_mime="audio/mpeg",
     )
 
-# -----------------------------------------------------------------------------
-# RAG - Mounted App
-# -----------------------------------------------------------------------------
-# All RAG logic is now handled by the self-contained FastAPI app in /rag/app.py
-# It is mounted under the /rag prefix.
-# -----------------------------------------------------------------------------
-from rag.app import app as rag_app
-
-app.mount("/rag", rag_app, name="rag")
-
-
-# -----------------------------------------------------------------------------
-# Frontend - Mount Flask App as main UI
-# -----------------------------------------------------------------------------
-from frontend.app import app as flask_app
-from asgiref.wsgi import WsgiToAsgi
-
-# Mount the Flask app at the root. This will handle all UI routes.
-app.mount("/", WsgiToAsgi(flask_app), name="frontend")
-
-
 # -----------------------------------------------------------------------------
 # Standalone LLM Ping (for testing)
 # -----------------------------------------------------------------------------
@@ -386,7 +477,10 @@ from typing import Optional, Dict, List
 from pydantic import BaseModel
 from fastapi import HTTPException
 from llm_runtime.llm_client import chat as llm_chat
-from rag.refactored_rag import ingest_data, ask_question
+from rag.refactored_rag import ingest_data, ask_question, retrieve_chunks
+from rag import retrieval_cache
+from rag import jobs as ingest_jobs
+from rag.config import RAG_RETRIEVAL_TTL_S
 
 # --- Old RAG imports (to be removed or replaced) ---
 # from rag.auto_index import ensure_index_ready
@@ -398,37 +492,61 @@ class IngestAllReq(BaseModel):
     pdf_paths: Optional[List[str]] = None
     mongo_query: Optional[Dict] = None
 
-@app.post("/rag/ingest")
+@app.post("/rag/ingest", status_code=202)
 def rag_ingest(req: Optional[IngestAllReq] = None):
+    """
+    인덱싱 작업 등록 → job id 즉시 반환 (요청 스레드/프록시 타임아웃과 분리)
+    진행률: GET /rag/ingest/jobs/{job_id}, 취소: POST /rag/ingest/jobs/{job_id}/cancel (rag/app.py)
+    """
     try:
-        ingest_data(pdf_paths=req.pdf_paths if req else None,
-                    mongo_query=req.mongo_query if req else None)
-        return {"status":"ok", "message": "Ingestion complete."}
+        job = ingest_jobs.submit("ingest_data", {
+            "pdf_paths": req.pdf_paths if req else None,
+            "mongo_query": req.mongo_query if req else None,
+        })
+        return {"status": job["status"], "job_id": job["id"], "message": "Ingestion queued."}
+    except ValueError as e:
+        raise HTTPException(400, f"Ingest failed: {e}")
     except Exception as e:
         raise HTTPException(500, f"Ingest failed: {e}")
 
 class RagChatReq(BaseModel):
     query: str
     top_k: int = 6
-    # dataset 등 필터: {"dataset": ["경영학과","전기공학과"]}
+    # dataset 등 필터: {"dataset": ["depatement_db.경영학과","규정집"]} (Mongo는 "<db>.<컬렉션>", PDF는 "규정집")
     filters: Optional[Dict[str, List[str]]] = None
+    # 이웃/부모 청크 확장: "none" | "neighbors" | "parent" (미지정 시 RAG_EXPAND)
+    expand: Optional[str] = None
+    # /rag/preview가 돌려준 토큰: 질문/filters/top_k/expand/대화 기록이 같으면 검색을 건너뛰고 미리보기 청크로 답변
+    retrieval_token: Optional[str] = None
+    # 비로그인 대화 기록 키 (로그인 시 세션 uid 사용)
+    session_id: Optional[str] = None
 
 @app.post("/rag/chat")
-def rag_chat(req: RagChatReq):
+def rag_chat(req: RagChatReq, request: Request):
     q = (req.query or "").strip()
     if not q:
         raise HTTPException(status_code=400, detail="Empty query")
 
     t0 = time.perf_counter()
+    key = memory_key(request, req.session_id)
 
     try:
-        result = ask_question(query=q, k=req.top_k, filters=req.filters)
+        history = chat_memory.history(key)
+        cached = retrieval_cache.get(req.retrieval_token, q, filters=req.filters, top_k=req.top_k,
+                                     expand=req.expand, history=history)
+        result = ask_question(query=q, k=req.top_k, filters=req.filters, expand=req.expand, chunks=cached,
+                              history=history)
+        chat_memory.append(key, q, result["answer"])
 
         latency_ms = int((time.perf_counter() - t0) * 1000)
         return {
             "answer": result["answer"],
             "sources": result["sources"],
             "latency_ms": latency_ms,   # 디버깅용 지연 시간
+            "retrieval_reused": cached is not None,
+            "structured": result.get("structured", False),   # 시간표 테이블 조회로 답변한 경우
+            "history_messages": len(history),                # 프롬프트에 포함된 이전 대화 메시지 수
+            "search_query": result.get("search_query", q),   # 후속 질문이면 재작성된 검색 질의
         }
 
     except TimeoutError:
@@ -436,23 +554,40 @@ def rag_chat(req: RagChatReq):
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"RAG failed: {e}")
 
+@app.delete("/chat/memory")
+def clear_chat_memory(request: Request, session_id: Optional[str] = None):
+    """현재 세션(uid 또는 session_id)의 대화 기록 삭제 → 새 대화"""
+    key = memory_key(request, session_id)
+    return {"ok": key is not None, "cleared": chat_memory.clear(key)}
+
 @app.post("/rag/preview")
-def rag_preview(req: RagChatReq):
+def rag_preview(req: RagChatReq, request: Request):
+    """검색만 수행 → 청크 + retrieval_token (/rag/chat에 넘기면 검색 재사용, 후속 질문은 재작성 후 검색)"""
+    q = (req.query or "").strip()
+    if not q:
+        raise HTTPException(status_code=400, detail="Empty query")
     try:
-        result = ask_question(query=req.query, k=req.top_k, filters=req.filters)
-        
+        history = chat_memory.history(memory_key(request, req.session_id))
+        chunks = retrieve_chunks(query=q, k=req.top_k, filters=req.filters, expand=req.expand, history=history)
+
         chunks_output = []
-        for source in result["sources"]:
+        for c in chunks:
+            meta = c["meta"]
             chunks_output.append({
-                "page": source.get("page"),
-                "source_type": source.get("source_type"),
-                "title": source.get("title"),
-                "dataset": source.get("dataset"),
-                "score": source.get("score", 0), # ask_question currently returns None for score
-                "text": source.get("text", "")[:500]
+                "page": meta.get("page"),
+                "source_type": meta.get("source_type"),
+                "title": meta.get("title"),
+                "dataset": meta.get("dataset"),
+                "score": c.get("score"),
+                "text": (c.get("text") or "")[:500]
             })
-        
-        return {"chunks": chunks_output}
+
+        return {
+            "chunks": chunks_output,
+            "retrieval_token": retrieval_cache.put(q, chunks, filters=req.filters, top_k=req.top_k,
+                                                   expand=req.expand, history=history),
+            "expires_in": RAG_RETRIEVAL_TTL_S,
+        }
     except Exception as e:
         raise HTTPException(500, f"Preview failed: {e}")
 
@@ -491,3 +626,38 @@ def llm_ping():
     except Exception as e:
         import traceback
         return {"ok": False, "error": str(e), "trace": traceback.format_exc(limit=2)}
+
+# -----------------------------------------------------------------------------
+# RAG - Mounted App
+# -----------------------------------------------------------------------------
+# All RAG logic is now handled by the self-contained FastAPI app in /rag/app.py
+# It is mounted under the /rag prefix.
+# ※ Mount는 경로 전체를 가로채므로 반드시 파일 맨 끝에서 마운트합니다.
+#   (앞에 두면 위의 /rag/chat, /rag/preview, /llm/ping 등 명시 라우트가 가려짐)
+#   명시 라우트가 없는 /rag/* (retrieve_many, health, debug/count 등)만 rag/app.py로 전달됩니다.
+# -----------------------------------------------------------------------------
+from rag.app import app as rag_app
+
+app.mount("/rag", rag_app, name="rag")
+
+
+# -----------------------------------------------------------------------------
+# Frontend - UI 라우트
+# -----------------------------------------------------------------------------
+# UI_MODE=asgi (기본): 회원 API(/api/*)·HTML 페이지·/image를 이 앱의 라우트로 직접 처리
+#   (frontend/asgi_ui.py) → WSGI 브리지/Flask 프록시의 루프백 HTTP 없이 요청당 1홉
+#   /chat, /tts, /voice-chat, /rag/* 는 위의 FastAPI 라우트가 같은 프로세스에서 처리
+# UI_MODE=flask : 기존처럼 Flask 앱을 WsgiToAsgi로 루트에 마운트
+# -----------------------------------------------------------------------------
+UI_MODE = os.getenv("UI_MODE", "asgi").lower()
+
+if UI_MODE == "flask":
+    from frontend.app import app as flask_app
+    from asgiref.wsgi import WsgiToAsgi
+
+    # Mount the Flask app at the root. This will handle all UI routes.
+    app.mount("/", WsgiToAsgi(flask_app), name="frontend")
+else:
+    from frontend.asgi_ui import mount_ui
+
+    mount_ui(app)
@@ -4,26 +4,261 @@
 # 🛡️ 역할:
 # - 사용자 입력 텍스트에 욕설, 비속어, 개인정보(전화번호/이메일 등)가 포함되어 있는지 감지
 # - LLM 호출 전에 필터링하여 서비스 안전성 확보
+#
+# 구현
+# - 금지어: 목록 전체를 Aho–Corasick 오토마톤 1개로 컴파일 → 메시지 길이에만 비례
+#   (단어 수가 수천 개로 늘어도 메시지당 비용 거의 일정)
+# - 우회 표기 정규화(금지어/입력에 똑같이 적용):
+#   · NFKC + 소문자, 어절 안의 문장부호/기호/숫자/제로폭 문자 제거  ("씨.발", "씨1발")
+#   · 공백은 어절 경계로 남김 → 금지어는 한 어절 안에서만 매칭
+#     ("아저씨 발표", "공개 새 소식", "개 새로" 같은 일반 문장은 통과)
+#   · 단, 1글자 어절이 연달아 오면 붙여서 한 어절로 봄            ("씨 발", "개 새 끼")
+#   · 한글 음절 → 자모 분해, 초성 ㅇ 생략                       ("씨ㅂ알", "씨바ㄹ")
+#   · 1음절 금지어는 음절 경계에 정확히 맞을 때만, 영문 금지어는 원문 단어 경계에서만 인정
+#     ("조조" ≠ "좆", "is hit" ≠ "shit")
+# - 개인정보: 패턴 전체를 이름 붙은 그룹 정규식 1개로 미리 컴파일
+# - scan()은 원문 기준 위치(start, end)를 돌려줌 → 마스킹/로그에 사용
+# - StreamGuard: STT 부분 결과(세그먼트)를 들어오는 대로 검사 → 위반 시 전사 조기 중단
+#   (직전 텍스트 끝 GUARD_TAIL_CHARS 글자 안팎을 겹쳐 검사해 세그먼트 경계에 걸친 단어/번호도 잡음,
+#    겹침 구간은 공백 다음에서 시작 → 어절 중간을 잘라 "발표"의 "발" 같은 조각만 검사하지 않음)
+#
+# 환경변수
+# - GUARD_WORDS_PATH=<이 폴더>/guard_words.txt   (한 줄에 1단어, # 주석)
+# - GUARD_TAIL_CHARS=32
 # ================================================================
 
+import os
 import re
+import threading
+import unicodedata
+from collections import deque
+from typing import Dict, List, Optional
 
-# ✅ 금지 단어 리스트 (필요 시 확장)
+# ✅ 금지 단어 기본값 (GUARD_WORDS_PATH 파일이 없을 때)
 BAD_WORDS = ["씨발", "좆", "개새", "fuck", "shit"]
+GUARD_WORDS_PATH = os.getenv("GUARD_WORDS_PATH", os.path.join(os.path.dirname(__file__), "guard_words.txt"))
+GUARD_TAIL_CHARS = int(os.getenv("GUARD_TAIL_CHARS", "32"))
 
-# ✅ 개인정보 패턴 (정규표현식)
-PII_PATTERNS = [
-    r"\b\d{3}-\d{2}-\d{5}\b",   # 주민/학번 유사 패턴 예시
-    r"\b010-\d{4}-\d{4}\b",     # 한국 휴대폰 번호
-    r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+",  # 이메일 주소
-]
+# ✅ 개인정보 패턴 (정규표현식) → 하나로 합쳐 컴파일
+PII_PATTERNS = {
+    "rrn": r"\b\d{3}-\d{2}-\d{5}\b",   # 주민/학번 유사 패턴 예시
+    "phone": r"\b010-\d{4}-\d{4}\b",   # 한국 휴대폰 번호
+    "email": r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+",  # 이메일 주소
+}
+PII_RE = re.compile("|".join(f"(?P<{name}>{pat})" for name, pat in PII_PATTERNS.items()))
+
+# ---------------- 정규화 (자모 분해 + 원문 위치 매핑) ----------------
+_CHO = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+_JUNG = "ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ"
+_JONG = ["", *"ㄱㄲㄳㄴㄵㄶㄷㄹㄺㄻㄼㄽㄾㄿㅀㅁㅂㅄㅅㅆㅇㅈㅊㅋㅌㅍㅎ"]
+# NFKC가 낱자모(ㅂ, U+3142)를 조합용 자모(U+1107)로 바꾸므로 다시 호환 자모로 통일
+_CONJOINING = {**{chr(0x1100 + i): c for i, c in enumerate(_CHO)},
+               **{chr(0x1161 + i): c for i, c in enumerate(_JUNG)},
+               **{chr(0x11A8 + i): c for i, c in enumerate(_JONG[1:])}}
+
+def _is_space(ch: str) -> bool:
+    return ch.isspace() or unicodedata.category(ch)[0] == "Z"
+
+def _skip(ch: str) -> bool:
+    cat = unicodedata.category(ch)
+    return cat[0] in "PSC" or cat == "Nd"
+
+def _token_chars(token: str, i0: int):
+    """어절 1개 → (정규화 문자, 원문 위치, 음절 시작 여부)"""
+    out, pos, starts = [], [], []
+    for k, raw in enumerate(token):
+        for ch in unicodedata.normalize("NFKC", raw).lower():
+            if _skip(ch):
+                continue
+            code = ord(ch) - 0xAC00
+            if 0 <= code < 11172:
+                cho, jung, jong = _CHO[code // 588], _JUNG[(code % 588) // 28], _JONG[code % 28]
+                jamo = ([] if cho == "ㅇ" else [cho]) + [jung] + ([jong] if jong else [])
+            else:
+                jamo = [_CONJOINING.get(ch, ch)]
+            for j, c in enumerate(jamo):
+                out.append(c)
+                pos.append(i0 + k)
+                starts.append(j == 0)
+    return out, pos, starts
+
+def normalize(text: str):
+    """
+    → (정규화 문자열, 원문 위치 리스트, 음절 시작 여부 리스트)
+    각 정규화 문자가 원문의 몇 번째 글자에서 나왔는지 기록해 span을 원문 기준으로 되돌림
+    공백(연속이면 1개)은 " "로 남겨 어절 경계 유지 → 금지어(공백 없음)는 어절을 넘어 매칭되지 않음
+    단, 1글자(음절/자모/영문자 1개) 어절끼리는 붙임 → "씨 발", "개 새 끼"는 잡고 "아저씨 발표"는 그대로
+    """
+    out, pos, starts = [], [], []
+    prev_single = False
+    i, n = 0, len(text)
+    while i < n:
+        if _is_space(text[i]):
+            i += 1
+            continue
+        j = i
+        while j < n and not _is_space(text[j]):
+            j += 1
+        chars, cpos, cstarts = _token_chars(text[i:j], i)
+        if chars:   # 문장부호만 있는 어절(" . ")은 없는 것으로 취급
+            single = sum(cstarts) == 1
+            if out and not (prev_single and single):
+                out.append(" ")
+                pos.append(i - 1)
+                starts.append(True)
+            out += chars
+            pos += cpos
+            starts += cstarts
+            prev_single = single
+        i = j
+    return "".join(out), pos, starts
+
+# ---------------- Aho–Corasick ----------------
+class Automaton:
+    """여러 패턴을 한 번에 찾는 Aho–Corasick (goto 딕셔너리 + fail 링크, 출력은 빌드 때 병합)"""
+
+    def __init__(self, patterns: List[str]):
+        self.patterns = patterns
+        self.goto: List[Dict[str, int]] = [{}]
+        self.out: List[List[int]] = [[]]
+        for pid, p in enumerate(patterns):
+            s = 0
+            for ch in p:
+                nxt = self.goto[s].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[s][ch] = nxt
+                    self.goto.append({})
+                    self.out.append([])
+                s = nxt
+            self.out[s].append(pid)
+
+        self.fail = [0] * len(self.goto)
+        q = deque(self.goto[0].values())
+        while q:
+            s = q.popleft()
+            for ch, nxt in self.goto[s].items():
+                q.append(nxt)
+                f = self.fail[s]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                cand = self.goto[f].get(ch, 0)
+                self.fail[nxt] = cand if cand != nxt else 0
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def iter(self, text: str):
+        """(끝 위치(포함), 패턴 id) 순회"""
+        goto, fail, out = self.goto, self.fail, self.out
+        s = 0
+        for i, ch in enumerate(text):
+            while s and ch not in goto[s]:
+                s = fail[s]
+            s = goto[s].get(ch, 0)
+            for pid in out[s]:
+                yield i, pid
+
+# ---------------- 금지어 사전 ----------------
+class WordGuard:
+    def __init__(self, words: List[str]):
+        self.words, keys, self.syllables, self.latin = [], [], [], []
+        seen = set()
+        for w in words:
+            key = normalize(w)[0].strip()
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            self.words.append(w)
+            keys.append(key)
+            self.syllables.append(sum(1 for ch in w if 0xAC00 <= ord(ch) < 0xAC00 + 11172))
+            self.latin.append(bool(re.fullmatch(r"[a-z]+", key)))
+        self.automaton = Automaton(keys)
+        self.keys = keys
+
+    def scan(self, text: str, first: bool = False) -> List[Dict]:
+        norm, pos, starts = normalize(text)
+        n = len(norm)
+        hits = []
+        for end, pid in self.automaton.iter(norm):
+            start = end - len(self.keys[pid]) + 1
+            if not starts[start]:
+                continue   # 음절 중간에서 시작 (예: 받침과 다음 음절이 우연히 이어진 경우)
+            if self.syllables[pid] == 1 and end + 1 < n and not starts[end + 1]:
+                continue   # 1음절 금지어는 음절 하나와 정확히 일치해야 함
+            a, b = pos[start], pos[end] + 1
+            if self.latin[pid] and ((a > 0 and text[a - 1].isalpha()) or (b < len(text) and text[b].isalpha())):
+                continue   # 영문은 원문 단어 경계
+            hits.append({"kind": "profanity", "label": self.words[pid], "start": a, "end": b, "text": text[a:b]})
+            if first:
+                break
+        return hits
+
+def load_words(path: Optional[str] = None) -> List[str]:
+    path = path or GUARD_WORDS_PATH
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            words = [w.strip() for w in f if w.strip() and not w.lstrip().startswith("#")]
+        return words or list(BAD_WORDS)
+    except OSError:
+        return list(BAD_WORDS)
+
+_GUARD: Optional[WordGuard] = None
+_LOCK = threading.Lock()
+
+def get_guard() -> WordGuard:
+    global _GUARD
+    if _GUARD is None:
+        with _LOCK:
+            if _GUARD is None:
+                _GUARD = WordGuard(load_words())
+    return _GUARD
+
+def reload(path: Optional[str] = None) -> int:
+    """금지어 파일을 다시 읽어 오토마톤 교체 → 단어 수"""
+    global _GUARD
+    guard = WordGuard(load_words(path))
+    _GUARD = guard
+    return len(guard.words)
+
+# ---------------- 검사 API ----------------
+def scan(text: str, first: bool = False) -> List[Dict]:
+    """위반 목록 [{"kind": "profanity"|"pii", "label", "start", "end", "text"}] (원문 기준 위치, 시작 순)"""
+    text = text or ""
+    hits = get_guard().scan(text, first=first)
+    if first and hits:
+        return hits
+    for m in PII_RE.finditer(text):
+        hits.append({"kind": "pii", "label": m.lastgroup, "start": m.start(), "end": m.end(), "text": m.group()})
+        if first:
+            break
+    return sorted(hits, key=lambda h: (h["start"], h["end"]))
 
 def violates_policy(text: str) -> bool:
     """텍스트가 금지어 또는 개인정보 규칙을 위반하는지 확인"""
-    text = text.lower()
-    if any(bad in text for bad in BAD_WORDS):
-        return True
-    for pat in PII_PATTERNS:
-        if re.search(pat, text):
-            return True
-    return False
+    return bool(scan(text, first=True))
+
+class StreamGuard:
+    """
+    부분 전사 텍스트를 조각 단위로 검사 (조각마다 직전 꼬리 + 새 조각만 스캔)
+    - feed(piece) → 첫 위반(dict) 또는 None
+    - 위반 위치는 지금까지 이어 붙인 전체 텍스트(text) 기준
+    - 겹침 구간은 꼬리 길이 지점 이전의 마지막 공백 다음부터 (어절 경계 판단에 앞 글자가 필요)
+    """
+
+    def __init__(self, tail_chars: int = GUARD_TAIL_CHARS):
+        self.tail_chars = tail_chars
+        self.text = ""
+
+    def feed(self, piece: str) -> Optional[Dict]:
+        piece = (piece or "").strip()
+        if not piece:
+            return None
+        cut = len(self.text) - self.tail_chars
+        base = self.text.rfind(" ", 0, cut + 1) + 1 if cut > 0 else 0
+        self.text = f"{self.text} {piece}" if self.text else piece
+        hits = scan(self.text[base:], first=True)
+        if not hits:
+            return None
+        hit = dict(hits[0])
+        hit["start"] += base
+        hit["end"] += base
+        return hit
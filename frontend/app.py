@@ -1,15 +1,24 @@
 # ==========================================================
 # app.py (Flask + MySQL + FastAPI RAG/STT/TTS 프록시 통합)
 # ==========================================================
+import hashlib
+import hmac
 import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 from datetime import timedelta
-from flask import Flask, jsonify, request, send_from_directory, session
+from flask import Flask, Response, jsonify, request, send_from_directory, session
 from flask_cors import CORS
 import mysql.connector
 from dotenv import load_dotenv
 import bcrypt
 import requests
+from requests.adapters import HTTPAdapter
 
 # ----------------------------
 # 1) 환경 변수 로드 (.env)
@@ -22,11 +31,20 @@ DB_PORT = int(os.getenv("DB_PORT", "3306"))
 DB_USER = os.getenv("DB_USER", "root")
 DB_PASS = os.getenv("DB_PASS", "")
 DB_NAME = os.getenv("DB_NAME", "test")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))          # 프로세스당 최대 연결 수
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))   # 연결 대기 최대 시간(초) → 넘으면 503
+DB_POOL_PING_S = float(os.getenv("DB_POOL_PING_S", "30"))    # 이 시간 넘게 놀던 연결은 꺼내기 전 ping
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))          # bcrypt cost (올리면 로그인 시 자동 재해시)
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(os.cpu_count() or 2)))  # 해시 전용 스레드 수
+BCRYPT_QUEUE_MAX = int(os.getenv("BCRYPT_QUEUE_MAX", "64"))    # 대기+실행 최대 건수 → 넘으면 503
 
 SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret")
 PORT = int(os.getenv("PORT", "8001"))
 FASTAPI_BASE = os.getenv("FASTAPI_BASE", "http://127.0.0.1:9000")
 CORS_ORIGINS = [o.strip() for o in os.getenv("CORS_ORIGINS", "").split(",") if o.strip()]
+PROXY_POOL_SIZE = int(os.getenv("PROXY_POOL_SIZE", "20"))              # FastAPI keep-alive 연결 수
+PROXY_CONNECT_TIMEOUT = float(os.getenv("PROXY_CONNECT_TIMEOUT", "3"))  # 연결 수립 타임아웃(초)
+PROXY_SHARED_SECRET = os.getenv("PROXY_SHARED_SECRET", "")  # FastAPI와 공유 → X-User-Id 서명 (없으면 uid 안 넘김)
 
 print("==== ENV CHECK ====")
 print("[ENV] DB_HOST =", DB_HOST)
@@ -44,8 +62,15 @@ app.permanent_session_lifetime = timedelta(days=7)
 CORS(app, supports_credentials=True, resources={r"/*": {"origins": CORS_ORIGINS or ["*"]}})
 
 # ----------------------------
-# 3) MySQL 연결
+# 3) MySQL 연결 (커넥션 풀)
+# - 요청마다 connect(TCP+인증) 하지 않고 풀에서 빌려 쓰고 반납
+# - 최대 DB_POOL_SIZE개, 모두 사용 중이면 DB_POOL_TIMEOUT초 대기 후 PoolTimeout(→ 503)
+# - DB_POOL_PING_S 넘게 쉬던 연결은 ping으로 확인, 끊겼으면 버리고 새로 연결
+# - 모든 DB 접근은 db_cursor() / db_conn() 컨텍스트로
 # ----------------------------
+class PoolTimeout(Exception):
+    pass
+
 def get_raw_conn(database=None, autocommit=True):
     cfg = {
         "host": DB_HOST,
@@ -58,15 +83,93 @@ def get_raw_conn(database=None, autocommit=True):
     }
     return mysql.connector.connect(**cfg)
 
-def init_db():
-    root = get_raw_conn(database=None)
-    cur = root.cursor()
-    cur.execute(f"CREATE DATABASE IF NOT EXISTS `{DB_NAME}` DEFAULT CHARACTER SET utf8mb4")
-    cur.close()
-    root.close()
+class ConnectionPool:
+    def __init__(self, database, size, timeout, ping_s):
+        self.database, self.size, self.timeout, self.ping_s = database, size, timeout, ping_s
+        self._idle = queue.LifoQueue()                 # (conn, 반납 시각) — 최근 반납한 연결부터 재사용
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _healthy(self, conn, idle_since):
+        if time.monotonic() - idle_since < self.ping_s:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except mysql.connector.Error:
+            return False
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"DB pool exhausted ({self.size} connections busy for {self.timeout}s)")
+        try:
+            while True:
+                try:
+                    conn, idle_since = self._idle.get_nowait()
+                except queue.Empty:
+                    return get_raw_conn(database=self.database)
+                if self._healthy(conn, idle_since):
+                    return conn
+                self._discard(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn, broken=False):
+        try:
+            if not broken:
+                try:
+                    if conn.in_transaction:
+                        conn.rollback()   # 커밋 안 한 작업은 다음 사용자에게 넘기지 않음
+                except mysql.connector.Error:
+                    broken = True
+            if broken:
+                self._discard(conn)
+            else:
+                self._idle.put((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+POOL = ConnectionPool(DB_NAME, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_POOL_PING_S)
+
+@contextmanager
+def db_conn():
+    conn = POOL.acquire()
+    broken = False
+    try:
+        yield conn
+    except (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError):
+        broken = True   # 연결 자체 오류 → 풀에 돌려놓지 않음
+        raise
+    finally:
+        POOL.release(conn, broken)
+
+@contextmanager
+def db_cursor(dictionary=False):
+    with db_conn() as conn:
+        cur = conn.cursor(dictionary=dictionary)
+        try:
+            yield cur
+        finally:
+            cur.close()
 
-    conn = get_raw_conn(database=DB_NAME)
+@app.errorhandler(PoolTimeout)
+def pool_timeout(e):
+    print(f"[DB] {e}")
+    return jsonify(ok=False, msg="접속자가 많아 잠시 후 다시 시도해주세요."), 503
+
+def init_db():
+    # DB 생성 전이라 풀을 쓰지 않고 연결 1개로 생성 + 테이블 준비
+    conn = get_raw_conn(database=None)
     cur = conn.cursor()
+    cur.execute(f"CREATE DATABASE IF NOT EXISTS `{DB_NAME}` DEFAULT CHARACTER SET utf8mb4")
+    conn.database = DB_NAME
     cur.execute("""
     CREATE TABLE IF NOT EXISTS users (
       id INT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
@@ -85,13 +188,98 @@ def init_db():
     print("[INIT_DB] ✅ OK")
 
 # ----------------------------
-# 4) 유틸
+# 4) 유틸 — 비밀번호 해시 (전용 스레드풀)
+# - bcrypt는 CPU만 쓰고 GIL을 풀기 때문에 BCRYPT_WORKERS개 스레드에서 코어 수만큼 병렬 처리
+# - 요청 스레드/ASGI 스레드풀이 아니라 전용 풀에서 실행 → 로그인 폭주 때도 채팅 요청이 밀리지 않음
+# - 대기+실행이 BCRYPT_QUEUE_MAX를 넘으면 HasherBusy(→ 503)로 바로 거절
+# - 저장된 해시의 cost가 BCRYPT_ROUNDS보다 낮으면 로그인 성공 시 재해시해서 갱신
 # ----------------------------
+class HasherBusy(Exception):
+    pass
+
+class PasswordHasher:
+    def __init__(self, workers, queue_max, rounds):
+        self.rounds, self.queue_max = rounds, queue_max
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self.workers = workers
+        self.stats = {"submitted": 0, "rejected": 0, "pending": 0, "running": 0, "done": 0,
+                      "wait_ms_total": 0.0, "wait_ms_max": 0.0, "run_ms_total": 0.0}
+
+    def submit(self, fn, *args):
+        """concurrent.futures.Future 반환 (동기: .result(), async: asyncio.wrap_future)"""
+        with self._lock:
+            if self.stats["pending"] >= self.queue_max:
+                self.stats["rejected"] += 1
+                raise HasherBusy(f"bcrypt queue full ({self.queue_max} pending)")
+            self.stats["pending"] += 1
+            self.stats["submitted"] += 1
+        return self._pool.submit(self._run, time.perf_counter(), fn, *args)
+
+    def _run(self, t_submit, fn, *args):
+        t0 = time.perf_counter()
+        with self._lock:
+            self.stats["running"] += 1
+            wait_ms = (t0 - t_submit) * 1000
+            self.stats["wait_ms_total"] += wait_ms
+            self.stats["wait_ms_max"] = max(self.stats["wait_ms_max"], wait_ms)
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.stats["running"] -= 1
+                self.stats["pending"] -= 1
+                self.stats["done"] += 1
+                self.stats["run_ms_total"] += (time.perf_counter() - t0) * 1000
+
+    def snapshot(self):
+        with self._lock:
+            s = dict(self.stats)
+        done = max(s["done"], 1)
+        s.update(workers=self.workers, queue_max=self.queue_max, rounds=self.rounds,
+                 queued=s["pending"] - s["running"],
+                 wait_ms_avg=round(s.pop("wait_ms_total") / done, 2),
+                 run_ms_avg=round(s.pop("run_ms_total") / done, 2),
+                 wait_ms_max=round(s["wait_ms_max"], 2))
+        return s
+
+HASHER = PasswordHasher(BCRYPT_WORKERS, BCRYPT_QUEUE_MAX, BCRYPT_ROUNDS)
+
+def bcrypt_hash(plain: str) -> str:
+    return bcrypt.hashpw(plain.encode("utf-8"), bcrypt.gensalt(BCRYPT_ROUNDS)).decode("utf-8")
+
+def bcrypt_check(plain: str, hashed: str) -> bool:
+    return bcrypt.checkpw(plain.encode("utf-8"), hashed.encode("utf-8"))
+
 def hash_pw(plain: str) -> str:
-    return bcrypt.hashpw(plain.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    return HASHER.submit(bcrypt_hash, plain).result()
 
 def check_pw(plain: str, hashed: str) -> bool:
-    return bcrypt.checkpw(plain.encode("utf-8"), hashed.encode("utf-8"))
+    return HASHER.submit(bcrypt_check, plain, hashed).result()
+
+def needs_rehash(hashed: str) -> bool:
+    """저장된 해시 cost < BCRYPT_ROUNDS ($2b$<cost>$...)"""
+    m = re.match(r"^\$2[abxy]?\$(\d{2})\$", hashed or "")
+    return bool(m) and int(m.group(1)) < BCRYPT_ROUNDS
+
+def update_pw_hash(uid: str, pw_hash: str) -> None:
+    with db_cursor() as cur:
+        cur.execute("UPDATE users SET password_hash=%s WHERE uid=%s", (pw_hash, uid))
+
+def rehash_on_login(uid: str, plain: str, hashed: str) -> None:
+    """로그인 성공 직후: cost가 낮으면 새 cost로 다시 해시해서 저장 (실패해도 로그인은 유지)"""
+    if not needs_rehash(hashed):
+        return
+    try:
+        update_pw_hash(uid, hash_pw(plain))
+        print(f"[AUTH] rehashed {uid} → cost {BCRYPT_ROUNDS}")
+    except Exception as e:
+        print(f"[AUTH] rehash skipped for {uid}: {e}")
+
+@app.errorhandler(HasherBusy)
+def hasher_busy(e):
+    print(f"[AUTH] {e}")
+    return jsonify(ok=False, msg="접속자가 많아 잠시 후 다시 시도해주세요."), 503
 
 # ----------------------------
 # 5) 회원가입 / 로그인 API
@@ -110,20 +298,16 @@ def signup():
     if not all([uid, role, name, dept, email, pw]):
         return jsonify(ok=False, msg="필수 항목 누락"), 400
 
-    conn = get_raw_conn(database=DB_NAME)
-    cur = conn.cursor()
+    pw_hash = hash_pw(pw)   # 해시는 연결을 빌리기 전에 (bcrypt 동안 연결 점유 X)
     try:
-        cur.execute(
-            "INSERT INTO users(uid, role, name, department, email, password_hash) VALUES(%s,%s,%s,%s,%s,%s)",
-            (uid, role, name, dept, email, hash_pw(pw)),
-        )
-        conn.commit()
+        with db_cursor() as cur:
+            cur.execute(
+                "INSERT INTO users(uid, role, name, department, email, password_hash) VALUES(%s,%s,%s,%s,%s,%s)",
+                (uid, role, name, dept, email, pw_hash),
+            )
         return jsonify(ok=True)
     except mysql.connector.errors.IntegrityError:
         return jsonify(ok=False, msg="이미 존재하는 아이디입니다."), 409
-    finally:
-        cur.close()
-        conn.close()
 
 @app.post("/api/login")
 def login():
@@ -133,15 +317,13 @@ def login():
     if not uid or not pw:
         return jsonify(ok=False, msg="아이디/비밀번호 필요"), 400
 
-    conn = get_raw_conn(database=DB_NAME)
-    cur = conn.cursor(dictionary=True)
-    cur.execute("SELECT * FROM users WHERE uid=%s", (uid,))
-    row = cur.fetchone()
-    cur.close()
-    conn.close()
+    with db_cursor(dictionary=True) as cur:
+        cur.execute("SELECT * FROM users WHERE uid=%s", (uid,))
+        row = cur.fetchone()
 
     if not row or not check_pw(pw, row["password_hash"]):
         return jsonify(ok=False, msg="아이디 또는 비밀번호 오류"), 401
+    rehash_on_login(uid, pw, row["password_hash"])
 
     session.update(
         uid=row["uid"],
@@ -162,46 +344,111 @@ def me():
         "department": session.get("department")
     })
 
+@app.get("/api/metrics/bcrypt")
+def bcrypt_metrics():
+    return jsonify(ok=True, bcrypt=HASHER.snapshot())
 
 # ----------------------------
 # 6) Flask → FastAPI 프록시
+# - 공유 Session(keep-alive 연결 풀)으로 요청마다 TCP 연결을 새로 열지 않음
+# - 라우트별 (연결, 읽기) 타임아웃
+# - 응답은 json() 재직렬화 없이 본문(오디오 등 바이너리 포함)을 그대로 스트리밍
 # ----------------------------
+HTTP = requests.Session()
+_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=PROXY_POOL_SIZE)
+HTTP.mount("http://", _adapter)
+HTTP.mount("https://", _adapter)
+
+PROXY_TIMEOUTS = {   # 읽기 타임아웃(초)
+    "chat": 60,
+    "ingest": 30,     # 작업 등록만 하고 job id 반환
+    "jobs": 10,
+    "tts": 30,
+    "voice": 60,
+    "memory": 10,
+}
+# 프록시가 그대로 넘기면 안 되는 hop-by-hop 헤더 (+ Flask가 다시 붙이는 date/server)
+_HOP_HEADERS = {"connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+                "te", "trailer", "trailers", "transfer-encoding", "upgrade", "date", "server"}
+
+def _user_headers():
+    """
+    로그인 uid → FastAPI 대화 기록(rag/memory.py) 키
+    - X-User-Sig = "<unix초>.<HMAC-SHA256(PROXY_SHARED_SECRET, "uid.unix초")>"
+    - FastAPI는 서명이 맞고 오래되지 않았을 때만 X-User-Id를 믿음 (브라우저가 직접 붙인 헤더는 무시)
+    """
+    if "uid" not in session or not PROXY_SHARED_SECRET:
+        return None
+    uid, ts = str(session["uid"]), str(int(time.time()))
+    sig = hmac.new(PROXY_SHARED_SECRET.encode(), f"{uid}.{ts}".encode(), hashlib.sha256).hexdigest()
+    return {"X-User-Id": uid, "X-User-Sig": f"{ts}.{sig}"}
+
+def _forward(method, path, route, **kwargs):
+    headers = _user_headers()
+    res = HTTP.request(method, f"{FASTAPI_BASE}{path}", stream=True, headers=headers,
+                       timeout=(PROXY_CONNECT_TIMEOUT, PROXY_TIMEOUTS[route]), **kwargs)
+    headers = [(k, v) for k, v in res.raw.headers.items() if k.lower() not in _HOP_HEADERS]
+    body = res.raw.stream(64 * 1024, decode_content=False)   # 압축 포함 원본 바이트 그대로
+    out = Response(body, status=res.status_code, headers=headers)
+    out.call_on_close(res.close)   # 다 보낸 뒤 연결을 풀에 반납
+    return out
+
 @app.post("/chat")
 def proxy_chat():
     """main.html → FastAPI RAG 질의응답"""
     payload = request.get_json() or {}
     # ✅ FastAPI가 요구하는 키로 맞춰줌
     if "text" in payload:
-        payload = {"query": payload["text"]}
+        payload = {"query": payload["text"], "session_id": payload.get("session_id")}
     try:
-        res = requests.post(f"{FASTAPI_BASE}/rag/chat", json=payload, timeout=60)
-        return jsonify(res.json()), res.status_code
+        return _forward("POST", "/rag/chat", "chat", json=payload)
     except Exception as e:
         return jsonify(ok=False, msg=f"RAG 서버 연결 실패: {e}"), 500
 
+@app.delete("/chat/memory")
+def proxy_chat_memory():
+    try:
+        return _forward("DELETE", "/chat/memory", "memory", params=request.args)
+    except Exception as e:
+        return jsonify(ok=False, msg=f"대화 기록 삭제 실패: {e}"), 500
+
 @app.post("/rag/ingest")
 def proxy_rag_ingest():
     try:
-        res = requests.post(f"{FASTAPI_BASE}/rag/ingest", json={}, timeout=120)
-        return jsonify(res.json()), res.status_code
+        # 작업 등록만 하고 바로 job id 반환 (진행률은 아래 jobs 프록시로 조회)
+        return _forward("POST", "/rag/ingest", "ingest", json=request.get_json(silent=True) or {})
     except Exception as e:
         return jsonify(ok=False, msg=f"RAG 인덱싱 실패: {e}"), 500
 
+@app.get("/rag/ingest/jobs/<job_id>")
+def proxy_rag_ingest_job(job_id):
+    try:
+        return _forward("GET", f"/rag/ingest/jobs/{job_id}", "jobs")
+    except Exception as e:
+        return jsonify(ok=False, msg=f"RAG 작업 조회 실패: {e}"), 500
+
+@app.post("/rag/ingest/jobs/<job_id>/cancel")
+def proxy_rag_ingest_cancel(job_id):
+    try:
+        return _forward("POST", f"/rag/ingest/jobs/{job_id}/cancel", "jobs")
+    except Exception as e:
+        return jsonify(ok=False, msg=f"RAG 작업 취소 실패: {e}"), 500
+
 @app.post("/tts")
 def proxy_tts():
     payload = request.get_json() or {}
     try:
-        res = requests.post(f"{FASTAPI_BASE}/tts", json=payload, timeout=30)
-        return jsonify(res.json()), res.status_code
+        return _forward("POST", "/tts", "tts", json=payload)
     except Exception as e:
         return jsonify(ok=False, msg=f"TTS 연결 실패: {e}"), 500
 
 @app.post("/voice-chat")
 def proxy_voice():
     try:
-        files = {"file": request.files["file"]}
-        res = requests.post(f"{FASTAPI_BASE}/voice-chat", files=files, timeout=60)
-        return jsonify(res.json()), res.status_code
+        f = request.files["file"]
+        # 업로드 스트림을 그대로 multipart로 전달 (메모리에 다시 읽지 않음)
+        files = {"file": (f.filename, f.stream, f.mimetype)}
+        return _forward("POST", "/voice-chat", "voice", files=files, data=request.form)
     except Exception as e:
         return jsonify(ok=False, msg=f"Voice 연결 실패: {e}"), 500
 
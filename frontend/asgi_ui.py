@@ -0,0 +1,160 @@
+# ==========================================================
+# asgi_ui.py (프론트 UI/회원 API를 FastAPI 앱에 직접 등록 — UI_MODE=asgi)
+# - 통합 서버(ai/stt-tts-sample/app.py)에서 Flask를 WsgiToAsgi로 마운트하지 않고
+#   같은 ASGI 앱의 라우트로 처리 → WSGI 브리지/루프백 HTTP 없이 요청당 1홉
+# - /api/signup, /api/login, /api/me : 같은 users 테이블, 같은 커넥션 풀(app.py db_cursor)·bcrypt 풀(HASHER)
+# - HTML 페이지(templates/)와 /image 정적 파일은 Starlette가 직접 서빙
+# - /chat, /tts, /voice-chat, /rag/* 는 통합 서버의 FastAPI 라우트가 같은 프로세스에서 처리
+# - 세션은 Starlette SessionMiddleware(서명 쿠키, SECRET_KEY, 7일)
+#   ※ Flask 세션 쿠키와 형식이 달라 모드를 바꾸면 다시 로그인 필요
+# ==========================================================
+import asyncio
+from pathlib import Path
+
+import mysql.connector
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, Response
+from fastapi.staticfiles import StaticFiles
+from starlette.middleware.sessions import SessionMiddleware
+
+from frontend.app import (
+    HASHER, SECRET_KEY, BCRYPT_ROUNDS, HasherBusy, PoolTimeout,
+    bcrypt_check, bcrypt_hash, db_cursor, needs_rehash, update_pw_hash,
+)
+
+BASE_DIR = Path(__file__).resolve().parent
+TEMPLATES_DIR = BASE_DIR / "templates"
+SESSION_MAX_AGE = 7 * 24 * 3600   # Flask permanent_session_lifetime과 동일
+
+router = APIRouter()
+
+def _err(status, msg):
+    return JSONResponse({"ok": False, "msg": msg}, status_code=status)
+
+async def _payload(request: Request) -> dict:
+    """JSON 본문, 아니면 form (Flask 쪽 get_json(silent=True) or form 과 동일)"""
+    try:
+        data = await request.json()
+        if isinstance(data, dict):
+            return data
+    except ValueError:
+        pass
+    try:
+        return dict(await request.form())
+    except Exception:
+        return {}
+
+# ----------------------------
+# 회원가입 / 로그인 API
+# - bcrypt는 전용 풀(HASHER)에서 실행하고 await (이벤트 루프/AnyIO 스레드풀 점유 X)
+# - MySQL은 블로킹 → 스레드풀
+# ----------------------------
+BUSY = (PoolTimeout, HasherBusy)
+
+async def hash_pw(plain):
+    return await asyncio.wrap_future(HASHER.submit(bcrypt_hash, plain))
+
+async def check_pw(plain, hashed):
+    return await asyncio.wrap_future(HASHER.submit(bcrypt_check, plain, hashed))
+
+def _insert_user(uid, role, name, dept, email, pw_hash):
+    with db_cursor() as cur:
+        cur.execute(
+            "INSERT INTO users(uid, role, name, department, email, password_hash) VALUES(%s,%s,%s,%s,%s,%s)",
+            (uid, role, name, dept, email, pw_hash),
+        )
+
+def _select_user(uid):
+    with db_cursor(dictionary=True) as cur:
+        cur.execute("SELECT * FROM users WHERE uid=%s", (uid,))
+        return cur.fetchone()
+
+async def _rehash_on_login(uid, plain, hashed):
+    if not needs_rehash(hashed):
+        return
+    try:
+        await run_in_threadpool(update_pw_hash, uid, await hash_pw(plain))
+        print(f"[AUTH] rehashed {uid} → cost {BCRYPT_ROUNDS}")
+    except Exception as e:
+        print(f"[AUTH] rehash skipped for {uid}: {e}")
+
+@router.post("/api/signup")
+async def signup(request: Request):
+    data = await _payload(request)
+    uid, role, name, dept, email, pw = [(data.get(k) or "").strip()
+                                        for k in ("uid", "role", "name", "dept", "email", "password")]
+    if not all([uid, role, name, dept, email, pw]):
+        return _err(400, "필수 항목 누락")
+    try:
+        pw_hash = await hash_pw(pw)
+        await run_in_threadpool(_insert_user, uid, role, name, dept, email, pw_hash)
+        return {"ok": True}
+    except mysql.connector.errors.IntegrityError:
+        return _err(409, "이미 존재하는 아이디입니다.")
+    except BUSY as e:
+        print(f"[AUTH] {e}")
+        return _err(503, "접속자가 많아 잠시 후 다시 시도해주세요.")
+
+@router.post("/api/login")
+async def login(request: Request):
+    payload = await _payload(request)
+    uid = (payload.get("uid") or payload.get("id") or "").strip()
+    pw = (payload.get("password") or "").strip()
+    if not uid or not pw:
+        return _err(400, "아이디/비밀번호 필요")
+    try:
+        row = await run_in_threadpool(_select_user, uid)
+        ok = bool(row) and await check_pw(pw, row["password_hash"])
+    except BUSY as e:
+        print(f"[AUTH] {e}")
+        return _err(503, "접속자가 많아 잠시 후 다시 시도해주세요.")
+    if not ok:
+        return _err(401, "아이디 또는 비밀번호 오류")
+    await _rehash_on_login(uid, pw, row["password_hash"])
+
+    request.session.update(
+        uid=row["uid"],
+        name=row["name"],
+        role=row["role"],
+        department=row["department"],
+    )
+    return {"ok": True, "user": row}
+
+@router.get("/api/me")
+async def me(request: Request):
+    s = request.session
+    if "uid" not in s:
+        return _err(401, "로그인 필요")
+    return {"ok": True, "user": {
+        "uid": s.get("uid"),
+        "name": s.get("name"),
+        "role": s.get("role"),
+        "department": s.get("department"),
+    }}
+
+@router.get("/api/metrics/bcrypt")
+async def bcrypt_metrics():
+    return {"ok": True, "bcrypt": HASHER.snapshot()}
+
+# ----------------------------
+# HTML 페이지 라우팅
+# ----------------------------
+def _page(name):
+    async def page():
+        return FileResponse(TEMPLATES_DIR / name)
+    return page
+
+for _path, _name in [("/", "main.html"), ("/login", "login.html"),
+                     ("/signup", "signup.html"), ("/guest", "guest.html")]:
+    router.add_api_route(_path, _page(_name), methods=["GET"], include_in_schema=False)
+
+@router.get("/favicon.ico", include_in_schema=False)
+async def favicon():
+    return Response(status_code=204)
+
+def mount_ui(app: FastAPI) -> None:
+    """통합 FastAPI 앱에 UI 라우트/정적 파일/세션 등록 (Flask 마운트 대신)"""
+    app.add_middleware(SessionMiddleware, secret_key=SECRET_KEY, max_age=SESSION_MAX_AGE, same_site="lax")
+    app.include_router(router)
+    app.mount("/image", StaticFiles(directory=BASE_DIR / "image"), name="frontend-image")